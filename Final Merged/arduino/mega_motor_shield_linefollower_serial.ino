@@ -13,7 +13,7 @@
 #define MQ2_PIN   A3
 #define FLAME_PIN A2
 
-// Tune thresholds (0–1023)
+// Tune thresholds (0–1023); keep SKETCH_*_THRESHOLD in config/bot_config.py equal
 // MQ-2: higher value usually means more gas/smoke
 int GAS_BAD_THRESHOLD = 400;
 // Flame: many flame sensors give LOWER value when flame is present
@@ -27,6 +27,31 @@ unsigned long warmup_until = 0;
 const unsigned long SENSOR_INTERVAL_MS = 500;
 unsigned long last_sensor_send = 0;
 
+// =========================
+// Framed protocol (optional, see bot_app/serial_protocol.py)
+// The Pi asks "PROTO BIN <baud> <hz> <batch>"; we echo it, switch baud and
+// from then on talk in CRC-checked frames with batched sensor samples.
+// Text stays the default after every reset.
+// =========================
+const byte FRAME_SYNC = 0xA5;
+const byte FRAME_CMD = 0x01;
+const byte FRAME_ACK = 0x02;
+const byte FRAME_SENSOR = 0x10;
+const byte MAX_BATCH = 10;
+
+bool framed = false;
+unsigned long sample_interval_ms = 20;
+byte batch_size = 5;
+unsigned long next_sample = 0;
+uint16_t batch_seq = 0;
+byte batch_count = 0;
+byte batch_buf[4 + MAX_BATCH * 5];
+
+// receive state
+byte rx_buf[64];
+int rx_len = -1;     // -1: waiting for sync
+int rx_need = 0;
+
 // Motors (Adafruit Motor Shield v1)
 AF_DCMotor motor1(1, MOTOR12_1KHZ);  // M1 Rear Left
 AF_DCMotor motor2(2, MOTOR12_1KHZ);  // M2 Rear Right
@@ -135,11 +160,96 @@ void applyCommand(String c) {
   else if (c == "RIGHT") turnRight();
 }
 
+uint16_t crc16Update(uint16_t crc, byte b) {
+  // CRC-16/CCITT-FALSE: poly 0x1021, init 0xFFFF
+  crc ^= (uint16_t)b << 8;
+  for (byte i = 0; i < 8; i++) crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  return crc;
+}
+
+uint16_t crc16(const byte *data, int len) {
+  uint16_t crc = 0xFFFF;
+  for (int i = 0; i < len; i++) crc = crc16Update(crc, data[i]);
+  return crc;
+}
+
+void sendFrame(byte type, const byte *payload, byte len) {
+  uint16_t crc = crc16Update(crc16Update(0xFFFF, type), len);
+  for (int i = 0; i < len; i++) crc = crc16Update(crc, payload[i]);
+  Serial.write(FRAME_SYNC);
+  Serial.write(type);
+  Serial.write(len);
+  Serial.write(payload, len);
+  Serial.write((byte)(crc & 0xFF));
+  Serial.write((byte)(crc >> 8));
+}
+
+bool tryFramed(String c) {
+  // c = "PROTO BIN <baud> <hz> <batch>" (already upper case)
+  int a = c.indexOf(' ', 10);
+  int b = c.indexOf(' ', a + 1);
+  if (a < 0 || b < 0) return false;
+  long baud = c.substring(10, a).toInt();
+  int hz = c.substring(a + 1, b).toInt();
+  int batch = c.substring(b + 1).toInt();
+  if (baud != 19200 && baud != 38400 && baud != 57600 && baud != 115200) return false;
+  if (hz < 1 || hz > 100 || batch < 1 || batch > MAX_BATCH) return false;
+
+  Serial.println(c);
+  Serial.flush();
+  Serial.end();
+  Serial.begin(baud);
+  sample_interval_ms = 1000 / hz;
+  batch_size = batch;
+  batch_count = 0;
+  next_sample = millis();
+  framed = true;
+  return true;
+}
+
+void readSerialFrames() {
+  while (Serial.available()) {
+    byte ch = Serial.read();
+    if (rx_len < 0) {
+      if (ch == FRAME_SYNC) rx_len = 0;
+      continue;
+    }
+    rx_buf[rx_len++] = ch;
+    if (rx_len == 2) {
+      rx_need = 2 + rx_buf[1] + 2;
+      if (rx_need > (int)sizeof(rx_buf)) rx_len = -1;  // too long for a command
+      continue;
+    }
+    if (rx_len < 2 || rx_len < rx_need) continue;
+
+    uint16_t got = rx_buf[rx_need - 2] | (rx_buf[rx_need - 1] << 8);
+    if (got == crc16(rx_buf, rx_need - 2) && rx_buf[0] == FRAME_CMD) {
+      String c = "";
+      for (int i = 0; i < rx_buf[1]; i++) c += (char)rx_buf[2 + i];
+      applyCommand(c);
+      sendFrame(FRAME_ACK, rx_buf + 2, rx_buf[1]);
+    }
+    rx_len = -1;  // bad CRC: drop it and wait for the next sync
+  }
+}
+
 void readSerialLine() {
   while (Serial.available()) {
     char ch = (char)Serial.read();
     if (ch == '\n') {
-      applyCommand(cmd);
+      String up = cmd;
+      up.trim();
+      up.toUpperCase();
+      if (up.startsWith("PROTO BIN") && tryFramed(up)) {
+        cmd = "";
+        return;
+      }
+      if (cmd.length() > 0) {
+        applyCommand(cmd);
+        // lets the Pi confirm delivery (RobotSerial.send_with_ack)
+        Serial.print("ACK ");
+        Serial.println(cmd);
+      }
       cmd = "";
     } else if (ch != '\r') {
       cmd += ch;
@@ -179,13 +289,51 @@ void sendSensorStatus() {
   Serial.print(" WARM="); Serial.println(warming ? 1 : 0);
 }
 
+void sampleSensors() {
+  // one sample = flags, mq2 (u16 LE), flame (u16 LE); sent every batch_size samples
+  int mq2Value = analogRead(MQ2_PIN);
+  int flameValue = analogRead(FLAME_PIN);
+  bool warming = (millis() < warmup_until);
+  byte flags = 0;
+  if (flameValue < FLAME_DETECT_THRESHOLD) flags |= 0x01;
+  if (!warming && mq2Value >= GAS_BAD_THRESHOLD) flags |= 0x02;
+  if (warming) flags |= 0x04;
+
+  byte *p = batch_buf + 4 + batch_count * 5;
+  p[0] = flags;
+  p[1] = mq2Value & 0xFF;
+  p[2] = mq2Value >> 8;
+  p[3] = flameValue & 0xFF;
+  p[4] = flameValue >> 8;
+  if (++batch_count < batch_size) return;
+
+  batch_buf[0] = batch_seq & 0xFF;
+  batch_buf[1] = batch_seq >> 8;
+  batch_buf[2] = (byte)sample_interval_ms;
+  batch_buf[3] = batch_count;
+  sendFrame(FRAME_SENSOR, batch_buf, 4 + batch_count * 5);
+  batch_seq++;
+  batch_count = 0;
+}
+
 void loop() {
-  readSerialLine();
+  if (framed) readSerialFrames();
+  else readSerialLine();
 
   if (mode == AUTO_LF) {
     handleAutoLineFollower();
   }
 
+  if (framed) {
+    // fixed sample grid, so the Pi can time-stamp every sample in a batch
+    if ((long)(millis() - next_sample) >= 0) {
+      next_sample += sample_interval_ms;
+      sampleSensors();
+    }
+    delay(1);
+    return;
+  }
+
   // periodic sensor publish
   if (millis() - last_sensor_send >= SENSOR_INTERVAL_MS) {
     last_sensor_send = millis();
@@ -0,0 +1,463 @@
+"""
+async_server.py
+---------------
+asyncio HTTP server for the dashboard (standard library only).
+
+/video is served natively: every viewer is a coroutine waiting on a shared
+per-encoder frame event, so viewers cost no OS thread. Every other route
+goes to the Flask app from create_app() through a small WSGI bridge on a
+bounded thread pool, so /cmd, /status and the page itself work unchanged and
+stay responsive however many people are watching.
+
+/snapshot.jpg?wait_newer= also waits for the frame here before Flask answers,
+so long-polls do not hold a pool thread either. /events (Server-Sent Events
+from the EventHub) is native as well, one coroutine per open dashboard tab.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote_to_bytes, urlencode, urlsplit
+
+from .auth import check_basic_auth
+from .camera_stream import StreamPacer, StreamTiers, StreamingOutput
+from .events import SSE_KEEPALIVE, sse_format
+from .websocket import (OP_CLOSE, OP_PING, OP_PONG, OP_TEXT, WebSocketError, encode_frame,
+                        handshake_response, read_frame)
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT_S = 30.0
+
+VIDEO_HEAD = (b"HTTP/1.1 200 OK\r\n"
+              b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+              b"Cache-Control: no-cache\r\n"
+              b"Connection: close\r\n\r\n")
+
+EVENTS_HEAD = (b"HTTP/1.1 200 OK\r\n"
+               b"Content-Type: text/event-stream\r\n"
+               b"Cache-Control: no-cache\r\n"
+               b"Connection: close\r\n\r\n")
+SSE_KEEPALIVE_S = 15.0
+
+
+class BadRequest(Exception):
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+def same_origin(origin: Optional[str], host: Optional[str]) -> bool:
+    """
+    True if a browser Origin header names the Host the request was sent to.
+    No Origin at all is a non-browser client (browsers always send it on a
+    WebSocket upgrade); those cannot reuse a browser's cached credentials.
+    """
+    if origin is None:
+        return True
+    if not host:
+        return False
+    try:
+        o = urlsplit(origin)
+        h = urlsplit("//" + host)
+        default = {"http": 80, "https": 443}.get(o.scheme)
+        return (o.hostname is not None and o.hostname == h.hostname
+                and (o.port or default) == (h.port or default))
+    except ValueError:
+        return False
+
+
+class FrameSignal:
+    """Wakes coroutines when a StreamingOutput gets a new frame (fired from the encoder thread)."""
+    def __init__(self, output: StreamingOutput, loop: asyncio.AbstractEventLoop):
+        self.output = output
+        self._loop = loop
+        self._event = asyncio.Event()
+        output.listeners.append(self._on_frame)
+
+    def _on_frame(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._fire)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def _fire(self) -> None:
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait_newer(self, last_id: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.output.frame_id <= last_id:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._event.wait(), left)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+class AsyncDashboardServer:
+    def __init__(self, app, output, host: str = "0.0.0.0", port: int = 8000, wsgi_threads: int = 8,
+                 events=None, control=None):
+        """
+        app:     Flask app from create_app()
+        output:  the same StreamingOutput / StreamTiers that was given to create_app()
+        events:  the same EventHub (optional); /events is then served here
+        control: ControlChannel (optional); enables the /control WebSocket
+        """
+        self.app = app
+        self.events = events
+        self.control = control
+        self.tiers = output if isinstance(output, StreamTiers) else StreamTiers([output])
+        self.host = host
+        self.port = int(port)
+        self._pool = ThreadPoolExecutor(max(1, int(wsgi_threads)), thread_name_prefix="wsgi")
+        self._signals: Dict[int, FrameSignal] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for out in self.tiers.outputs:
+            self._signals[id(out)] = FrameSignal(out, loop)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        print(f"[INFO] async web server on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # --- connection handling ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                try:
+                    req = await self._read_request(reader)
+                except BadRequest as e:
+                    await self._simple(writer, e.status, e.status.encode())
+                    break
+                if req is None:
+                    break
+                method, target, version, headers, body = req
+                path, _, query = target.partition("?")
+
+                if method == "GET" and path == "/video":
+                    await self._video(writer, headers, query)
+                    break
+                if method == "GET" and path == "/control" and self.control is not None:
+                    await self._control(reader, writer, headers)
+                    break
+                if method == "GET" and path == "/events" and self.events is not None:
+                    await self._events(writer, headers)
+                    break
+                if method == "GET" and path == "/snapshot.jpg" and "wait_newer=" in query:
+                    query = await self._wait_snapshot(headers, query)
+
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                environ = self._environ(method, path, query, version, headers, body, peer)
+                if not await self._wsgi(writer, environ, keep):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print("[ERROR] web request:", e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_S)
+        except asyncio.LimitOverrunError:
+            raise BadRequest("431 Request Header Fields Too Large")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise BadRequest("400 Bad Request")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            name, value = name.strip().lower(), value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+        # bodies are only read by Content-Length; a chunked body would be parsed as the
+        # next request on this connection, so refuse it (the connection is then closed)
+        te = headers.get("transfer-encoding", "").lower()
+        if te:
+            raise BadRequest("411 Length Required" if te == "chunked" else "501 Not Implemented")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise BadRequest("400 Bad Request")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest("413 Payload Too Large")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method, target, version, headers, body
+
+    async def _simple(self, writer: asyncio.StreamWriter, status: str, body: bytes, extra=()) -> None:
+        head = [f"HTTP/1.1 {status}", "Content-Type: text/plain",
+                f"Content-Length: {len(body)}", "Connection: close", *(f"{k}: {v}" for k, v in extra)]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # --- WSGI bridge (Flask routes) ---
+
+    def _environ(self, method, path, query, version, headers, body, peer) -> dict:
+        env = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(path).decode("latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0] if peer else "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace("-", "_")
+            if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                env[key] = value
+            else:
+                env["HTTP_" + key] = value
+        return env
+
+    async def _wsgi(self, writer: asyncio.StreamWriter, environ: dict, keep_alive: bool) -> bool:
+        """Run the Flask app on the pool; returns True if the connection can be reused."""
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = status, headers
+            return lambda data: None  # legacy write() callable, unused by Flask
+
+        def call():
+            result = self.app(environ, start_response)
+            try:
+                it = iter(result)
+                first = next(it, None)
+            except BaseException:
+                if hasattr(result, "close"):
+                    result.close()
+                raise
+            if "status" not in started:
+                if hasattr(result, "close"):
+                    result.close()
+                raise RuntimeError("WSGI app returned without calling start_response")
+            return result, it, first
+
+        try:
+            result, it, first = await loop.run_in_executor(self._pool, call)
+        except Exception as e:
+            # nothing has been written yet: the client still gets an answer
+            print("[ERROR] web app:", e)
+            await self._simple(writer, "500 Internal Server Error", b"Internal Server Error")
+            return False
+        try:
+            headers = [(k, v) for k, v in started["headers"] if k.lower() != "connection"]
+            sized = any(k.lower() == "content-length" for k, _ in headers)
+            keep_alive = keep_alive and sized   # streamed bodies end by closing
+            head = [f"HTTP/1.1 {started['status']}", *(f"{k}: {v}" for k, v in headers),
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    writer.write(chunk)
+                    await writer.drain()
+                chunk = await loop.run_in_executor(self._pool, next, it, None)
+            await writer.drain()
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self._pool, result.close)
+        return keep_alive
+
+    # --- native routes ---
+
+    async def _video(self, writer: asyncio.StreamWriter, headers: Dict[str, str], query: str) -> None:
+        if not check_basic_auth(headers.get("authorization")):
+            await self._simple(writer, "401 UNAUTHORIZED", b"Authentication required",
+                               [("WWW-Authenticate", 'Basic realm="Home Security Dashboard"')])
+            return
+        q = parse_qs(query)
+        try:
+            fps = max(0.0, float(q.get("fps", ["0"])[0]))
+            width = max(0, int(q.get("width", ["0"])[0]))
+        except ValueError:
+            await self._simple(writer, "400 Bad Request", b"fps and width must be numbers")
+            return
+        quality = q.get("quality", [""])[0].lower()
+        pacer = StreamPacer(self.tiers, fps, width, quality, q.get("adapt", ["1"])[0] != "0")
+
+        writer.write(VIDEO_HEAD)
+        out = pacer.output
+        out.add_client()
+        try:
+            last_id = out.frame_id
+            while True:
+                if not await self._signals[id(out)].wait_newer(last_id, 5.0):
+                    continue
+                frame_id, _frame, chunk = out.wait_newer(last_id, timeout=0)
+                if chunk is None:
+                    continue
+                last_id = frame_id
+
+                t0 = time.time()
+                writer.write(chunk)
+                await writer.drain()
+                if pacer.after_send(time.time() - t0):
+                    out.remove_client()
+                    out = pacer.output
+                    out.add_client()
+                    last_id = out.frame_id   # frame ids are per encoder
+
+                wait = pacer.interval - (time.time() - t0)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        except ConnectionError:
+            pass
+        finally:
+            out.remove_client()
+
+    async def _events(self, writer: asyncio.StreamWriter, headers: Dict[str, str]) -> None:
+        if not check_basic_auth(headers.get("authorization")):
+            await self._simple(writer, "401 UNAUTHORIZED", b"Authentication required",
+                               [("WWW-Authenticate", 'Basic realm="Home Security Dashboard"')])
+            return
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+        sub = self.events.subscribe(wake)
+        writer.write(EVENTS_HEAD)
+        try:
+            while True:
+                ready.clear()
+                messages, wait = sub.take()
+                if messages:
+                    writer.write(sse_format(messages))
+                    await writer.drain()
+                    continue
+                try:
+                    # rate limited: sleep the rest of the interval; idle: wait for a push
+                    await asyncio.wait_for(ready.wait(), wait if wait is not None else SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    if wait is None:
+                        writer.write(SSE_KEEPALIVE)
+                        await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.events.unsubscribe(sub)
+
+    async def _control(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                       headers: Dict[str, str]) -> None:
+        """
+        WebSocket teleop. Client -> {"seq": n, "cmd": "FWD", "t": <client time>}
+        Server -> {"ack": n, "ok": bool, "msg": ..., "t": <echoed>} as soon as the
+        intent is recorded (the serial write happens on the control thread).
+        """
+        # browsers send cached Basic credentials on cross-site upgrades too:
+        # without this any page the operator opens could drive the motors
+        if not same_origin(headers.get("origin"), headers.get("host")):
+            await self._simple(writer, "403 Forbidden", b"Cross-origin WebSocket refused")
+            return
+        if not check_basic_auth(headers.get("authorization")):
+            await self._simple(writer, "401 UNAUTHORIZED", b"Authentication required",
+                               [("WWW-Authenticate", 'Basic realm="Home Security Dashboard"')])
+            return
+        key = headers.get("sec-websocket-key")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            await self._simple(writer, "400 Bad Request", b"WebSocket upgrade required")
+            return
+        writer.write(handshake_response(key))
+
+        client = object()  # identity for seq tracking / dead-man on disconnect
+        try:
+            while True:
+                op, payload = await read_frame(reader)
+                if op == OP_CLOSE:
+                    writer.write(encode_frame(payload[:2], OP_CLOSE))
+                    await writer.drain()
+                    break
+                if op == OP_PING:
+                    writer.write(encode_frame(payload, OP_PONG))
+                    continue
+                if op != OP_TEXT:
+                    continue
+                try:
+                    msg = json.loads(payload)
+                    reply = self.control.submit(client, int(msg["seq"]), str(msg["cmd"]))
+                    reply["ack"] = msg["seq"]
+                except (ValueError, KeyError, TypeError):
+                    msg, reply = {}, {"ok": False, "msg": "Use {\"seq\": n, \"cmd\": \"FWD\"}"}
+                if "t" in msg:
+                    reply["t"] = msg["t"]
+                writer.write(encode_frame(json.dumps(reply).encode("utf-8")))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, WebSocketError):
+            pass
+        finally:
+            self.control.disconnect(client)
+
+    async def _wait_snapshot(self, headers: Dict[str, str], query: str) -> str:
+        """
+        Do the ?wait_newer= wait here, then hand Flask the query with timeout=0
+        so it answers at once without blocking a pool thread.
+        """
+        if not check_basic_auth(headers.get("authorization")):
+            return query  # Flask sends the 401
+        q = parse_qs(query)
+        try:
+            last_id = int(q["wait_newer"][0])
+            timeout = min(30.0, max(0.0, float(q.get("timeout", ["10"])[0])))
+            width = max(0, int(q.get("width", ["0"])[0]))
+        except (KeyError, ValueError):
+            return query  # Flask sends the 400
+        out = self.tiers.outputs[self.tiers.index_for(width)]
+        await self._signals[id(out)].wait_newer(last_id, timeout)
+        q["timeout"] = ["0"]
+        return urlencode(q, doseq=True)
+
+
+def run_async_server(app, output, host: str = "0.0.0.0", port: int = 8000, wsgi_threads: int = 8,
+                     events=None, control=None) -> None:
+    """Blocking: serve the dashboard with AsyncDashboardServer until interrupted."""
+    server = AsyncDashboardServer(app, output, host, port, wsgi_threads, events, control)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
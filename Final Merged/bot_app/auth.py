@@ -1,3 +1,4 @@
+import base64
 from functools import wraps
 from flask import Response, request
 from config.dashboard_config import DASHBOARD_USERNAME, DASHBOARD_PASSWORD
@@ -19,3 +20,13 @@ def requires_auth(f):
             return authenticate()
         return f(*args, **kwargs)
     return decorated
+
+def check_basic_auth(header: str | None) -> bool:
+    """Check a raw 'Authorization: Basic ...' header (for routes served outside Flask)."""
+    if not header or not header.lower().startswith("basic "):
+        return False
+    try:
+        user, _, password = base64.b64decode(header[6:].strip()).decode("utf-8").partition(":")
+    except (ValueError, UnicodeDecodeError):
+        return False
+    return user == AUTH_USER and password == AUTH_PASS
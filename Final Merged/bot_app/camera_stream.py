@@ -1,12 +1,13 @@
 # app/camera_stream.py
 # Fast MJPEG streaming output for Flask, compatible with newer Picamera2 encoder signatures.
 # One camera instance, provides:
-#   - create_camera(...) -> (picam2, output)
-#   - mjpeg_generator(output) -> generator yielding multipart MJPEG frames
+#   - create_camera(...) -> (picam2, output)   (output is StreamTiers with lores_mjpeg=True)
+#   - mjpeg_generator(output, fps, width, quality) -> generator yielding multipart MJPEG
+#     frames (shared, pre-framed), throttled and tier-switched per client
 
 import threading
 import time
-from typing import Tuple
+from typing import List, Tuple
 
 from picamera2 import Picamera2
 from picamera2.encoders import MJPEGEncoder
@@ -18,17 +19,93 @@ class StreamingOutput(Output):
     Picamera2 Output that keeps the latest JPEG frame in memory.
     The MJPEGEncoder calls outputframe(...). Newer Picamera2 versions pass
     extra args (packet, audio), so we accept them.
+
+    Each frame gets a monotonically increasing frame_id, and the multipart
+    chunk (boundary + headers + JPEG) is built once here, so every /video
+    client yields the same bytes object instead of concatenating its own copy.
     """
-    def __init__(self) -> None:
+    def __init__(self, size: Tuple[int, int] = (0, 0)) -> None:
         super().__init__()
+        self.size = tuple(size)           # (w, h) of the encoded stream
+        self.clients = 0                  # /video readers; change only via add_client / remove_client
+        self.period = 1 / 15              # smoothed seconds between frames
         self.frame: bytes | None = None
+        self.chunk: bytes | None = None   # pre-framed multipart part for mjpeg_generator
+        self.frame_id = 0
+        self.frame_ts = 0.0               # time.time() when the frame arrived
         self.cond = threading.Condition()
+        self.listeners = []               # callables run (encoder thread) after each frame
 
     def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None):
         # 'frame' is bytes for MJPEGEncoder
+        frame = bytes(frame)
+        chunk = b"".join((
+            b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ",
+            str(len(frame)).encode("ascii"), b"\r\n\r\n", frame, b"\r\n",
+        ))
+        now = time.time()
         with self.cond:
+            if self.frame_ts:
+                self.period = 0.9 * self.period + 0.1 * min(1.0, now - self.frame_ts)
             self.frame = frame
+            self.chunk = chunk
+            self.frame_id += 1
+            self.frame_ts = now
             self.cond.notify_all()
+        for cb in self.listeners:
+            cb()
+
+    def add_client(self) -> None:
+        # readers come and go on Werkzeug threads and the event loop at once
+        with self.cond:
+            self.clients += 1
+
+    def remove_client(self) -> None:
+        with self.cond:
+            self.clients -= 1
+
+    def latest(self):
+        """(frame_id, frame, frame_ts) of the newest frame, read atomically."""
+        with self.cond:
+            return self.frame_id, self.frame, self.frame_ts
+
+    def wait_newer(self, last_id: int, timeout: float | None = None):
+        """
+        Block until a frame newer than last_id exists.
+        Returns (frame_id, frame, chunk) for the newest frame, or (last_id, None, None) on timeout.
+        Slow readers skip straight to the newest frame.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.frame_id > last_id, timeout):
+                return last_id, None, None
+            return self.frame_id, self.frame, self.chunk
+
+
+class StreamTiers:
+    """
+    Several encoder outputs of different sizes (e.g. main + lores), smallest first.
+    /video clients pick a tier; clients on the same tier share its encoder.
+    """
+    def __init__(self, outputs: List[StreamingOutput]):
+        self.outputs = sorted(outputs, key=lambda o: o.size[0])
+
+    @property
+    def main(self) -> StreamingOutput:
+        return self.outputs[-1]
+
+    def index_for(self, width: int = 0, quality: str = "") -> int:
+        """Smallest tier at least `width` wide (largest if none); quality=low -> smallest tier."""
+        if quality == "low":
+            return 0
+        if width > 0:
+            for i, out in enumerate(self.outputs):
+                if out.size[0] >= width:
+                    return i
+        return len(self.outputs) - 1
+
+    def stats(self):
+        return [{"size": list(o.size), "clients": o.clients, "fps": round(1 / o.period, 1) if o.period else 0.0}
+                for o in self.outputs]
 
 
 def create_camera(
@@ -37,21 +114,32 @@ def create_camera(
     fps: int = 15,
     main_format: str = "XRGB8888",
     warmup_s: float = 0.8,
+    lores_mjpeg: bool = False,
+    buffer_count: int = 6,
 ):
     """
     Creates and starts Picamera2 with a main stream (for MJPEG web view)
     and a lores stream (for detection if you want).
 
+    lores_mjpeg: also run a second MJPEG encoder on the lores stream, giving
+    /video a cheap low-resolution tier for phones / remote viewers.
+
+    buffer_count: camera buffers (Picamera2's video default is 6). Raise it
+    when the detection pipeline holds requests while its workers run, so
+    the encoders still get frames.
+
     Returns:
-        (picam2, output) where output is a StreamingOutput.
+        (picam2, output) where output is a StreamingOutput, or a StreamTiers
+        (main + lores) when lores_mjpeg is set.
     """
-    output = StreamingOutput()
+    output = StreamingOutput(main_size)
 
     picam2 = Picamera2()
     config = picam2.create_video_configuration(
         main={"format": main_format, "size": main_size},
         lores={"size": lores_size},
-        display=None
+        display=None,
+        buffer_count=buffer_count,
     )
     picam2.configure(config)
     picam2.start()
@@ -69,25 +157,110 @@ def create_camera(
     encoder = MJPEGEncoder()
     picam2.start_encoder(encoder, output)  # encodes main stream
 
-    return picam2, output
+    if not lores_mjpeg:
+        return picam2, output
+
+    lores_output = StreamingOutput(lores_size)
+    try:
+        picam2.start_encoder(MJPEGEncoder(), lores_output, name="lores")
+    except Exception as e:
+        # older Picamera2 can only run one encoder / cannot pick the stream
+        print("[WARN] lores MJPEG encoder not available:", e)
+        return picam2, StreamTiers([output])
+    return picam2, StreamTiers([output, lores_output])
+
+
+# adaptive throttling: a yield that takes longer than this share of the frame
+# budget means the client (TCP socket) is not keeping up
+SLOW_SEND = 0.8
+FAST_SEND = 0.25
+MAX_INTERVAL_S = 2.0
 
 
-def mjpeg_generator(output: StreamingOutput):
+class StreamPacer:
+    """
+    Per-client frame rate / tier state for /video (threaded and async servers).
+
+    fps:      max frames per second for this client (0 = encoder rate)
+    width:    wanted width; picks the smallest tier at least this wide
+    quality:  "low" starts on the smallest tier
+    adaptive: feed after_send() the time the socket needed to take a frame;
+              slow clients get a lower rate, then a smaller tier, and climb
+              back up (never above fps / width) when fast again.
+    """
+    def __init__(self, tiers: StreamTiers, fps: float = 0.0, width: int = 0, quality: str = "",
+                 adaptive: bool = True):
+        self.tiers = tiers
+        self.top = self.tier = tiers.index_for(width, quality)
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.interval = self.min_interval
+        self.adaptive = adaptive
+        self._slow = self._fast = 0
+
+    @property
+    def output(self) -> StreamingOutput:
+        return self.tiers.outputs[self.tier]
+
+    def after_send(self, send_s: float) -> bool:
+        """Update rate/tier from one send; True if the tier changed."""
+        if not self.adaptive:
+            return False
+        tier = self.tier
+        budget = max(self.interval, self.output.period)
+        if send_s > SLOW_SEND * budget:
+            self._slow, self._fast = self._slow + 1, 0
+            self.interval = min(MAX_INTERVAL_S, budget * 1.25)
+            if self._slow >= 3 and self.tier > 0:
+                self.tier, self._slow = self.tier - 1, 0
+        elif send_s < FAST_SEND * budget:
+            self._fast, self._slow = self._fast + 1, 0
+            if self._fast >= 10:
+                self._fast = 0
+                if self.interval > self.min_interval:
+                    self.interval = max(self.min_interval, self.interval * 0.8)
+                elif self.tier < self.top:
+                    self.tier += 1
+        else:
+            self._slow = self._fast = 0
+        return self.tier != tier
+
+
+def mjpeg_generator(output, fps: float = 0.0, width: int = 0, quality: str = "", adaptive: bool = True):
     """
     Flask streaming generator. Yields multipart MJPEG frames forever.
+    Yields the shared pre-framed chunk; a client that falls behind jumps to
+    the newest frame instead of queueing old ones.
+
+    output is a StreamingOutput or StreamTiers; fps / width / quality /
+    adaptive are as in StreamPacer. The time spent in each yield is how long
+    the socket took to drain the frame.
     """
-    while True:
-        with output.cond:
-            output.cond.wait()
-            frame = output.frame
-
-        if frame is None:
-            continue
-
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
-        )
+    tiers = output if isinstance(output, StreamTiers) else StreamTiers([output])
+    pacer = StreamPacer(tiers, fps, width, quality, adaptive)
+
+    out = pacer.output
+    out.add_client()
+    try:
+        last_id = out.frame_id
+        while True:
+            frame_id, _frame, chunk = out.wait_newer(last_id, timeout=5.0)
+            if chunk is None:
+                continue
+            last_id = frame_id
+
+            t0 = time.time()
+            yield chunk
+            if pacer.after_send(time.time() - t0):
+                out.remove_client()
+                out = pacer.output
+                out.add_client()
+                last_id = out.frame_id   # frame ids are per encoder
+
+            wait = pacer.interval - (time.time() - t0)
+            if wait > 0:
+                time.sleep(wait)
+    finally:
+        out.remove_client()
 
 
 def stop_camera(picam2: Picamera2):
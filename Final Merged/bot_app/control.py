@@ -0,0 +1,137 @@
+"""
+control.py
+----------
+Teleop over one persistent channel (WebSocket /control).
+
+Clients send {"seq": n, "cmd": "FWD"} while a button is held (a few times
+per second) and once when it changes. Only the newest intent matters:
+stale or out-of-order messages (seq not increasing) are ignored, and the
+control thread forwards the latest intent to the serial port at a fixed
+rate, writing only when it changed. STOP is forwarded at once.
+
+Dead-man: if a drive command (FWD/BACK/LEFT/RIGHT) is not refreshed within
+deadman_s, or the client disconnects, STOP is sent.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+MOTION_CMDS = {"FWD", "BACK", "LEFT", "RIGHT"}
+SETTING_CMDS = {"AUTO_LF", "MANUAL"}
+
+
+class ControlChannel:
+    def __init__(self, robot, rate_hz: float = 20.0, deadman_s: float = 0.5):
+        self.robot = robot
+        self.period = 1.0 / max(1.0, float(rate_hz))
+        self.deadman_s = float(deadman_s)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._drive = "STOP"            # latest drive intent
+        self._drive_ts = 0.0            # last time the intent was (re)sent by a client
+        self._drive_owner = None        # client holding the current intent
+        self._sent_drive: Optional[str] = None
+        self._stop_requested = False    # explicit STOP is always written, even if already stopped
+        self._settings: Dict[str, str] = {}   # "SPEED" / "AUTO_LF" / ... -> latest line
+        self._last_seq: Dict[object, int] = {}
+
+        self._run = False
+        self._th: Optional[threading.Thread] = None
+        self.stats = {"received": 0, "stale": 0, "coalesced": 0, "sent": 0, "deadman_stops": 0}
+
+    def start(self) -> None:
+        if self._th and self._th.is_alive():
+            return
+        self._run = True
+        self._th = threading.Thread(target=self._loop, daemon=True)
+        self._th.start()
+
+    def stop(self) -> None:
+        self._run = False
+        self._wake.set()
+
+    @staticmethod
+    def parse(cmd: str) -> Optional[str]:
+        """Normalised serial line for a dashboard command, or None if invalid."""
+        c = (cmd or "").strip().upper()
+        if c.startswith("SPEED"):
+            parts = c.split()
+            if len(parts) != 2 or not parts[1].isdigit():
+                return None
+            return f"SPEED {max(0, min(255, int(parts[1])))}"
+        if c in MOTION_CMDS or c in SETTING_CMDS or c == "STOP":
+            return c
+        return None
+
+    def submit(self, client, seq: int, cmd: str) -> Dict[str, object]:
+        """Record one client message; never touches the serial port."""
+        line = self.parse(cmd)
+        if line is None:
+            return {"ok": False, "msg": "Invalid command"}
+
+        with self._lock:
+            self.stats["received"] += 1
+            if seq <= self._last_seq.get(client, -1):
+                self.stats["stale"] += 1
+                return {"ok": False, "msg": "stale"}
+            self._last_seq[client] = seq
+
+            if line == "STOP" or line in MOTION_CMDS:
+                if line == self._drive and line != "STOP":
+                    self.stats["coalesced"] += 1   # heartbeat of the same intent
+                self._drive = line
+                self._drive_ts = time.time()
+                self._drive_owner = client
+                self._stop_requested |= line == "STOP"
+            else:
+                key = line.split()[0]
+                if key in self._settings:
+                    self.stats["coalesced"] += 1
+                self._settings[key] = line
+        if line == "STOP":
+            self._wake.set()  # do not wait for the next tick
+        return {"ok": True, "msg": line}
+
+    def disconnect(self, client) -> None:
+        """Client went away: forget its seq and stop if it was driving."""
+        with self._lock:
+            self._last_seq.pop(client, None)
+            if self._drive_owner is client and self._drive in MOTION_CMDS:
+                self._drive = "STOP"
+                self.stats["deadman_stops"] += 1
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while self._run:
+            self._wake.wait(self.period)
+            self._wake.clear()
+
+            with self._lock:
+                if self._drive in MOTION_CMDS and time.time() - self._drive_ts > self.deadman_s:
+                    self._drive = "STOP"
+                    self.stats["deadman_stops"] += 1
+                drive = self._drive
+                settings = list(self._settings.values())
+                self._settings.clear()
+                force_stop, self._stop_requested = self._stop_requested, False
+
+            if drive == "STOP" and (force_stop or drive != self._sent_drive):
+                self._write(drive)   # safety first
+            for line in settings:
+                self._write(line)
+            if drive != "STOP" and drive != self._sent_drive:
+                self._write(drive)
+
+    def _write(self, line: str) -> None:
+        if self.robot is None:
+            return
+        if self.robot.send(line):
+            self.stats["sent"] += 1
+            # AUTO_LF / MANUAL / SPEED may change what the motors do
+            self._sent_drive = line if (line == "STOP" or line in MOTION_CMDS) else None
+        elif line == "STOP" or line in MOTION_CMDS:
+            self._sent_drive = None   # not written; try again next tick
@@ -1,126 +1,612 @@
+import math
 import os
+import threading
 import time
-import pickle
 from datetime import datetime
 
 import cv2
-import numpy as np
-import face_recognition
+from picamera2 import MappedArray
 
-from .telegram_utils import send_telegram_alert
+from .encoding_store import read_gallery
+from .face_index import KnownFaceIndex, UNKNOWN
+from .face_ops import (DetectJob, FramePacket, encode_faces, locate_faces,
+                       lores_luma, lores_rgb, main_detect_image)
+from .telegram_utils import AlertDispatcher, send_telegram_alert
+from .motion import MotionGate, merge_boxes, pad_box
+from .tracker import FaceTracker
+from .unknown_clusters import UnknownClusters
 
-def load_encodings(path="encodings.pickle"):
+def load_encodings(path="encodings.fenc", top_k=0):
+    """
+    Load the known-face gallery into a KnownFaceIndex.
+    Reads the memory-mapped encoding store, or a legacy encodings.pickle.
+    top_k >= 2 enables the two-stage (prototypes -> top_k identities) lookup,
+    using the prototypes stored by train_encodings.py --prototypes if present.
+    """
     print("[INFO] loading encodings...")
-    with open(path, "rb") as f:
-        data = pickle.loads(f.read())
-    known_face_encodings = data["encodings"]
-    known_face_names = data["names"]
-    if not known_face_encodings or not known_face_names:
-        raise RuntimeError("encodings.pickle is empty or invalid. Re-train encodings first.")
-    return known_face_encodings, known_face_names
+    gallery = read_gallery(path)
+    if len(gallery.encodings) == 0 or len(gallery.names) == 0:
+        raise RuntimeError(f"{os.path.basename(path)} is empty or invalid. Re-train encodings first.")
+    # one (N, 128) matrix, built once and shared by every frame
+    return KnownFaceIndex(
+        gallery.encodings, gallery.names,
+        prototypes=gallery.prototypes,
+        prototype_names=gallery.prototype_names,
+        top_k=top_k,
+    )
 
 
 class UnknownDetector:
     def __init__(self,
-                 known_face_encodings,
-                 known_face_names,
+                 known_faces: KnownFaceIndex,
                  unknown_dir="unknown_faces",
                  unknown_cooldown=10,
                  compare_tolerance=0.45,
                  distance_max_for_known=0.55,
                  cv_scaler=4,
+                 detect_source="main",
+                 lores_scaler=1,
+                 tracker: FaceTracker | None = None,
+                 motion_gate: MotionGate | None = None,
+                 roi_mode=False,
+                 roi_pad=0.5,
+                 roi_full_scan_every=10,
+                 alerts: AlertDispatcher | None = None,
+                 events=None,
+                 journal=None,
+                 clusters: UnknownClusters | None = None,
                  on_unknown=None):
-        self.known_face_encodings = known_face_encodings
-        self.known_face_names = known_face_names
+        # swapped as one reference by EncodingReloader; read once per frame
+        self.known_faces = known_faces
 
         self.UNKNOWN_SAVE_DIR = unknown_dir
         os.makedirs(self.UNKNOWN_SAVE_DIR, exist_ok=True)
 
         self.UNKNOWN_COOLDOWN = unknown_cooldown
         self.last_unknown_time = 0.0
+        # optional: group unknown encodings into visitors; one alert per visitor with its
+        # own cooldown instead of the global UNKNOWN_COOLDOWN
+        self.clusters = clusters
 
         self.COMPARE_TOLERANCE = compare_tolerance
         self.DISTANCE_MAX_FOR_KNOWN = distance_max_for_known
 
         self.cv_scaler = int(cv_scaler)
         self.on_unknown = on_unknown
+        # non-blocking Telegram queue; None = send inline (old behaviour)
+        self.alerts = alerts
+        # optional EventHub: face list changes + unknown alerts pushed to the dashboard
+        self.events = events
+        # optional EventJournal: known people when they show up, every unknown alert
+        self.journal = journal
+        self.JOURNAL_GAP_S = 5.0      # a known face unseen this long is journaled again
+        self._journal_seen = {}       # name -> last time seen
+        self._unknown_info = {}       # distance / box of the face crop_unknown() returned
+
+        # "main": resize the full main frame (old behaviour)
+        # "lores": detect on the lores YUV420 plane, crop from main only on alert
+        if detect_source not in ("main", "lores"):
+            raise ValueError("detect_source must be 'main' or 'lores'")
+        self.detect_source = detect_source
+        self.lores_scaler = max(1, int(lores_scaler))
+        self._stream_sizes = None  # ((main_w, main_h), (lores_w, lores_h))
+
+        # optional: track faces between full detections (see tracker.py)
+        self.tracker = tracker
+
+        # optional: skip recognition on static frames, detect only where things moved
+        self.motion_gate = motion_gate
+        self.MOTION_PAD = 0.25        # grow motion regions by 25% per side
+        self.MOTION_MAX_COVER = 0.6   # above this share of the frame, scan it all
+
+        # optional: once faces are known, only scan padded boxes around them
+        self.roi_mode = bool(roi_mode)
+        self.ROI_PAD = float(roi_pad)                            # per side, x face size
+        self.ROI_FULL_SCAN_EVERY = max(1, int(roi_full_scan_every))  # detection passes
+        self._roi_passes = 0
+        self.roi_stats = {"roi": 0, "full": 0}
+
+        # detection image -> main frame scale (x, y)
+        self._box_scale = (float(self.cv_scaler), float(self.cv_scaler))
 
         # same variables as your old code :contentReference[oaicite:4]{index=4}
         self.face_locations = []
         self.face_encodings = []
         self.face_names = []
+        self.face_matches = []
+        self.face_clusters = []       # visitor id per face (None: known, or no clustering)
         self.alert_unknown_index = -1
+        self._alert_track = None      # track of the pending alert, marked once the alert is queued
 
     def process_frame(self, frame):
         # same idea as your old process_frame :contentReference[oaicite:5]{index=5}
+        rgb_resized_frame = main_detect_image(frame, self.cv_scaler)
+
+        self._box_scale = (float(self.cv_scaler), float(self.cv_scaler))
+        self._recognize(rgb_resized_frame, lambda: rgb_resized_frame)
+        return frame
+
+    def process_lores(self, yuv):
+        """
+        Detect on a lores YUV420 (I420) array as returned by capture_array("lores").
+        HOG only needs the luma plane, so RGB is only built when faces were found.
+        """
+        (main_w, main_h), (lores_w, lores_h) = self._stream_sizes
+        luma = lores_luma(yuv, lores_w, lores_h, self.lores_scaler)
+
+        self._box_scale = (main_w / luma.shape[1], main_h / luma.shape[0])
+        self._recognize(luma, lambda: lores_rgb(yuv, lores_w, (luma.shape[1], luma.shape[0])))
+
+    def _recognize(self, detect_img, get_rgb):
         self.alert_unknown_index = -1
+        self._alert_track = None
+        gray = detect_img if detect_img.ndim == 2 else cv2.cvtColor(detect_img, cv2.COLOR_RGB2GRAY)
 
-        resized_frame = cv2.resize(frame, (0, 0), fx=1 / self.cv_scaler, fy=1 / self.cv_scaler)
-        rgb_resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+        go, motion_regions, prev_boxes = self._gate(gray)
+        if not go:
+            self._apply([], [])
+            return
 
-        self.face_locations = face_recognition.face_locations(rgb_resized_frame)
-        self.face_encodings = face_recognition.face_encodings(
-            rgb_resized_frame, self.face_locations, model="large"
-        )
+        if self.tracker is not None:
+            self._recognize_tracked(detect_img, gray, get_rgb, motion_regions, prev_boxes)
+            return
+
+        regions = self._detection_regions(motion_regions, prev_boxes, gray.shape)
+        locations = locate_faces(detect_img, regions)
+        self._apply(locations, encode_faces(get_rgb(), locations) if locations else [])
+
+    def _gate(self, gray):
+        """Motion gate: (run detection?, motion regions, boxes of faces we already know)."""
+        # faces we already know about: tracks (moved by optical flow) or last frame's boxes
+        if self.tracker is not None:
+            prev_boxes = [t.int_box() for t in self.tracker.tracks]
+        else:
+            prev_boxes = list(self.face_locations)
+
+        motion_regions = None
+        if self.motion_gate is not None:
+            motion = self.motion_gate.check(gray)
+            if not motion.moving and not prev_boxes:
+                # static, empty scene: no HOG, no encoding
+                self.motion_gate.skipped()
+                if self.tracker is not None:
+                    self.tracker.reset()
+                return False, None, prev_boxes
+            motion_regions = motion.regions
 
+        return True, motion_regions, prev_boxes
+
+    def _apply(self, locations, encodings):
+        self.face_encodings = encodings
+        self.face_matches = self._match(encodings)
+        self.face_clusters = self._cluster_unknowns(encodings, self.face_matches)
+        self.face_locations = list(locations)
         self.face_names = []
 
-        for i, face_encoding in enumerate(self.face_encodings):
-            matches = face_recognition.compare_faces(
-                self.known_face_encodings, face_encoding, tolerance=self.COMPARE_TOLERANCE
-            )
+        for i, match in enumerate(self.face_matches):
+            if not match.is_known:
+                self._maybe_alert(i)
 
-            name = "Unknown"
-            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-            best_match_index = int(np.argmin(face_distances))
-            best_distance = float(face_distances[best_match_index])
+            self.face_names.append(match.name)
+        self._publish_faces()
+        self._journal_faces()
 
-            if matches[best_match_index] and best_distance < self.DISTANCE_MAX_FOR_KNOWN:
-                name = self.known_face_names[best_match_index]
-            else:
-                now = time.time()
-                if now - self.last_unknown_time > self.UNKNOWN_COOLDOWN:
-                    self.last_unknown_time = now
-                    self.alert_unknown_index = i
-                    print("[ALERT] Unknown person detected! (face index:", i, ")")
+    def _recognize_tracked(self, detect_img, gray, get_rgb, motion_regions, prev_boxes):
+        # full detection every N frames / on scene change; optical flow in between
+        tracker = self.tracker
 
-            self.face_names.append(name)
+        if tracker.needs_detection(gray):
+            regions = self._detection_regions(motion_regions, prev_boxes, gray.shape)
+            locations = locate_faces(detect_img, regions)
+            continued = tracker.associate(locations)
+            # only faces that do not continue an existing track are encoded
+            new_locations = [loc for loc, t in zip(locations, continued) if t is None]
+            self.face_encodings = encode_faces(get_rgb(), new_locations) if new_locations else []
+            matches = self._match(self.face_encodings)
+            new_clusters = iter(self._cluster_unknowns(self.face_encodings, matches))
+            for t, prev in zip(tracker.commit(gray, locations, continued, matches), continued):
+                if prev is None:
+                    t.cluster_id = next(new_clusters)
+        else:
+            tracker.propagate(gray)
 
-        return frame
+        tracks = tracker.tracks
+        self.face_locations = [t.int_box() for t in tracks]
+        self.face_matches = [t.match for t in tracks]
+        self.face_clusters = [t.cluster_id for t in tracks]
+        self.face_names = [m.name for m in self.face_matches]
+        self._publish_faces()
+        self._journal_faces()
 
-    def handle_unknown_and_send(self, frame):
-        # same idea as your old draw_results alert block :contentReference[oaicite:6]{index=6}
-        for i, ((top, right, bottom, left), name) in enumerate(zip(self.face_locations, self.face_names)):
-            # scale back up to original frame
-            top *= self.cv_scaler
-            right *= self.cv_scaler
-            bottom *= self.cv_scaler
-            left *= self.cv_scaler
-
-            if i == self.alert_unknown_index and name == "Unknown":
+        now = time.time()
+        for i, t in enumerate(tracks):
+            if t.cluster_id is not None:
+                self.clusters.touch(t.cluster_id, now)   # still in view: do not expire
+            if t.match.is_known or t.alerted:
+                continue
+            # one alert per unknown track (retried while the cooldown blocks it,
+            # or until the alert could be sent)
+            if self._maybe_alert(i):
+                self._alert_track = t
+            elif t.cluster_id is not None and not self.clusters.alert_due(t.cluster_id, now):
+                t.alerted = True   # a visitor already alerted on: no second alert for the same person
+
+    def _detection_regions(self, motion_regions, prev_boxes, shape):
+        """
+        Where HOG runs this frame: a list of boxes, or None for the full frame.
+          ROI mode + known faces: padded last face boxes (+ motion regions),
+                                  with a full scan every ROI_FULL_SCAN_EVERY passes
+          otherwise:              padded motion regions while no faces are known
+        """
+        if self.roi_mode and prev_boxes:
+            self._roi_passes += 1
+            if self._roi_passes % self.ROI_FULL_SCAN_EVERY == 0:
+                self.roi_stats["full"] += 1
+                return None  # safety net for faces outside the ROIs
+            boxes = [pad_box(b, self.ROI_PAD, shape) for b in prev_boxes]
+        elif motion_regions and not prev_boxes:
+            boxes = []
+        else:
+            return None
+
+        boxes += [pad_box(r, self.MOTION_PAD, shape) for r in (motion_regions or [])]
+        boxes = merge_boxes(boxes)
+        area = sum((b - t) * (r - l) for t, r, b, l in boxes)
+        if area > self.MOTION_MAX_COVER * shape[0] * shape[1]:
+            return None
+        if self.roi_mode and prev_boxes:
+            self.roi_stats["roi"] += 1
+        return boxes
+
+    def _publish_faces(self):
+        if self.events is not None:
+            # EventHub only pushes when the list actually changes
+            self.events.publish_state("faces", {
+                "names": sorted(n for n in self.face_names if n != UNKNOWN),
+                "unknown": sum(1 for n in self.face_names if n == UNKNOWN),
+            })
+
+    def _journal_faces(self):
+        if self.journal is None:
+            return
+        now = time.time()
+        for location, match in zip(self.face_locations, self.face_matches):
+            if not match.is_known:
+                continue   # unknowns are journaled with their crop in send_unknown()
+            if now - self._journal_seen.get(match.name, 0.0) > self.JOURNAL_GAP_S:
+                self.journal.record("face", match.name, distance=round(float(match.distance), 3),
+                                    box=list(self.main_box(location)))
+            self._journal_seen[match.name] = now
+
+    def stats(self):
+        return {
+            "detect_source": self.detect_source,
+            "faces": list(self.face_names),
+            "motion": dict(self.motion_gate.stats) if self.motion_gate is not None else None,
+            "tracker": dict(self.tracker.stats) if self.tracker is not None else None,
+            "roi": dict(self.roi_stats) if self.roi_mode else None,
+            "unknown_clusters": self.clusters.status() if self.clusters is not None else None,
+        }
+
+    def _match(self, face_encodings):
+        # all faces of the frame against the whole gallery in one (M x N) pass
+        known_faces = self.known_faces
+        return known_faces.match(
+            face_encodings,
+            tolerance=self.COMPARE_TOLERANCE,
+            distance_max=self.DISTANCE_MAX_FOR_KNOWN,
+        )
+
+    def _cluster_unknowns(self, encodings, matches):
+        """Visitor id per face: unknown encodings are attached to (or start) a cluster."""
+        if self.clusters is None:
+            return [None] * len(matches)
+        now = time.time()
+        return [None if m.is_known else self.clusters.assign(e, now)[0] for e, m in zip(encodings, matches)]
+
+    def _maybe_alert(self, i):
+        if self.alert_unknown_index >= 0:
+            return False   # one alert per frame; the next unknown gets its turn next frame
+        now = time.time()
+        cluster_id = self.face_clusters[i] if i < len(self.face_clusters) else None
+        # per-visitor cooldown, or the global one without clustering; both start
+        # in _alert_sent(), so a face that could not be cropped is tried again
+        if cluster_id is not None:
+            if not self.clusters.alert_due(cluster_id, now):
+                return False
+        elif now - self.last_unknown_time <= self.UNKNOWN_COOLDOWN:
+            return False
+        self.alert_unknown_index = i
+        visitor = f", visitor #{cluster_id}" if cluster_id is not None else ""
+        print(f"[ALERT] Unknown person detected! (face index: {i}{visitor})")
+        return True
+
+    def _alert_sent(self, cluster_id, track):
+        now = time.time()
+        if cluster_id is not None:
+            self.clusters.mark_alerted(cluster_id, now)
+        else:
+            self.last_unknown_time = now
+        if track is not None:
+            track.alerted = True
+
+    def main_box(self, location, frame_shape=None):
+        """Map a (top, right, bottom, left) detection box to main-frame pixels."""
+        top, right, bottom, left = location
+        sx, sy = self._box_scale
+        top, bottom = int(top * sy), int(bottom * sy)
+        left, right = int(left * sx), int(right * sx)
+        if frame_shape is not None:
+            h, w = frame_shape[:2]
+            top, bottom = max(0, top), min(h, bottom)
+            left, right = max(0, left), min(w, right)
+        return top, right, bottom, left
+
+    def crop_unknown(self, frame):
+        """Return a copy of the pending unknown face from a main frame (or None)."""
+        for i, (location, name) in enumerate(zip(self.face_locations, self.face_names)):
+            if i == self.alert_unknown_index and name == UNKNOWN:
+                top, right, bottom, left = self.main_box(location, frame.shape)
                 face_img = frame[top:bottom, left:right]
-                if face_img.size != 0:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filepath = os.path.join(self.UNKNOWN_SAVE_DIR, f"unknown_{timestamp}.jpg")
-                    cv2.imwrite(filepath, face_img)
-
-                    alert_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    message = f"🚨 ALERT: Unknown person detected!\n🕒 Time: {alert_time}"
-                    send_telegram_alert(message, filepath)
-                    try:
-                        if callable(self.on_unknown):
-                            self.on_unknown(filepath)
-                    except Exception as _e:
-                        pass
-
-                self.alert_unknown_index = -1  # send once
+                match = self.face_matches[i] if i < len(self.face_matches) else None
+                dist = match.distance if match is not None else math.inf
+                self._unknown_info = {"box": [top, right, bottom, left],
+                                      "distance": round(dist, 3) if math.isfinite(dist) else None}
+                cluster_id = self.face_clusters[i] if i < len(self.face_clusters) else None
+                if cluster_id is not None:
+                    self._unknown_info["cluster"] = cluster_id
+                return face_img.copy() if face_img.size != 0 else None
+        return None
+
+    def send_unknown(self, face_img):
+        # same idea as your old draw_results alert block :contentReference[oaicite:6]{index=6}
+        track, self._alert_track = self._alert_track, None
+        if face_img is None or face_img.size == 0:
+            return
+
+        # encode once; the same bytes go to disk and to Telegram
+        ok, buf = cv2.imencode(".jpg", face_img)
+        if not ok:
+            return
+        jpeg = buf.tobytes()
+
+        cluster_id = self._unknown_info.get("cluster")
+        alert_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        message = f"🚨 ALERT: Unknown person detected!\n🕒 Time: {alert_time}"
+        if cluster_id is not None:
+            message += f"\n👤 Visitor #{cluster_id}"
+        if self.alerts is not None:
+            if not self.alerts.enqueue("unknown", message, image_bytes=jpeg):
+                return   # queue full: no cooldown, the next frame tries again
+        else:
+            send_telegram_alert(message, image_bytes=jpeg)
+        self._alert_sent(cluster_id, track)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = f"_c{cluster_id}" if cluster_id is not None else ""
+        filepath = os.path.join(self.UNKNOWN_SAVE_DIR, f"unknown_{timestamp}{suffix}.jpg")
+        with open(filepath, "wb") as f:
+            f.write(jpeg)
+        if cluster_id is not None:
+            self.clusters.add_file(cluster_id, os.path.basename(filepath))
+
+        if self.events is not None:
+            self.events.publish_event("alert", {"kind": "unknown", "time": alert_time,
+                                                "file": os.path.basename(filepath), "cluster": cluster_id})
+        if self.journal is not None:
+            self.journal.record("face", UNKNOWN, file=os.path.basename(filepath), **self._unknown_info)
+        try:
+            if callable(self.on_unknown):
+                self.on_unknown(filepath)
+        except Exception as _e:
+            pass
+
+    def handle_unknown_and_send(self, frame):
+        if self.alert_unknown_index < 0:
+            return
+        face_img = self.crop_unknown(frame)
+        self.alert_unknown_index = -1  # send once
+        self.send_unknown(face_img)
+
+    def _read_stream_sizes(self, picam2):
+        cfg = picam2.camera_configuration()
+        main_size = tuple(cfg["main"]["size"])
+        lores = cfg.get("lores")
+        if not lores:
+            raise RuntimeError("detect_source='lores' needs a camera configured with a lores stream")
+        return main_size, tuple(lores["size"])
 
     def step(self, picam2):
+        if self.detect_source == "lores":
+            self.step_lores(picam2)
+            return
+
         # IMPORTANT: capture from main, like your old scripts (stable)
         frame = picam2.capture_array("main")
         self.process_frame(frame)
         self.handle_unknown_and_send(frame)
 
+    def step_lores(self, picam2):
+        if self._stream_sizes is None:
+            self._stream_sizes = self._read_stream_sizes(picam2)
+
+        # One request gives lores + main from the same sensor frame.
+        # Only the small lores plane is copied; main is mapped, never copied whole.
+        face_img = None
+        request = picam2.capture_request()
+        try:
+            self.process_lores(request.make_array("lores"))
+            if self.alert_unknown_index >= 0:
+                with MappedArray(request, "main") as m:
+                    face_img = self.crop_unknown(m.array)
+        finally:
+            request.release()
+
+        if self.alert_unknown_index >= 0:
+            self.alert_unknown_index = -1  # send once
+            # Telegram upload happens after the camera buffer is handed back
+            self.send_unknown(face_img)
+
+    # --- pipeline stages (see pipeline.py) ---
+
+    def capture_packet(self, picam2, seq: int) -> FramePacket:
+        """Capture stage: grab one frame and package it for a detection worker."""
+        if self.detect_source == "lores":
+            if self._stream_sizes is None:
+                self._stream_sizes = self._read_stream_sizes(picam2)
+            (main_w, main_h), (lores_w, lores_h) = self._stream_sizes
+            # the request is held, not copied: main is only read if this frame ends in an
+            # alert; the pipeline releases it when the frame is dropped, skipped or applied
+            request = picam2.capture_request()
+            try:
+                yuv = request.make_array("lores")  # small copy
+            except Exception:
+                request.release()
+                raise
+            gray = lores_luma(yuv, lores_w, lores_h, self.lores_scaler)
+            job = DetectJob("yuv", yuv, (lores_w, lores_h), self.lores_scaler)
+            scale = (main_w / gray.shape[1], main_h / gray.shape[0])
+            return FramePacket(seq, time.time(), job, gray, scale, request=request)
+
+        frame = picam2.capture_array("main")
+        rgb = main_detect_image(frame, self.cv_scaler)
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        scale = (float(self.cv_scaler), float(self.cv_scaler))
+        return FramePacket(seq, time.time(), DetectJob("rgb", rgb), gray, scale, frame)
+
+    def plan(self, packet: FramePacket) -> bool:
+        """Dispatch stage: motion gate + ROI. False = nothing to detect in this frame."""
+        go, motion_regions, prev_boxes = self._gate(packet.gray)
+        if go:
+            packet.job.regions = self._detection_regions(motion_regions, prev_boxes, packet.gray.shape)
+        return go
+
+    def apply_detections(self, packet: FramePacket, locations, encodings):
+        """Result stage, called in frame order: match, alert, crop + send."""
+        self.alert_unknown_index = -1
+        self._alert_track = None
+        self._box_scale = packet.box_scale
+        self._apply(locations, encodings)
+        if self.alert_unknown_index < 0:
+            return
+
+        # cropped from the packet's own frame: the one the faces were detected in;
+        # in lores mode only the face box is copied out of the held main buffer
+        if packet.request is not None:
+            with MappedArray(packet.request, "main") as m:
+                face_img = self.crop_unknown(m.array)
+        else:
+            face_img = self.crop_unknown(packet.frame)
+        self.alert_unknown_index = -1  # send once
+        self.send_unknown(face_img)
+
+
+class EncodingReloader:
+    """
+    Hot-reloads the known-face gallery without restarting the bot.
+
+    A background thread watches the encoding file (mtime/size/inode) and also
+    reacts to request_reload() (SIGHUP, dashboard). The new KnownFaceIndex is
+    built completely off the detection thread and then swapped in with a single
+    attribute assignment, so the detector never sees a half-built index.
+    train_encodings.py replaces the file atomically, and a memory-mapped old
+    index stays valid until its last frame is done.
+
+    Started on an old encodings.pickle, it switches to encodings.fenc as soon
+    as one appears next to it (written by promote_cluster.py or a conversion).
+    """
+    def __init__(self, detector: UnknownDetector, path: str, top_k=0, poll_s=2.0):
+        self.detector = detector
+        self.path = path
+        self.top_k = top_k
+        self.poll_s = float(poll_s)
+
+        self._wake = threading.Event()
+        self._th = None
+        self._run = False
+        self._stat_key = self._file_key()
+        # the store that replaces a pickle gallery, once it exists
+        self._store_path = os.path.splitext(path)[0] + ".fenc" if path.endswith(".pickle") else None
+        self._store_key = None      # of a store that failed to load: retried when it changes
+
+        self.version = 0
+        self.loaded_at = time.time()
+        self.last_error = None
+
+    def _file_key(self, path=None):
+        try:
+            st = os.stat(path or self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def start(self):
+        if self._th and self._th.is_alive():
+            return
+        self._run = True
+        self._th = threading.Thread(target=self._loop, daemon=True)
+        self._th.start()
+
+    def stop(self):
+        self._run = False
+        self._wake.set()
+
+    def request_reload(self):
+        """Ask for a reload on the watcher thread (safe from signal handlers)."""
+        self._wake.set()
+
+    def reload_now(self, path=None) -> bool:
+        """Load `path` (default: the watched file); on success it is the watched file."""
+        path = path or self.path
+        key = self._file_key(path)
+        try:
+            new_index = load_encodings(path, top_k=self.top_k)
+        except Exception as e:
+            self.last_error = str(e)
+            print("[WARN] encodings reload failed, keeping current:", e)
+            return False
+
+        self.detector.known_faces = new_index  # atomic cutover
+        self.path = path
+        self._stat_key = key
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        print(f"[INFO] encodings reloaded (v{self.version}):", len(new_index), "encodings")
+        return True
+
+    def status(self):
+        return {
+            "path": os.path.basename(self.path),
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "encodings": len(self.detector.known_faces),
+            "last_error": self.last_error,
+        }
+
+    def _switch_to_store(self) -> bool:
+        key = self._file_key(self._store_path)
+        if key is None or key == self._store_key:
+            return False
+        if self.reload_now(self._store_path):
+            print("[INFO] encodings: now watching", self.path)
+            self._store_path = None
+            return True
+        self._store_key = key
+        return False
+
+    def _loop(self):
+        while self._run:
+            forced = self._wake.wait(self.poll_s)
+            self._wake.clear()
+            if not self._run:
+                break
+            if self._store_path and self._switch_to_store():
+                continue
+            key = self._file_key()
+            if forced or (key is not None and key != self._stat_key):
+                self.reload_now()
+
 
 def run_detection_loop(picam2, detector: UnknownDetector, sleep_s=0.001):
     while True:
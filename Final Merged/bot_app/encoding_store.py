@@ -0,0 +1,172 @@
+"""
+encoding_store.py
+-----------------
+Versioned, memory-mappable on-disk format for known face encodings.
+
+Layout (little endian):
+  magic     8 bytes   b"SBFENC\0\0"
+  version   uint32
+  hdr_len   uint32
+  header    JSON (utf-8): dtype, count, dim, labels, section offsets, ...
+  sections  64-byte aligned raw arrays:
+              encodings   (count, dim) float32/float64, rows grouped by label
+              label_idx   (count,) uint32 -> index into header["labels"]
+              prototypes  (P, dim)   optional
+              proto_idx   (P,) uint32 optional
+
+Loading maps the file with numpy.memmap, so startup does not unpickle
+thousands of arrays and several processes share the same page-cache pages.
+The old encodings.pickle format is still readable (read_gallery).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"SBFENC\0\0"
+VERSION = 1
+ALIGN = 64
+_PREFIX = struct.Struct("<8sII")
+
+
+@dataclass
+class Gallery:
+    encodings: np.ndarray
+    names: List[str]
+    prototypes: Optional[np.ndarray] = None
+    prototype_names: Optional[List[str]] = None
+    header: Dict[str, object] = field(default_factory=dict)
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def is_store(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def save_store(path: str,
+               encodings,
+               names: Sequence[str],
+               prototypes=None,
+               prototype_names: Optional[Sequence[str]] = None,
+               prototype_method: Optional[str] = None,
+               dtype: str = "float32") -> None:
+    """Write a store atomically (tmp file + os.replace), rows grouped by name."""
+    enc = np.asarray(encodings, dtype=dtype)
+    names = [str(n) for n in names]
+    if enc.ndim != 2 or len(enc) == 0 or len(enc) != len(names):
+        raise ValueError("encodings must be a non-empty (N, D) array with one name per row")
+
+    labels = sorted(set(names))
+    label_pos = {label: i for i, label in enumerate(labels)}
+    order = np.argsort(np.asarray(names), kind="stable")
+    enc = np.ascontiguousarray(enc[order])
+    label_idx = np.asarray([label_pos[names[i]] for i in order], dtype="<u4")
+
+    arrays = [("encodings", enc), ("label_idx", label_idx)]
+    if prototypes is not None:
+        pnames = [str(n) for n in prototype_names]
+        if any(n not in label_pos for n in pnames):
+            raise ValueError("prototype names must be known names")
+        porder = np.argsort(np.asarray(pnames), kind="stable")
+        arrays.append(("prototypes", np.ascontiguousarray(np.asarray(prototypes, dtype=dtype)[porder])))
+        arrays.append(("proto_idx", np.asarray([label_pos[pnames[i]] for i in porder], dtype="<u4")))
+
+    header = {
+        "version": VERSION,
+        "dtype": np.dtype(dtype).str,
+        "count": int(len(enc)),
+        "dim": int(enc.shape[1]),
+        "labels": labels,
+        "prototype_method": prototype_method,
+        "sections": {},
+    }
+
+    # offsets depend on the header size, which depends on the offsets: fix-point
+    hdr = b""
+    for _ in range(4):
+        offset = _align(_PREFIX.size + len(hdr))
+        sections = {}
+        for name, arr in arrays:
+            sections[name] = [offset, int(arr.nbytes)]
+            offset = _align(offset + arr.nbytes)
+        header["sections"] = sections
+        new_hdr = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if new_hdr == hdr:
+            break
+        hdr = new_hdr
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(hdr)))
+        f.write(hdr)
+        for name, arr in arrays:
+            off = header["sections"][name][0]
+            f.write(b"\0" * (off - f.tell()))
+            f.write(arr.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_store(path: str) -> Gallery:
+    """Map a store read-only; encodings/prototypes are views into the mapping."""
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, hdr_len = _PREFIX.unpack(bytes(mm[:_PREFIX.size]))
+    if magic != MAGIC:
+        raise RuntimeError(f"{path} is not an encoding store")
+    if version > VERSION:
+        raise RuntimeError(f"{path} has store version {version}, this code reads <= {VERSION}")
+
+    header = json.loads(bytes(mm[_PREFIX.size:_PREFIX.size + hdr_len]).decode("utf-8"))
+    dtype = np.dtype(header["dtype"])
+    dim = int(header["dim"])
+    labels: List[str] = header["labels"]
+
+    def section(name, dt):
+        off, nbytes = header["sections"][name]
+        return mm[off:off + nbytes].view(dt)
+
+    enc = section("encodings", dtype).reshape(-1, dim)
+    names = [labels[i] for i in section("label_idx", "<u4").tolist()]
+
+    prototypes = prototype_names = None
+    if "prototypes" in header["sections"]:
+        prototypes = section("prototypes", dtype).reshape(-1, dim)
+        prototype_names = [labels[i] for i in section("proto_idx", "<u4").tolist()]
+
+    return Gallery(enc, names, prototypes, prototype_names, header)
+
+
+def load_pickle(path: str) -> Gallery:
+    """Legacy {"encodings": [...], "names": [...]} pickle from older train_encodings.py."""
+    with open(path, "rb") as f:
+        data = pickle.loads(f.read())
+    protos = data.get("prototypes")
+    return Gallery(
+        encodings=np.asarray(data["encodings"], dtype=np.float64),
+        names=[str(n) for n in data["names"]],
+        prototypes=None if protos is None else np.asarray(protos, dtype=np.float64),
+        prototype_names=data.get("prototype_names"),
+        header={"version": 0, "prototype_method": data.get("prototype_method")},
+    )
+
+
+def read_gallery(path: str) -> Gallery:
+    """Load either format, chosen by the file's magic bytes."""
+    if is_store(path):
+        return load_store(path)
+    return load_pickle(path)
@@ -0,0 +1,149 @@
+"""
+events.py
+---------
+Push channel for the dashboard (Server-Sent Events).
+
+Producers publish from their own threads:
+  publish_state("sensor", {...})   only changed keys are pushed (deltas)
+  publish_event("alert", {...})    one-off events, always pushed
+Every open dashboard tab holds a Subscription. Deltas are merged while a
+subscriber waits, and one subscriber is flushed at most max_rate_hz times
+per second, so a chatty sensor cannot flood slow clients.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+Message = Tuple[str, dict]  # (event name, data)
+
+
+class Subscription:
+    def __init__(self, min_interval: float, wake: Optional[Callable[[], None]] = None, max_events: int = 64):
+        self.min_interval = float(min_interval)
+        self._wake = wake                      # extra notifier (asyncio server)
+        self._cond = threading.Condition()
+        self._state: Dict[str, dict] = {}      # topic -> merged delta not yet sent
+        self._events: Deque[Message] = collections.deque(maxlen=max_events)
+        self._last_flush = 0.0
+
+    def _push_state(self, topic: str, delta: dict) -> None:
+        with self._cond:
+            self._state.setdefault(topic, {}).update(delta)
+            self._cond.notify()
+        if self._wake:
+            self._wake()
+
+    def _push_event(self, topic: str, data: dict) -> None:
+        with self._cond:
+            self._events.append((topic, data))
+            self._cond.notify()
+        if self._wake:
+            self._wake()
+
+    def take(self) -> Tuple[List[Message], Optional[float]]:
+        """
+        Non-blocking. Returns (messages, None) when something was due,
+        ([], seconds) when messages wait for the rate limit, ([], None) when idle.
+        """
+        with self._cond:
+            if not self._state and not self._events:
+                return [], None
+            wait = self._last_flush + self.min_interval - time.time()
+            if wait > 0:
+                return [], wait
+            out = list(self._state.items()) + list(self._events)
+            self._state.clear()
+            self._events.clear()
+            self._last_flush = time.time()
+            return out, None
+
+    def get(self, timeout: float) -> List[Message]:
+        """Blocking take() for threaded servers; [] after timeout (send a keep-alive)."""
+        deadline = time.time() + timeout
+        while True:
+            out, wait = self.take()
+            if out:
+                return out
+            left = deadline - time.time()
+            if left <= 0:
+                return []
+            with self._cond:
+                if wait is None and not self._state and not self._events:
+                    self._cond.wait(left)
+                    continue
+            time.sleep(min(left, wait or 0.0))
+
+
+class EventHub:
+    def __init__(self, max_rate_hz: float = 5.0):
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz > 0 else 0.0
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = {}     # topic -> latest full values
+        self._subs: List[Subscription] = []
+        self.stats = {"published": 0, "suppressed": 0}
+
+    def publish_state(self, topic: str, values: dict) -> None:
+        """Push only the keys whose value changed since the last publish."""
+        with self._lock:
+            cur = self._state.setdefault(topic, {})
+            delta = {k: v for k, v in values.items() if k not in cur or cur[k] != v}
+            if not delta:
+                self.stats["suppressed"] += 1
+                return
+            cur.update(delta)
+            self.stats["published"] += 1
+            subs = list(self._subs)
+        for sub in subs:
+            sub._push_state(topic, delta)
+
+    def publish_event(self, topic: str, data: dict) -> None:
+        with self._lock:
+            self.stats["published"] += 1
+            subs = list(self._subs)
+        for sub in subs:
+            sub._push_event(topic, data)
+
+    def subscribe(self, wake: Optional[Callable[[], None]] = None) -> Subscription:
+        """New subscriber; its first flush is the full current state."""
+        sub = Subscription(self.min_interval, wake)
+        with self._lock:
+            for topic, values in self._state.items():
+                sub._state[topic] = dict(values)
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+
+def sse_format(messages: List[Message]) -> bytes:
+    return b"".join(
+        f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+        for name, data in messages
+    )
+
+
+SSE_KEEPALIVE = b": keep-alive\n\n"
+
+
+def sse_generator(hub: EventHub, keepalive_s: float = 15.0):
+    """Flask streaming generator for /events (threaded server)."""
+    sub = hub.subscribe()
+    try:
+        while True:
+            messages = sub.get(keepalive_s)
+            yield sse_format(messages) if messages else SSE_KEEPALIVE
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,240 @@
+"""
+face_index.py
+-------------
+Known-face gallery held as one contiguous (N, 128) matrix.
+
+All faces of a frame are matched with a single (M x N) distance computation
+instead of calling face_recognition.compare_faces + face_distance per face.
+Rows are grouped by name so the best distance per identity is one reduceat.
+
+Large galleries can use a two-stage lookup (top_k >= 2):
+  1) coarse: distance to per-person prototypes (mean or k-medoids)
+  2) exact:  distance to the raw encodings of the top_k nearest identities only
+Cost goes from O(all images) to O(prototypes + top_k * images per person).
+Accuracy target: the chosen identity agrees with the exhaustive search on
+>= 99% of faces (top_k >= 3); the reported distance is always exact for the
+identities that were refined. Check a gallery with tools/eval_index.py.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+UNKNOWN = "Unknown"
+PROTOTYPE_METHODS = ("mean", "medoids")
+
+
+def _pairwise(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    d2 = (np.einsum("ij,ij->i", a, a)[:, None]
+          + np.einsum("ij,ij->i", b, b)[None, :]
+          - 2.0 * (a @ b.T))
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2, out=d2)
+
+
+def _k_medoids(enc: np.ndarray, k: int, max_iter: int = 20) -> np.ndarray:
+    """Small deterministic k-medoids (greedy build + alternate) for one person."""
+    n = len(enc)
+    if n <= k:
+        return enc.copy()
+
+    d = _pairwise(enc, enc)
+    medoids = [int(np.argmin(d.sum(axis=1)))]
+    while len(medoids) < k:
+        # add the point that lowers the total assignment cost the most
+        nearest = d[:, medoids].min(axis=1)
+        gain = np.maximum(nearest[None, :] - d, 0.0).sum(axis=1)
+        gain[medoids] = -1.0
+        medoids.append(int(np.argmax(gain)))
+
+    for _ in range(max_iter):
+        assign = np.argmin(d[:, medoids], axis=1)
+        new = []
+        for c in range(k):
+            members = np.flatnonzero(assign == c)
+            if len(members) == 0:
+                new.append(medoids[c])
+                continue
+            cost = d[np.ix_(members, members)].sum(axis=1)
+            new.append(int(members[np.argmin(cost)]))
+        if new == medoids:
+            break
+        medoids = new
+
+    return enc[sorted(medoids)]
+
+
+def compute_prototypes(encodings, names: Sequence[str], method: str = "mean",
+                       k: int = 3) -> Tuple[np.ndarray, List[str]]:
+    """
+    Per-person prototypes: the mean encoding, or k medoids (real encodings).
+    Returns (prototypes, prototype_names) grouped by name.
+    """
+    if method not in PROTOTYPE_METHODS:
+        raise ValueError(f"method must be one of {PROTOTYPE_METHODS}")
+
+    enc = np.asarray(encodings, dtype=np.float64)
+    names_arr = np.asarray([str(n) for n in names])
+    protos, proto_names = [], []
+    for name in sorted(set(names_arr.tolist())):
+        person = enc[names_arr == name]
+        if method == "mean":
+            p = person.mean(axis=0, keepdims=True)
+        else:
+            p = _k_medoids(person, max(1, int(k)))
+        protos.append(p)
+        proto_names.extend([name] * len(p))
+
+    return np.concatenate(protos, axis=0), proto_names
+
+
+@dataclass
+class FaceMatch:
+    name: str            # best known name, or "Unknown" if outside tolerance
+    best_name: str       # nearest identity even if it did not pass tolerance
+    distance: float      # euclidean distance to the nearest encoding
+    margin: float        # gap to the nearest *other* identity (inf if only one)
+    index: int           # row of the nearest encoding in the index
+
+    @property
+    def is_known(self) -> bool:
+        return self.name != UNKNOWN
+
+
+class KnownFaceIndex:
+    def __init__(self, encodings, names: Sequence[str], dtype=np.float32,
+                 prototypes=None, prototype_names: Optional[Sequence[str]] = None,
+                 top_k: int = 0):
+        enc = np.asarray(encodings, dtype=dtype)
+        if enc.ndim != 2 or len(enc) == 0 or len(enc) != len(names):
+            raise RuntimeError("Known face encodings are empty or invalid. Re-train encodings first.")
+
+        # group rows by name (stable, so the original order is kept inside a person)
+        names_arr = np.asarray(names, dtype=object)
+        order = np.argsort(names_arr.astype(str), kind="stable")
+        if np.any(order != np.arange(len(order))):
+            enc = enc[order]
+            names_arr = names_arr[order]
+
+        self.encodings = np.ascontiguousarray(enc)
+        self.names: List[str] = [str(n) for n in names_arr]
+        self.sq_norms = np.einsum("ij,ij->i", self.encodings, self.encodings)
+
+        # identity table: label[k] owns rows starts[k] .. starts[k+1]
+        starts = [0]
+        for i in range(1, len(self.names)):
+            if self.names[i] != self.names[i - 1]:
+                starts.append(i)
+        self.starts = np.asarray(starts, dtype=np.intp)
+        self.labels: List[str] = [self.names[s] for s in starts]
+
+        # the margin compares against the runner-up identity, so stage 2 needs at least two
+        top_k = int(top_k)
+        if top_k < 0 or top_k == 1:
+            raise ValueError(f"top_k must be 0 (exhaustive) or at least 2, got {top_k}")
+        # two-stage lookup only pays off when there are more identities than top_k
+        self.top_k = top_k
+        self.prototypes = None
+        self.proto_ids = None
+        if self.top_k and len(self.labels) > self.top_k:
+            if prototypes is None:
+                prototypes, prototype_names = compute_prototypes(self.encodings, self.names, "mean")
+            label_pos = {label: i for i, label in enumerate(self.labels)}
+            if prototype_names is None or any(str(n) not in label_pos for n in prototype_names):
+                raise RuntimeError("Prototype names do not match the known face names.")
+            self.prototypes = np.ascontiguousarray(np.asarray(prototypes, dtype=dtype))
+            self.proto_ids = np.asarray([label_pos[str(n)] for n in prototype_names], dtype=np.intp)
+            self.proto_sq_norms = np.einsum("ij,ij->i", self.prototypes, self.prototypes)
+
+    def __len__(self) -> int:
+        return len(self.encodings)
+
+    @property
+    def dim(self) -> int:
+        return int(self.encodings.shape[1])
+
+    @property
+    def two_stage(self) -> bool:
+        return self.prototypes is not None
+
+    def _as_queries(self, face_encodings) -> np.ndarray:
+        return np.asarray(face_encodings, dtype=self.encodings.dtype).reshape(-1, self.dim)
+
+    def distances(self, face_encodings) -> np.ndarray:
+        """(M x N) euclidean distances, same values as face_recognition.face_distance."""
+        q = self._as_queries(face_encodings)
+        q_sq = np.einsum("ij,ij->i", q, q)
+        d2 = q_sq[:, None] + self.sq_norms[None, :] - 2.0 * (q @ self.encodings.T)
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2, out=d2)
+
+    def match(self, face_encodings, tolerance: float = 0.6,
+              distance_max: float = float("inf")) -> List[FaceMatch]:
+        """
+        Best name, distance and margin for every face in one batched pass.
+        A face is known when distance <= tolerance (compare_faces rule)
+        and distance < distance_max.
+        """
+        if len(face_encodings) == 0:
+            return []
+
+        if self.two_stage:
+            rows, dists, margins = self._search_two_stage(self._as_queries(face_encodings))
+        else:
+            rows, dists, margins = self._search_exhaustive(face_encodings)
+
+        out: List[FaceMatch] = []
+        for row, dist, margin in zip(rows, dists, margins):
+            best_name = self.names[int(row)]
+            known = dist <= tolerance and dist < distance_max
+            out.append(FaceMatch(
+                name=best_name if known else UNKNOWN,
+                best_name=best_name,
+                distance=float(dist),
+                margin=float(margin),
+                index=int(row),
+            ))
+        return out
+
+    def _search_exhaustive(self, face_encodings):
+        d = self.distances(face_encodings)
+        best_rows = np.argmin(d, axis=1)
+        best_d = d[np.arange(len(d)), best_rows]
+
+        # nearest distance per identity -> margin to the runner-up identity
+        if len(self.labels) > 1:
+            per_id = np.minimum.reduceat(d, self.starts, axis=1)
+            runner_up = np.partition(per_id, 1, axis=1)[:, 1]
+            margins = runner_up - best_d
+        else:
+            margins = np.full(len(d), np.inf)
+        return best_rows, best_d, margins
+
+    def _search_two_stage(self, q: np.ndarray):
+        # stage 1: nearest prototype per identity
+        q_sq = np.einsum("ij,ij->i", q, q)
+        d2 = q_sq[:, None] + self.proto_sq_norms[None, :] - 2.0 * (q @ self.prototypes.T)
+        coarse = np.full((len(q), len(self.labels)), np.inf)
+        np.minimum.at(coarse, (slice(None), self.proto_ids), np.sqrt(np.maximum(d2, 0.0)))
+        candidates = np.argpartition(coarse, self.top_k - 1, axis=1)[:, :self.top_k]
+
+        # stage 2: exact distances against the raw rows of the candidate identities
+        ends = np.append(self.starts[1:], len(self.encodings))
+        rows_out, d_out, m_out = [], [], []
+        for qi, ids in enumerate(candidates):
+            ids = np.sort(ids)
+            rows = np.concatenate([np.arange(self.starts[i], ends[i]) for i in ids])
+            enc = self.encodings[rows]
+            dist = np.sqrt(np.maximum(
+                q_sq[qi] + self.sq_norms[rows] - 2.0 * (enc @ q[qi]), 0.0))
+            best = int(np.argmin(dist))
+            lens = ends[ids] - self.starts[ids]
+            per_id = np.minimum.reduceat(dist, np.concatenate(([0], np.cumsum(lens)[:-1])))
+            # margin is measured against the refined identities only
+            rows_out.append(int(rows[best]))
+            d_out.append(float(dist[best]))
+            m_out.append(float(np.partition(per_id, 1)[1] - dist[best]))
+        return rows_out, d_out, m_out
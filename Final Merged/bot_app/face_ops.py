@@ -0,0 +1,103 @@
+"""
+face_ops.py
+-----------
+Stateless face detection/encoding steps shared by the in-thread detector
+and the pipeline worker processes (no camera or Telegram imports here).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+import face_recognition
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left)
+
+
+def main_detect_image(frame, cv_scaler: int):
+    """Main-stream frame -> downscaled RGB detection image."""
+    resized_frame = cv2.resize(frame, (0, 0), fx=1 / cv_scaler, fy=1 / cv_scaler)
+    return cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+
+
+def lores_luma(yuv, lores_w: int, lores_h: int, scaler: int = 1):
+    """Y plane of a lores YUV420 (I420) array, cropped past stride padding."""
+    luma = np.ascontiguousarray(yuv[:lores_h, :lores_w])
+    if scaler > 1:
+        luma = cv2.resize(luma, (0, 0), fx=1 / scaler, fy=1 / scaler)
+    return luma
+
+
+def lores_rgb(yuv, lores_w: int, out_size: Tuple[int, int]):
+    """Full RGB of a lores YUV420 array at out_size (w, h); only built when faces were found."""
+    rgb = cv2.cvtColor(yuv, cv2.COLOR_YUV420p2RGB)[:, :lores_w]
+    if (rgb.shape[1], rgb.shape[0]) != tuple(out_size):
+        rgb = cv2.resize(rgb, tuple(out_size))
+    return np.ascontiguousarray(rgb)
+
+
+def locate_faces(detect_img, regions: Optional[List[Box]] = None) -> List[Box]:
+    """face_locations on the full image, or only inside regions (boxes mapped back)."""
+    if regions is None:
+        return face_recognition.face_locations(detect_img)
+
+    out = []
+    for top, right, bottom, left in regions:
+        crop = np.ascontiguousarray(detect_img[top:bottom, left:right])
+        if crop.shape[0] < 20 or crop.shape[1] < 20:
+            continue
+        for t, r, b, l in face_recognition.face_locations(crop):
+            out.append((t + top, r + left, b + top, l + left))
+    return out
+
+
+def encode_faces(rgb, locations: List[Box]):
+    if not locations:
+        return []
+    return face_recognition.face_encodings(rgb, locations, model="large")
+
+
+@dataclass
+class DetectJob:
+    """Everything a worker needs for one frame; plain arrays so it pickles cheaply."""
+    kind: str                       # "rgb" (main mode) or "yuv" (lores mode)
+    image: np.ndarray               # detection RGB image, or the raw lores YUV420 array
+    lores_size: Tuple[int, int] = (0, 0)
+    scaler: int = 1
+    regions: Optional[List[Box]] = None
+
+
+@dataclass
+class FramePacket:
+    """One captured frame travelling through the detection pipeline."""
+    seq: int
+    ts: float
+    job: DetectJob
+    gray: np.ndarray                       # grayscale detection image (motion gate / ROI)
+    box_scale: Tuple[float, float]         # detection image -> main frame (x, y)
+    frame: Optional[np.ndarray] = None     # main frame (main mode), for the unknown crop
+    request: Optional[object] = None       # lores mode: the held capture request, main is read from it
+
+    def release(self) -> None:
+        """Hand the camera buffer back (once); the packet keeps its detection data."""
+        request, self.request = self.request, None
+        if request is not None:
+            request.release()
+
+
+def detect_and_encode(job: DetectJob):
+    """Worker entry point: returns (locations, encodings) in detection-image coordinates."""
+    if job.kind == "yuv":
+        w, h = job.lores_size
+        detect_img = lores_luma(job.image, w, h, job.scaler)
+        locations = locate_faces(detect_img, job.regions)
+        if not locations:
+            return [], []
+        rgb = lores_rgb(job.image, w, (detect_img.shape[1], detect_img.shape[0]))
+    else:
+        rgb = job.image
+        locations = locate_faces(rgb, job.regions)
+    return locations, encode_faces(rgb, locations)
@@ -0,0 +1,201 @@
+"""
+hazards.py
+----------
+Flame / gas hazard detection over the sensor sample stream.
+
+Each rule watches one signal and is debounced and hysteretic:
+  - ON  when at least min_fraction of the samples in the last window_s are
+        beyond the `on` threshold (and at least min_samples are in the window)
+  - OFF when at least min_fraction of them are back on the safe side of
+        `off` (off is less extreme than on, so a value hovering around the
+        threshold does not flap)
+Rules with require_warm ignore samples taken while the MQ-2 warms up.
+Turning ON fires a HazardEvent unless the rule fired less than cooldown_s
+ago; if it is still on when the cooldown ends, it fires then. Turning OFF
+always reports an "off" event.
+
+Every sample is O(1) per rule: the windows are deques with running counts
+(each sample is pushed and popped once).
+
+Signals: flame_val, mq2_val and mq2_rate (MQ-2 change per second over
+rate_window_s, of a median-of-3 + EWMA smoothed value, so one spike does not
+look like a leak). More can be added to SIGNALS.
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass
+class HazardRule:
+    name: str
+    kind: str                     # alert type ("flame" / "gas"), shared by several rules
+    signal: str                   # key of SIGNALS
+    op: str                       # "above" or "below"
+    on: float
+    off: float
+    window_s: float = 1.0
+    min_fraction: float = 0.8
+    min_samples: int = 1
+    cooldown_s: float = 20.0
+    require_warm: bool = False    # skip samples taken while the MQ-2 warms up
+    stop: bool = False            # ask the robot to STOP when it turns on
+
+
+@dataclass
+class HazardEvent:
+    rule: str
+    kind: str
+    state: str                    # "on" / "off"
+    value: float                  # signal value of the sample that flipped the rule
+    t: float
+    stop: bool = False
+    suppressed: bool = False      # turned on within cooldown_s: no alert
+
+
+class _RuleState:
+    def __init__(self, rule: HazardRule):
+        if rule.op not in ("above", "below"):
+            raise ValueError(f"{rule.name}: op must be 'above' or 'below'")
+        sign = 1.0 if rule.op == "above" else -1.0
+        if sign * (rule.on - rule.off) < 0:
+            raise ValueError(f"{rule.name}: 'off' must be on the safe side of 'on'")
+        self.rule = rule
+        self.sign = sign
+        self.window: Deque[Tuple[float, bool, bool]] = collections.deque()   # (t, beyond on, beyond off)
+        self.n_on = 0
+        self.n_off = 0
+        self.active = False
+        self.pending = False          # turned on during the cooldown, not alerted yet
+        self.last_fired = -math.inf
+        self.fired = 0
+        self.suppressed = 0
+
+    def reset(self) -> None:
+        self.window.clear()
+        self.n_on = self.n_off = 0
+        self.active = self.pending = False
+
+    def update(self, t: float, value: float) -> Optional[HazardEvent]:
+        r = self.rule
+        hot = self.sign * (value - r.on) >= 0
+        past_off = self.sign * (value - r.off) > 0
+        self.window.append((t, hot, past_off))
+        self.n_on += hot
+        self.n_off += past_off
+        horizon = t - r.window_s
+        while self.window[0][0] < horizon:
+            _, h, w = self.window.popleft()
+            self.n_on -= h
+            self.n_off -= w
+
+        n = len(self.window)
+        if n < r.min_samples:
+            return None
+        if not self.active and self.n_on >= r.min_fraction * n:
+            self.active = True
+            if t - self.last_fired < r.cooldown_s:
+                self.pending = True
+                self.suppressed += 1
+                return HazardEvent(r.name, r.kind, "on", value, t, False, suppressed=True)
+            return self._fire(t, value)
+        if self.active and n - self.n_off >= r.min_fraction * n:
+            self.active = self.pending = False
+            return HazardEvent(r.name, r.kind, "off", value, t)
+        if self.pending and t - self.last_fired >= r.cooldown_s:
+            return self._fire(t, value)
+        return None
+
+    def _fire(self, t: float, value: float) -> HazardEvent:
+        self.pending = False
+        self.last_fired = t
+        self.fired += 1
+        return HazardEvent(self.rule.name, self.rule.kind, "on", value, t, self.rule.stop)
+
+
+class _Rate:
+    """d(value)/dt of a median-of-3 + EWMA smoothed value, measured over `window_s`."""
+
+    def __init__(self, window_s: float):
+        self.window_s = window_s
+        self.tau = window_s / 4.0
+        self.last3: Deque[float] = collections.deque(maxlen=3)
+        self.ewma: Optional[float] = None
+        self.last_t = 0.0
+        self.hist: Deque[Tuple[float, float]] = collections.deque()
+        self.value = 0.0
+
+    def update(self, t: float, x: float) -> float:
+        self.last3.append(x)
+        x = sorted(self.last3)[len(self.last3) // 2]
+        if self.ewma is None:
+            self.ewma = x
+        else:
+            a = 1.0 - math.exp(-max(0.0, t - self.last_t) / self.tau)
+            self.ewma += a * (x - self.ewma)
+        self.last_t = t
+        self.hist.append((t, self.ewma))
+        while len(self.hist) > 2 and self.hist[1][0] <= t - self.window_s:
+            self.hist.popleft()
+        t0, v0 = self.hist[0]
+        self.value = (self.ewma - v0) / (t - t0) if t - t0 >= self.window_s / 2 else 0.0
+        return self.value
+
+
+SIGNALS: Dict[str, Callable[["HazardEngine", object], float]] = {
+    "flame_val": lambda eng, s: float(s.flame_val),
+    "mq2_val": lambda eng, s: float(s.mq2_val),
+    "mq2_rate": lambda eng, s: eng.mq2_rate.value,
+}
+
+
+class HazardEngine:
+    def __init__(self, rules: List[HazardRule], rate_window_s: float = 5.0):
+        self._rules = [_RuleState(r) for r in rules]
+        for r in rules:
+            if r.signal not in SIGNALS:
+                raise ValueError(f"{r.name}: unknown signal {r.signal!r} (have: {', '.join(SIGNALS)})")
+        self.mq2_rate = _Rate(rate_window_s)
+        self.samples = 0
+
+    @classmethod
+    def from_config(cls, rules: List[dict], rate_window_s: float = 5.0) -> "HazardEngine":
+        return cls([HazardRule(**r) for r in rules], rate_window_s=rate_window_s)
+
+    def process(self, sample) -> List[HazardEvent]:
+        """
+        sample: anything with updated_at, mq2_val, flame_val, warm
+        (SensorState works). Returns the rules that flipped on this sample.
+        """
+        t = sample.updated_at
+        self.samples += 1
+        self.mq2_rate.update(t, sample.mq2_val)
+        out = []
+        for st in self._rules:
+            if st.rule.require_warm and sample.warm:
+                if st.active or st.window:
+                    st.reset()
+                continue
+            ev = st.update(t, SIGNALS[st.rule.signal](self, sample))
+            if ev is not None:
+                out.append(ev)
+        return out
+
+    def active(self) -> Dict[str, bool]:
+        """kind -> any rule of that kind is on (for the dashboard)."""
+        out: Dict[str, bool] = {}
+        for st in self._rules:
+            out[st.rule.kind] = out.get(st.rule.kind, False) or st.active
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "samples": self.samples,
+            "mq2_rate": round(self.mq2_rate.value, 2),
+            "rules": {st.rule.name: {"active": st.active, "fired": st.fired, "suppressed": st.suppressed}
+                      for st in self._rules},
+        }
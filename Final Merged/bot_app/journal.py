@@ -0,0 +1,187 @@
+"""
+journal.py
+----------
+Append-only event journal (SQLite, WAL mode) for face sightings, unknown
+face alerts, sensor hazards and robot commands.
+
+record() only puts the event on a bounded queue and returns; a background
+thread writes queued events in one transaction per batch (up to batch_size
+events or flush_s seconds), so the detection loop and the serial reader
+never wait on the SD card. If the queue is full the event is dropped and
+counted.
+
+Table: events(id, ts, type, name, data) with indexes on ts and (type, ts);
+`data` is the rest of the event as JSON. Queries page newest-first with an
+id cursor (`before`), so deep pages cost the same as the first one.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id   INTEGER PRIMARY KEY,
+    ts   REAL NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_type_ts ON events (type, ts);
+"""
+
+
+class EventJournal:
+    def __init__(self, path: str, batch_size: int = 200, flush_s: float = 1.0,
+                 max_queue: int = 10000, keep_days: float = 90.0):
+        self.path = path
+        self.batch_size = int(batch_size)
+        self.flush_s = float(flush_s)
+        self.keep_days = float(keep_days)
+        self._q: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._run = False
+        self._th: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "commits": 0, "pruned": 0,
+                      "last_commit_ms": 0.0}
+
+        db = self._connect()
+        db.executescript(SCHEMA)
+        db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")   # WAL: a power cut loses the last commits, never the file
+        return db
+
+    def start(self) -> None:
+        if self._th and self._th.is_alive():
+            return
+        self._run = True
+        self._th = threading.Thread(target=self._writer_loop, daemon=True)
+        self._th.start()
+
+    def close(self) -> None:
+        """Write what is queued and stop the writer."""
+        self._run = False
+        if self._th:
+            self._th.join(timeout=5.0)
+
+    def record(self, type_: str, name: Optional[str] = None, **data) -> bool:
+        """Never blocks. False if the queue is full (event dropped)."""
+        try:
+            self._q.put_nowait((time.time(), type_, name, data))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["recorded"] += 1
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        return self._q.qsize()
+
+    def _writer_loop(self) -> None:
+        db = self._connect()
+        try:
+            while self._run or not self._q.empty():
+                try:
+                    first = self._q.get(timeout=0.5)
+                except queue.Empty:
+                    self._maybe_prune(db)
+                    continue
+                batch = [first]
+                deadline = time.time() + self.flush_s
+                while len(batch) < self.batch_size and self._run:
+                    try:
+                        batch.append(self._q.get(timeout=max(0.0, deadline - time.time())))
+                    except queue.Empty:
+                        break
+                while len(batch) < self.batch_size:   # closing: take the rest without waiting
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write(db, batch)
+                self._maybe_prune(db)
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: List[tuple]) -> None:
+        rows = [(ts, t, name, json.dumps(data, separators=(",", ":")) if data else None)
+                for ts, t, name, data in batch]
+        t0 = time.perf_counter()
+        try:
+            with db:
+                db.executemany("INSERT INTO events (ts, type, name, data) VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print("[WARN] Journal write failed:", e)
+            self.stats["dropped"] += len(rows)
+            return
+        self.stats["written"] += len(rows)
+        self.stats["commits"] += 1
+        self.stats["last_commit_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+    def _maybe_prune(self, db: sqlite3.Connection) -> None:
+        now = time.time()
+        if self.keep_days <= 0 or now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        try:
+            with db:
+                cur = db.execute("DELETE FROM events WHERE ts < ?", (now - self.keep_days * 86400,))
+            self.stats["pruned"] += cur.rowcount
+        except sqlite3.Error as e:
+            print("[WARN] Journal prune failed:", e)
+
+    def query(self, types: Optional[Iterable[str]] = None, name: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              before: Optional[int] = None, limit: int = 50) -> Dict[str, object]:
+        """
+        Newest first. since/until are unix times (negative since = seconds
+        before now); pass the returned `next` as `before` for the next page.
+        """
+        where, args = [], []
+        types = [t for t in (types or []) if t]
+        if types:
+            where.append(f"type IN ({','.join('?' * len(types))})")
+            args += types
+        if name:
+            where.append("name = ?")
+            args.append(name)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(time.time() + since if since < 0 else since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        if before is not None:
+            where.append("id < ?")
+            args.append(int(before))
+        limit = max(1, min(500, int(limit)))
+        sql = "SELECT id, ts, type, name, data FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+
+        db = sqlite3.connect(self.path, timeout=5.0)   # readers never wait on the writer in WAL mode
+        try:
+            rows = db.execute(sql, args + [limit + 1]).fetchall()
+        finally:
+            db.close()
+        events = []
+        for id_, ts, type_, name_, data in rows[:limit]:
+            ev = {"id": id_, "ts": ts, "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                  "type": type_, "name": name_}
+            if data:
+                ev.update(json.loads(data))
+            events.append(ev)
+        more = len(rows) > limit
+        return {"events": events, "next": events[-1]["id"] if more else None}
@@ -0,0 +1,115 @@
+"""
+motion.py
+---------
+Motion gate in front of face recognition.
+
+A running-average background model on a small grayscale copy of the
+detection image decides whether anything changed. Static frames skip HOG +
+encoding entirely; moving frames report the bounding regions of the motion
+so detection can be limited to them.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left) like face_recognition
+
+
+def pad_box(box: Box, pad: float, shape) -> Box:
+    """Grow a box by `pad` times its size on every side, clipped to the image."""
+    top, right, bottom, left = box
+    h, w = shape[:2]
+    dy = int((bottom - top) * pad)
+    dx = int((right - left) * pad)
+    return max(0, top - dy), min(w, right + dx), min(h, bottom + dy), max(0, left - dx)
+
+
+def merge_boxes(boxes: Sequence[Box]) -> List[Box]:
+    """Union overlapping boxes until none overlap (few boxes, so O(n^2) is fine)."""
+    out = [tuple(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(out)):
+            for j in range(i + 1, len(out)):
+                a, b = out[i], out[j]
+                if a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]:
+                    out[i] = (min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+                    del out[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return out
+
+
+@dataclass
+class MotionResult:
+    moving: bool
+    fraction: float                                   # share of changed pixels
+    regions: List[Box] = field(default_factory=list)  # in input-image coordinates
+
+
+class MotionGate:
+    def __init__(self,
+                 width: int = 160,
+                 alpha: float = 0.05,
+                 pixel_threshold: int = 25,
+                 min_area: float = 0.002,
+                 keep_alive_s: float = 2.0):
+        self.width = int(width)
+        self.alpha = float(alpha)                  # background learning rate
+        self.pixel_threshold = int(pixel_threshold)  # per-pixel change (0-255)
+        self.min_area = float(min_area)            # changed share of the frame to count as motion
+        self.keep_alive_s = float(keep_alive_s)    # keep detecting this long after motion stops
+
+        self._bg = None
+        self._last_motion = 0.0
+        self.stats = {"frames": 0, "skipped": 0, "motion": 0, "last_fraction": 0.0}
+
+    def check(self, gray: np.ndarray) -> MotionResult:
+        self.stats["frames"] += 1
+        h, w = gray.shape[:2]
+        sw = min(self.width, w)
+        sh = max(1, h * sw // w)
+        small = cv2.resize(gray, (sw, sh), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        if self._bg is None or self._bg.shape != small.shape:
+            self._bg = small.astype(np.float32)
+            self._last_motion = time.time()
+            return MotionResult(True, 1.0)
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._bg))
+        cv2.accumulateWeighted(small, self._bg, self.alpha)
+
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        fraction = float(cv2.countNonZero(mask)) / mask.size
+        self.stats["last_fraction"] = round(fraction, 4)
+
+        now = time.time()
+        if fraction < self.min_area:
+            if now - self._last_motion < self.keep_alive_s:
+                return MotionResult(True, fraction)   # recent motion: keep looking everywhere
+            return MotionResult(False, fraction)
+
+        self._last_motion = now
+        self.stats["motion"] += 1
+
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        sx, sy = w / sw, h / sh
+        regions = []
+        for c in contours:
+            x, y, cw, ch = cv2.boundingRect(c)
+            regions.append((int(y * sy), int((x + cw) * sx), int((y + ch) * sy), int(x * sx)))
+        return MotionResult(True, fraction, merge_boxes(regions))
+
+    def skipped(self) -> None:
+        self.stats["skipped"] += 1
@@ -0,0 +1,209 @@
+"""
+pipeline.py
+-----------
+Pipelined face detection: capture, detection and alerting on separate threads.
+
+  capture thread  -> LatestFrameRing (drop-oldest, bounded; only the newest
+                     frame keeps its camera buffer)
+  dispatch thread -> takes the newest frame whenever a worker is free,
+                     runs the motion gate / ROI planning, submits the frame
+  N workers       -> HOG + 128-d encoding (processes by default, so dlib
+                     really runs on several cores)
+  result thread   -> puts results back in frame order and applies them to
+                     the UnknownDetector (matching, alerts, crops)
+
+A slow Telegram upload or a long HOG pass no longer stops frames from being
+captured and examined. The tracker is not used here: frames are examined out
+of order by several workers, so FaceTracker only fits run_detection_loop.
+"""
+
+from __future__ import annotations
+
+import collections
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+
+from .face_ops import FramePacket, detect_and_encode
+
+
+class LatestFrameRing:
+    """
+    Bounded buffer that drops the oldest frame when full; readers take the newest.
+    Frames that can no longer be taken release their camera request at once.
+    """
+    def __init__(self, capacity: int = 2):
+        self._items: Deque[FramePacket] = collections.deque(maxlen=max(1, int(capacity)))
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item: FramePacket) -> None:
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            for older in self._items:
+                older.release()   # take_latest() never returns them
+            self._items.append(item)
+            self._cond.notify()
+
+    def take_latest(self, timeout: Optional[float] = None) -> Optional[FramePacket]:
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: bool(self._items), timeout):
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)   # older frames are never examined
+            self._items.clear()
+            return item
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class DetectionPipeline:
+    def __init__(self, picam2, detector, workers: int = 2, use_processes: bool = True,
+                 ring_size: int = 2):
+        if detector.tracker is not None:
+            raise ValueError("DetectionPipeline does not use FaceTracker; pass tracker=None")
+        self.picam2 = picam2
+        self.detector = detector
+        self.workers = max(1, int(workers))
+        self.use_processes = bool(use_processes)
+
+        self.ring = LatestFrameRing(ring_size)
+        self._slots = threading.Semaphore(self.workers)
+        self._results: "queue.Queue" = queue.Queue()
+        self._order: Deque[int] = collections.deque()   # seqs in dispatch order
+        self._run = False
+        self._threads = []
+        self._pool = None
+
+        self._seq = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._fps_t0 = time.time()
+        self._fps_n = 0
+        # captured: frames grabbed, examined: sent to a worker, skipped: motion gate said static
+        self.counters = {"captured": 0, "examined": 0, "skipped": 0, "applied": 0, "errors": 0}
+        self.detection_fps = 0.0
+        self.latency_ms = 0.0
+
+    def start(self) -> None:
+        if self._run:
+            return
+        self._run = True
+        if self.use_processes:
+            # spawn: workers start clean instead of forking camera/Flask threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"))
+        else:
+            self._pool = ThreadPoolExecutor(self.workers)
+        for target in (self._capture_loop, self._dispatch_loop, self._result_loop):
+            th = threading.Thread(target=target, daemon=True)
+            th.start()
+            self._threads.append(th)
+
+    def stop(self) -> None:
+        self._run = False
+        self._results.put(None)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "detection_fps": round(self.detection_fps, 2),
+            "latency_ms": round(self.latency_ms, 1),
+            "queue_depth": len(self.ring),
+            "in_flight": self._in_flight,
+            "dropped": self.ring.dropped,
+            **self.counters,
+        }
+
+    # --- stages ---
+
+    def _capture_loop(self) -> None:
+        while self._run:
+            try:
+                self._seq += 1
+                self.ring.put(self.detector.capture_packet(self.picam2, self._seq))
+                self.counters["captured"] += 1
+            except Exception as e:
+                print("Detection capture error:", e)
+                time.sleep(1)
+
+    def _dispatch_loop(self) -> None:
+        while self._run:
+            self._slots.acquire()
+            packet = self.ring.take_latest(timeout=0.5)
+            if packet is None:
+                self._slots.release()
+                continue
+
+            self._order.append(packet.seq)
+            try:
+                go = self.detector.plan(packet)
+            except Exception as e:
+                print("Detection plan error:", e)
+                go = False
+            if not go:
+                packet.release()   # no faces to look for, so no crop from main either
+                self.counters["skipped"] += 1
+                self._slots.release()
+                self._results.put((packet, [], []))
+                continue
+
+            with self._lock:
+                self._in_flight += 1
+            self.counters["examined"] += 1
+            try:
+                fut = self._pool.submit(detect_and_encode, packet.job)
+            except RuntimeError:
+                packet.release()
+                break  # pool shut down by stop()
+            fut.add_done_callback(lambda f, p=packet: self._on_done(p, f))
+
+    def _on_done(self, packet: FramePacket, fut) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        try:
+            locations, encodings = fut.result()
+        except Exception as e:
+            self.counters["errors"] += 1
+            print("Detection worker error:", e)
+            locations, encodings = [], []
+        if not locations:
+            packet.release()   # nothing to crop; do not wait for the frame order
+        self._results.put((packet, locations, encodings))
+
+    def _result_loop(self) -> None:
+        pending: Dict[int, tuple] = {}
+        while self._run:
+            item = self._results.get()
+            if item is None:
+                break
+            packet = item[0]
+            pending[packet.seq] = item
+
+            # apply strictly in frame order; later frames wait for earlier ones
+            while self._order and self._order[0] in pending:
+                packet, locations, encodings = pending.pop(self._order.popleft())
+                try:
+                    self.detector.apply_detections(packet, locations, encodings)
+                except Exception as e:
+                    print("Detection result error:", e)
+                finally:
+                    packet.release()
+                self._count_result(packet)
+
+    def _count_result(self, packet: FramePacket) -> None:
+        self.counters["applied"] += 1
+        now = time.time()
+        self.latency_ms = 0.9 * self.latency_ms + 0.1 * (now - packet.ts) * 1000.0
+        self._fps_n += 1
+        if now - self._fps_t0 >= 2.0:
+            self.detection_fps = self._fps_n / (now - self._fps_t0)  # frames fully handled / s
+            self._fps_t0, self._fps_n = now, 0
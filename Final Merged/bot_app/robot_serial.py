@@ -14,17 +14,33 @@ Protocol (one command per line):
   SPEED <0-255>
 
 Arduino should reply with short status lines (optional).
+The sketch answers every command with "ACK <command>".
+
+Writes go through one writer thread with a small priority queue, so no
+caller ever blocks on the port: send() only enqueues. STOP jumps the queue
+and drops pending motion commands; a motion command identical to the one
+already waiting is merged into it.
+
+With SerialConfig(protocol="auto") the link is upgraded at connect time to
+the compact framed protocol in serial_protocol.py (higher baud, CRC-checked
+frames, batched sensor samples); a sketch that does not answer keeps the
+text protocol.
 """
 
 from __future__ import annotations
 
+import collections
 import threading
 import time
-from dataclasses import dataclass, field
-from typing import Callable, Dict, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from typing import Callable, Deque, Dict, List, Optional
 
 import serial
 
+from .serial_protocol import (FRAME_ACK, FRAME_CMD, FRAME_SENSOR, FrameDecoder, decode_sensor_batch,
+                              encode_frame, parse_proto_reply, proto_request)
+
 
 @dataclass
 class SerialConfig:
@@ -32,6 +48,22 @@ class SerialConfig:
     baud: int = 9600
     timeout_s: float = 0.2
     reconnect_s: float = 2.0
+    max_queue: int = 16        # pending commands (STOP is never refused)
+    ack_timeout_s: float = 1.0
+    protocol: str = "text"     # "text" or "auto" (try the framed protocol, fall back to text)
+    frame_baud: int = 115200   # baud after switching to frames
+    sample_hz: int = 50        # sensor samples per second in frame mode
+    batch: int = 5             # samples per SENSOR frame
+
+
+MOTION_CMDS = {"FWD", "BACK", "LEFT", "RIGHT"}
+
+
+@dataclass
+class _Pending:
+    line: str
+    t_enq: float                                   # perf_counter() at enqueue
+    futures: List[Future] = field(default_factory=list)
 
 
 @dataclass
@@ -55,11 +87,35 @@ class SensorState:
 
 
 class RobotSerial:
-    def __init__(self, cfg: SerialConfig):
+    def __init__(self, cfg: SerialConfig, events=None, history=None, journal=None):
         self.cfg = cfg
+        # optional EventHub: sensor deltas + link up/down go to the dashboard push channel
+        self.events = events
+        # optional SensorHistory: every sample goes into its ring buffer / rollups
+        self.history = history
+        # optional EventJournal: every command actually written to the port
+        self.journal = journal
         self._lock = threading.Lock()
         self._ser: Optional[serial.Serial] = None
         self._last_connect_try = 0.0
+        self._connecting = False
+        self.protocol = "text"       # of the current connection
+        self._baud = cfg.baud
+        self._decoder = FrameDecoder()
+        self.link_stats = {"protocol": "text", "baud": cfg.baud, "rx_bytes": 0, "samples": 0,
+                           "lost_samples": 0, "crc_errors": 0}
+        self._last_seq: Optional[int] = None
+
+        # Writer thread: STOP queue + normal queue, ACK futures waiting for the Arduino
+        self._out_cond = threading.Condition()
+        self._urgent: Deque[_Pending] = collections.deque()
+        self._normal: Deque[_Pending] = collections.deque()
+        self._acks: Deque[tuple] = collections.deque()   # (line, future, deadline)
+        self._writer_th: Optional[threading.Thread] = None
+        self._wire_free_at = 0.0     # perf_counter() when the last written line is on the wire
+        self.write_stats = {"queued": 0, "written": 0, "coalesced": 0, "preempted": 0,
+                            "rejected": 0, "failed": 0, "acked": 0,
+                            "stop_latency_ms": 0.0, "stop_latency_max_ms": 0.0}
 
         # Reader thread (for SENSOR lines / debug)
         self._run_reader = False
@@ -76,23 +132,63 @@ class RobotSerial:
                 return True
 
             now = time.time()
-            if now - self._last_connect_try < self.cfg.reconnect_s:
+            if self._connecting or now - self._last_connect_try < self.cfg.reconnect_s:
                 return False
-
             self._last_connect_try = now
-            try:
-                self._ser = serial.Serial(
-                    self.cfg.port,
-                    self.cfg.baud,
-                    timeout=self.cfg.timeout_s,
-                    write_timeout=self.cfg.timeout_s,
-                )
-                # Arduino resets on serial open; give it a moment.
-                time.sleep(2.0)
+            self._connecting = True
+
+        # opened without holding _lock: the 2 s reset wait must not block send()/is_connected
+        try:
+            ser = serial.Serial(
+                self.cfg.port,
+                self.cfg.baud,
+                timeout=self.cfg.timeout_s,
+                write_timeout=self.cfg.timeout_s,
+            )
+            # Arduino resets on serial open; give it a moment.
+            time.sleep(2.0)
+            proto, baud = "text", self.cfg.baud
+            if self.cfg.protocol == "auto" and self._negotiate(ser):
+                proto, baud = "frames", self.cfg.frame_baud
+        except Exception:
+            ser = None
+
+        with self._lock:
+            self._ser = ser
+            self._connecting = False
+            if ser is not None:
+                self.protocol, self._baud = proto, baud
+                self._decoder = FrameDecoder()
+                self._last_seq = None
+                self.link_stats.update(protocol=proto, baud=baud)
+        self._publish_link(ser is not None)
+        return ser is not None
+
+    def _negotiate(self, ser) -> bool:
+        """Ask the sketch for the framed protocol; on "PROTO BIN ..." both sides switch."""
+        request = proto_request(self.cfg.frame_baud, self.cfg.sample_hz, self.cfg.batch)
+        ser.reset_input_buffer()
+        ser.write((request + "\n").encode("ascii"))
+        ser.flush()
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            line = ser.readline().decode("ascii", errors="ignore").strip()
+            if line.startswith("ACK PROTO"):
+                break   # sketch without frame support
+            if parse_proto_reply(line) == (self.cfg.frame_baud, self.cfg.sample_hz, self.cfg.batch):
+                time.sleep(0.05)   # let the Arduino reopen its UART at the new baud
+                ser.baudrate = self.cfg.frame_baud
+                ser.reset_input_buffer()
+                print(f"[INFO] Serial: framed protocol at {self.cfg.frame_baud} baud, "
+                      f"{self.cfg.sample_hz} Hz sensor samples")
                 return True
-            except Exception:
-                self._ser = None
-                return False
+        print("[INFO] Serial: framed protocol not supported, using text")
+        return False
+
+    def _publish_link(self, connected: bool) -> None:
+        if self.events is not None:
+            self.events.publish_state("serial", {"connected": connected, "port": self.cfg.port,
+                                                 "protocol": self.protocol})
 
     @property
     def is_connected(self) -> bool:
@@ -113,15 +209,23 @@ class RobotSerial:
 
     def get_sensor_state(self) -> SensorState:
         with self._sensor_lock:
-            return SensorState(**self._sensor.as_dict())  # copy
+            return replace(self._sensor)  # copy
 
-    def _update_sensor(self, **kwargs) -> None:
+    def _update_sensor(self, at: Optional[float] = None, **kwargs) -> None:
         with self._sensor_lock:
             for k, v in kwargs.items():
                 if hasattr(self._sensor, k):
                     setattr(self._sensor, k, v)
-            self._sensor.updated_at = time.time()
-            snapshot = SensorState(**self._sensor.as_dict())
+            self._sensor.updated_at = time.time() if at is None else at
+            snapshot = replace(self._sensor)   # the one copy handed to listeners
+
+        if self.history is not None:
+            self.history.add(snapshot.updated_at, snapshot.mq2_val, snapshot.flame_val)
+
+        if self.events is not None:
+            values = snapshot.as_dict()
+            values.pop("updated_at")  # changes every line; not a delta by itself
+            self.events.publish_state("sensor", values)
 
         if callable(self._on_sensor):
             try:
@@ -149,40 +253,30 @@ class RobotSerial:
             try:
                 with self._lock:
                     ser = self._ser
+                    framed = self.protocol == "frames"
                 if not ser:
                     time.sleep(0.2)
                     continue
 
+                if framed:
+                    data = ser.read(ser.in_waiting or 1)
+                    if data:
+                        self._on_bytes(data)
+                    continue
+
                 raw = ser.readline()
                 if not raw:
                     continue
+                self.link_stats["rx_bytes"] += len(raw)
 
                 line = raw.decode("utf-8", errors="ignore").strip()
                 if not line:
                     continue
 
-                if line.startswith("SENSOR"):
-                    kv = self._parse_sensor_line(line)
-                    flame = kv.get("FLAME")
-                    gas = kv.get("GAS")
-                    mq2v = kv.get("MQ2VAL")
-                    flv = kv.get("FLAMEVAL")
-                    warm = kv.get("WARM")
-
-                    updates = {}
-                    if flame is not None:
-                        updates["flame"] = flame in ("1", "TRUE", "YES")
-                    if gas is not None:
-                        updates["gas"] = gas in ("1", "TRUE", "YES")
-                    if mq2v is not None and mq2v.isdigit():
-                        updates["mq2_val"] = int(mq2v)
-                    if flv is not None and flv.isdigit():
-                        updates["flame_val"] = int(flv)
-                    if warm is not None:
-                        updates["warm"] = warm in ("1", "TRUE", "YES")
-
-                    if updates:
-                        self._update_sensor(**updates)
+                if line.startswith("ACK "):
+                    self._on_ack(line)
+                elif line.startswith("SENSOR"):
+                    self._on_sensor_line(line)
 
             except Exception:
                 # force reconnect
@@ -193,8 +287,57 @@ class RobotSerial:
                     except Exception:
                         pass
                     self._ser = None
+                self._publish_link(False)
                 time.sleep(0.5)
 
+    def _on_sensor_line(self, line: str) -> None:
+        kv = self._parse_sensor_line(line)
+        flame = kv.get("FLAME")
+        gas = kv.get("GAS")
+        mq2v = kv.get("MQ2VAL")
+        flv = kv.get("FLAMEVAL")
+        warm = kv.get("WARM")
+
+        updates = {}
+        if flame is not None:
+            updates["flame"] = flame in ("1", "TRUE", "YES")
+        if gas is not None:
+            updates["gas"] = gas in ("1", "TRUE", "YES")
+        if mq2v is not None and mq2v.isdigit():
+            updates["mq2_val"] = int(mq2v)
+        if flv is not None and flv.isdigit():
+            updates["flame_val"] = int(flv)
+        if warm is not None:
+            updates["warm"] = warm in ("1", "TRUE", "YES")
+
+        if updates:
+            self.link_stats["samples"] += 1
+            self._update_sensor(**updates)
+
+    def _on_bytes(self, data: bytes) -> None:
+        """Frame mode: decode whatever arrived and dispatch complete frames."""
+        self.link_stats["rx_bytes"] += len(data)
+        now = time.time()
+        for ftype, payload in self._decoder.feed(data):
+            if ftype == FRAME_ACK:
+                self._on_ack("ACK " + payload.decode("ascii", errors="ignore"))
+            elif ftype == FRAME_SENSOR:
+                try:
+                    seq, period_ms, samples = decode_sensor_batch(payload)
+                except Exception:
+                    continue
+                if self._last_seq is not None:
+                    lost = (seq - self._last_seq - 1) & 0xFFFF
+                    self.link_stats["lost_samples"] += lost * len(samples)
+                self._last_seq = seq
+                self.link_stats["samples"] += len(samples)
+                # samples are period_ms apart; the newest one was taken just now
+                for i, smp in enumerate(samples):
+                    at = now - (len(samples) - 1 - i) * period_ms / 1000.0
+                    self._update_sensor(at=at, flame=smp.flame, gas=smp.gas, warm=smp.warm,
+                                        mq2_val=smp.mq2_val, flame_val=smp.flame_val)
+        self.link_stats["crc_errors"] = self._decoder.stats["crc_errors"]
+
     def close(self) -> None:
         self.stop_reader()
         with self._lock:
@@ -206,19 +349,139 @@ class RobotSerial:
 
     def send(self, line: str) -> bool:
         """
-        Sends a single command line (auto adds \\n).
-        Returns True if written, False if not connected.
+        Queue a single command line (auto adds \\n) for the writer thread.
+        Returns at once: True if queued, False if not connected / queue full.
+        """
+        return self._enqueue(line, None)
+
+    def send_with_ack(self, line: str) -> Optional[Future]:
+        """
+        Like send(), but returns a Future (None if not queued) that resolves to
+        True when the Arduino answers "ACK <line>", or False if the command was
+        pre-empted by STOP, could not be written, or no ACK came within
+        cfg.ack_timeout_s.
         """
+        fut: Future = Future()
+        return fut if self._enqueue(line, fut) else None
+
+    def _enqueue(self, line: str, fut: Optional[Future]) -> bool:
+        line = (line or "").strip()
         if not line:
             return False
-
-        if not self.connect():
+        self._ensure_writer()
+        if not self.is_connected:
+            with self._out_cond:
+                self._out_cond.notify()   # writer thread connects if no reader does
             return False
 
+        item = _Pending(line, time.perf_counter(), [fut] if fut else [])
+        dropped: List[_Pending] = []
+        with self._out_cond:
+            if line == "STOP":
+                # pre-empt: motion still waiting would only undo the STOP
+                dropped = [p for p in self._normal if p.line in MOTION_CMDS]
+                self._normal = collections.deque(p for p in self._normal if p.line not in MOTION_CMDS)
+                if self._urgent:
+                    self._urgent[0].futures.extend(item.futures)
+                    self.write_stats["coalesced"] += 1
+                else:
+                    self._urgent.append(item)
+            elif line in MOTION_CMDS and self._normal and self._normal[-1].line == line:
+                self._normal[-1].futures.extend(item.futures)
+                self.write_stats["coalesced"] += 1
+            elif len(self._normal) >= self.cfg.max_queue:
+                self.write_stats["rejected"] += 1
+                return False
+            else:
+                self._normal.append(item)
+            self.write_stats["queued"] += 1
+            self.write_stats["preempted"] += len(dropped)
+            self._out_cond.notify()
+
+        for p in dropped:
+            self._resolve(p.futures, False)
+        return True
+
+    def _ensure_writer(self) -> None:
+        if self._writer_th and self._writer_th.is_alive():
+            return
+        with self._out_cond:
+            if self._writer_th and self._writer_th.is_alive():
+                return
+            self._writer_th = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer_th.start()
+
+    @staticmethod
+    def _resolve(futures: List[Future], ok: bool) -> None:
+        for f in futures:
+            if not f.done():
+                f.set_result(ok)
+
+    def _writer_loop(self) -> None:
+        while True:
+            item = None
+            with self._out_cond:
+                while True:
+                    if self._urgent:
+                        item = self._urgent.popleft()
+                        break
+                    if not self._normal:
+                        self._out_cond.wait(0.5)
+                        break
+                    # pace to the baud rate: bytes never pile up in the OS/USB
+                    # buffer, so a STOP waits behind at most one line on the wire
+                    wait = self._wire_free_at - time.perf_counter()
+                    if wait <= 0:
+                        item = self._normal.popleft()
+                        break
+                    self._out_cond.wait(wait)
+            self._expire_acks()
+
+            if item is None:
+                if not self._run_reader and not self.is_connected:
+                    self.connect()   # nobody else keeps the link up
+                continue
+
+            payload = self._encode(item.line)
+            ok = self._write(payload)
+            if item.line == "STOP":
+                ms = (time.perf_counter() - item.t_enq) * 1000.0
+                self.write_stats["stop_latency_ms"] = round(ms, 2)
+                self.write_stats["stop_latency_max_ms"] = round(max(ms, self.write_stats["stop_latency_max_ms"]), 2)
+            if not ok:
+                self.write_stats["failed"] += 1
+                self._resolve(item.futures, False)
+                self._fail_pending()
+                continue
+            self.write_stats["written"] += 1
+            if self.journal is not None:
+                self.journal.record("command", item.line)
+            now = time.perf_counter()
+            self._wire_free_at = max(now, self._wire_free_at) + self._wire_time(item.line, payload)
+            deadline = time.time() + self.cfg.ack_timeout_s
+            with self._out_cond:
+                for f in item.futures:
+                    self._acks.append((item.line, f, deadline))
+
+    def _wire_time(self, line: str, payload: bytes) -> float:
+        """
+        Seconds one command keeps the link busy. The Arduino answers every
+        command, so the reply direction counts too (it also carries SENSOR
+        data, hence the headroom): pacing only the Pi -> Arduino bytes lets the
+        sketch fall behind on ACKs and a STOP ends up waiting in its buffer.
+        """
+        reply = len(payload) if self.protocol == "frames" else len(line) + 6   # "ACK <line>\r\n"
+        return max(len(payload), reply) * 10.0 / self._baud * 1.25
+
+    def _encode(self, line: str) -> bytes:
+        if self.protocol == "frames":
+            return encode_frame(FRAME_CMD, line.encode("ascii", errors="ignore"))
+        return (line + "\n").encode("utf-8")
+
+    def _write(self, payload: bytes) -> bool:
         with self._lock:
             try:
                 assert self._ser is not None
-                payload = (line.strip() + "\n").encode("utf-8")
                 self._ser.write(payload)
                 self._ser.flush()
                 return True
@@ -230,7 +493,41 @@ class RobotSerial:
                 except Exception:
                     pass
                 self._ser = None
-                return False
+        self._publish_link(False)
+        return False
+
+    def _fail_pending(self) -> None:
+        """Link lost: queued commands are dropped, never replayed after a reconnect."""
+        with self._out_cond:
+            pending = list(self._urgent) + list(self._normal)
+            self._urgent.clear()
+            self._normal.clear()
+        for p in pending:
+            self._resolve(p.futures, False)
+
+    def _on_ack(self, line: str) -> None:
+        cmd = line[4:].strip().upper()
+        with self._out_cond:
+            for i, (sent, fut, _deadline) in enumerate(self._acks):
+                if sent.upper() == cmd:
+                    del self._acks[i]
+                    break
+            else:
+                return
+        self.write_stats["acked"] += 1
+        self._resolve([fut], True)
+
+    def _expire_acks(self) -> None:
+        now = time.time()
+        expired = []
+        with self._out_cond:
+            while self._acks and self._acks[0][2] < now:
+                expired.append(self._acks.popleft()[1])
+        self._resolve(expired, False)
+
+    def queue_depth(self) -> int:
+        with self._out_cond:
+            return len(self._urgent) + len(self._normal)
 
     # Convenience wrappers
     def stop(self) -> bool: return self.send("STOP")
@@ -0,0 +1,133 @@
+"""
+sensor_history.py
+-----------------
+Fixed-size history of the MQ-2 and flame readings.
+
+All storage is preallocated numpy arrays, so memory stays the same after
+weeks of uptime:
+  - raw ring of the last raw_capacity samples (time, mq2, flame)
+  - min / max / mean rollups at 1 s, 1 min and 1 h, each a ring of buckets
+
+Every sample updates one bucket per resolution in place (O(1)); a query
+only looks at the buckets of the requested resolution, never at raw
+samples. Samples older than a bucket's current contents are dropped.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+# name -> (bucket seconds, buckets kept): 1 hour of 1 s, 1 day of 1 min, 60 days of 1 h
+RESOLUTIONS = {"1s": (1, 3600), "1m": (60, 1440), "1h": (3600, 1440)}
+CHANNELS = ("mq2", "flame")
+
+
+class Rollup:
+    """Ring of `slots` buckets of `res_s` seconds with count/min/max/sum per channel."""
+
+    def __init__(self, res_s: int, slots: int):
+        self.res_s = int(res_s)
+        self.slots = int(slots)
+        self.bucket = np.full(self.slots, -1, dtype=np.int64)     # bucket number (time // res_s)
+        self.n = np.zeros(self.slots, dtype=np.int32)
+        self.min = np.zeros((self.slots, len(CHANNELS)), dtype=np.float32)
+        self.max = np.zeros((self.slots, len(CHANNELS)), dtype=np.float32)
+        self.sum = np.zeros((self.slots, len(CHANNELS)), dtype=np.float64)
+
+    def add(self, ts: float, values) -> None:
+        b = int(ts // self.res_s)
+        i = b % self.slots
+        if self.bucket[i] != b:
+            if b < self.bucket[i]:
+                return   # too old: the slot already holds a newer bucket
+            self.bucket[i] = b
+            self.n[i] = 0
+            self.min[i] = values
+            self.max[i] = values
+            self.sum[i] = 0.0
+        self.n[i] += 1
+        for c, v in enumerate(values):
+            if v < self.min[i, c]:
+                self.min[i, c] = v
+            if v > self.max[i, c]:
+                self.max[i, c] = v
+            self.sum[i, c] += v
+
+    def query(self, t_from: float, t_to: float) -> Dict[str, object]:
+        b0, b1 = int(t_from // self.res_s), int(t_to // self.res_s)
+        idx = np.nonzero((self.bucket >= b0) & (self.bucket <= b1) & (self.n > 0))[0]
+        idx = idx[np.argsort(self.bucket[idx])]
+        n = self.n[idx]
+        out: Dict[str, object] = {"t": (self.bucket[idx] * self.res_s).tolist(), "n": n.tolist()}
+        for c, name in enumerate(CHANNELS):
+            out[name] = {
+                "min": self.min[idx, c].tolist(),
+                "max": self.max[idx, c].tolist(),
+                "mean": np.round(self.sum[idx, c] / n, 1).tolist(),
+            }
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return self.bucket.nbytes + self.n.nbytes + self.min.nbytes + self.max.nbytes + self.sum.nbytes
+
+
+class SensorHistory:
+    def __init__(self, raw_capacity: int = 3000, resolutions=RESOLUTIONS):
+        self._lock = threading.Lock()
+        self.raw_capacity = int(raw_capacity)
+        self._raw_t = np.zeros(self.raw_capacity, dtype=np.float64)
+        self._raw_v = np.zeros((self.raw_capacity, len(CHANNELS)), dtype=np.uint16)
+        self._raw_head = 0          # next write position
+        self._raw_count = 0
+        self.rollups = {name: Rollup(res_s, slots) for name, (res_s, slots) in resolutions.items()}
+        self.samples = 0
+
+    def add(self, ts: float, mq2: int, flame: int) -> None:
+        values = (mq2, flame)
+        with self._lock:
+            i = self._raw_head
+            self._raw_t[i] = ts
+            self._raw_v[i] = values
+            self._raw_head = (i + 1) % self.raw_capacity
+            self._raw_count = min(self._raw_count + 1, self.raw_capacity)
+            for r in self.rollups.values():
+                r.add(ts, values)
+            self.samples += 1
+
+    def query(self, res: str = "1m", t_from: Optional[float] = None, t_to: Optional[float] = None) -> Dict[str, object]:
+        """
+        res: "raw" or a key of RESOLUTIONS. t_from / t_to are unix times;
+        a negative t_from means "seconds before now". Default: all that is kept.
+        """
+        now = time.time()
+        if t_to is None:
+            t_to = now
+        if t_from is not None and t_from < 0:
+            t_from = now + t_from
+
+        with self._lock:
+            if res == "raw":
+                # oldest first: the ring from head onwards, then from the start
+                order = (np.arange(self._raw_count) + self._raw_head - self._raw_count) % self.raw_capacity
+                t = self._raw_t[order]
+                keep = order[(t >= (t_from if t_from is not None else 0.0)) & (t <= t_to)]
+                out = {"t": self._raw_t[keep].round(3).tolist()}
+                for c, name in enumerate(CHANNELS):
+                    out[name] = self._raw_v[keep, c].tolist()
+                return {"res": "raw", **out}
+
+            r = self.rollups.get(res)
+            if r is None:
+                raise KeyError(res)
+            if t_from is None:
+                t_from = t_to - r.res_s * r.slots
+            return {"res": res, "res_s": r.res_s, **r.query(t_from, t_to)}
+
+    def stats(self) -> Dict[str, object]:
+        nbytes = self._raw_t.nbytes + self._raw_v.nbytes + sum(r.nbytes for r in self.rollups.values())
+        return {"samples": self.samples, "raw_kept": self._raw_count, "memory_kb": round(nbytes / 1024, 1)}
@@ -0,0 +1,131 @@
+"""
+serial_protocol.py
+------------------
+Compact framed protocol for the Pi <-> Arduino link (optional; the text
+protocol stays the default and the fallback).
+
+Negotiation (in text, at the configured baud, right after connect):
+  Pi:      PROTO BIN <baud> <sample_hz> <batch>
+  Arduino: PROTO BIN <baud> <sample_hz> <batch>   (then both switch)
+An older sketch answers "ACK PROTO ..." or nothing, and the link stays text.
+
+Frame (little endian):
+  0xA5 | type | len | payload[len] | crc16 lo | crc16 hi
+crc16 is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over type, len and
+payload. A frame with a bad CRC is dropped and the decoder resyncs on the
+next 0xA5.
+
+Types:
+  CMD     payload = command text ("STOP", "SPEED 120", ...)
+  ACK     payload = command text
+  TEXT    payload = free text (debug prints from the sketch)
+  SENSOR  payload = seq u16, period_ms u8, count u8, then count samples of
+          flags u8 (bit0 flame, bit1 gas, bit2 warm), mq2 u16, flame u16
+"""
+
+from __future__ import annotations
+
+import binascii
+import struct
+from typing import List, NamedTuple, Tuple
+
+SYNC = 0xA5
+FRAME_CMD, FRAME_ACK, FRAME_TEXT, FRAME_SENSOR = 0x01, 0x02, 0x03, 0x10
+MAX_PAYLOAD = 255
+OVERHEAD = 5                      # sync, type, len, crc16
+
+_BATCH_HEAD = struct.Struct("<HBB")
+_SAMPLE = struct.Struct("<BHH")
+MAX_BATCH = (MAX_PAYLOAD - _BATCH_HEAD.size) // _SAMPLE.size
+
+FLAG_FLAME, FLAG_GAS, FLAG_WARM = 0x01, 0x02, 0x04
+
+
+class Sample(NamedTuple):
+    flame: bool
+    gas: bool
+    warm: bool
+    mq2_val: int
+    flame_val: int
+
+
+def crc16(data: bytes) -> int:
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(ftype: int, payload: bytes = b"") -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("payload too long")
+    body = bytes((ftype, len(payload))) + payload
+    return bytes((SYNC,)) + body + struct.pack("<H", crc16(body))
+
+
+def encode_sensor_batch(seq: int, period_ms: int, samples: List[Sample]) -> bytes:
+    if not 0 < len(samples) <= MAX_BATCH:
+        raise ValueError(f"1..{MAX_BATCH} samples per frame")
+    out = [_BATCH_HEAD.pack(seq & 0xFFFF, max(0, min(255, period_ms)), len(samples))]
+    for s in samples:
+        flags = (FLAG_FLAME if s.flame else 0) | (FLAG_GAS if s.gas else 0) | (FLAG_WARM if s.warm else 0)
+        out.append(_SAMPLE.pack(flags, s.mq2_val & 0xFFFF, s.flame_val & 0xFFFF))
+    return encode_frame(FRAME_SENSOR, b"".join(out))
+
+
+def decode_sensor_batch(payload: bytes) -> Tuple[int, int, List[Sample]]:
+    """Returns (seq, period_ms, samples), oldest sample first."""
+    seq, period_ms, count = _BATCH_HEAD.unpack_from(payload)
+    if len(payload) != _BATCH_HEAD.size + count * _SAMPLE.size:
+        raise ValueError("bad sensor batch length")
+    samples = []
+    for flags, mq2, flame in _SAMPLE.iter_unpack(payload[_BATCH_HEAD.size:]):
+        samples.append(Sample(bool(flags & FLAG_FLAME), bool(flags & FLAG_GAS),
+                              bool(flags & FLAG_WARM), mq2, flame))
+    return seq, period_ms, samples
+
+
+class FrameDecoder:
+    """Incremental decoder: feed() raw bytes, get back complete (type, payload) frames."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.stats = {"frames": 0, "crc_errors": 0, "skipped_bytes": 0}
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        buf = self._buf
+        buf += data
+        frames = []
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                self.stats["skipped_bytes"] += len(buf)
+                buf.clear()
+                break
+            if start:
+                self.stats["skipped_bytes"] += start
+                del buf[:start]
+            if len(buf) < 3:
+                break
+            end = 3 + buf[2] + 2
+            if len(buf) < end:
+                break
+            body = bytes(buf[1:end - 2])
+            if crc16(body) != buf[end - 2] | buf[end - 1] << 8:
+                self.stats["crc_errors"] += 1
+                del buf[:1]            # not a frame start after all; look for the next sync
+                continue
+            frames.append((body[0], body[2:]))
+            self.stats["frames"] += 1
+            del buf[:end]
+        return frames
+
+
+def proto_request(baud: int, sample_hz: int, batch: int) -> str:
+    return f"PROTO BIN {int(baud)} {int(sample_hz)} {int(batch)}"
+
+
+def parse_proto_reply(line: str):
+    """(baud, sample_hz, batch) if line accepts the framed protocol, else None."""
+    parts = line.strip().upper().split()
+    if len(parts) != 5 or parts[:2] != ["PROTO", "BIN"] or not all(p.isdigit() for p in parts[2:]):
+        return None
+    return int(parts[2]), int(parts[3]), int(parts[4])
+
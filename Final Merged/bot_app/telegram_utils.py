@@ -1,22 +1,204 @@
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
 import requests
 from config.telegram_config import BOT_TOKEN, CHAT_ID
 
-def send_telegram_alert(message: str, image_path: str | None = None):
+TELEGRAM_API = "https://api.telegram.org"
+CAPTION_MAX = 1024      # Telegram caption limit
+MEDIA_GROUP_MAX = 10    # photos per sendMediaGroup
+
+
+def send_telegram_alert(message: str, image_path: str | None = None, image_bytes: bytes | None = None):
+    """Blocking send. With a photo, the message goes as its caption (one request)."""
     try:
-        msg_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        r1 = requests.post(msg_url, data={"chat_id": CHAT_ID, "text": message}, timeout=10)
-        print("TG message:", r1.status_code)
-
-        if image_path:
-            photo_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto"
-            with open(image_path, "rb") as photo:
-                r2 = requests.post(
-                    photo_url,
-                    data={"chat_id": CHAT_ID},
-                    files={"photo": photo},
-                    timeout=25
-                )
-            print("TG photo:", r2.status_code)
+        if image_bytes is None and image_path:
+            with open(image_path, "rb") as f:
+                image_bytes = f.read()
+
+        if image_bytes is None:
+            msg_url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendMessage"
+            r1 = requests.post(msg_url, data={"chat_id": CHAT_ID, "text": message}, timeout=10)
+            print("TG message:", r1.status_code)
+            return
+
+        photo_url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendPhoto"
+        r2 = requests.post(
+            photo_url,
+            data={"chat_id": CHAT_ID, "caption": message[:CAPTION_MAX]},
+            files={"photo": ("alert.jpg", image_bytes, "image/jpeg")},
+            timeout=25
+        )
+        print("TG photo:", r2.status_code)
 
     except Exception as e:
         print("[ERROR] Telegram failed:", e)
+
+
+@dataclass
+class Alert:
+    kind: str                      # "unknown", "flame", "gas", ... (rate limits are per kind)
+    messages: List[str]
+    photos: List[bytes] = field(default_factory=list)   # JPEG bytes, encoded once by the caller
+    first_ts: float = 0.0
+    count: int = 1
+
+
+class AlertDispatcher:
+    """
+    Non-blocking Telegram alerts.
+
+    enqueue() only puts the alert on a bounded queue; a background thread
+    sends it over one keep-alive requests.Session. Alerts of the same kind
+    arriving within coalesce_s (or while that kind is rate limited) are
+    merged into one message. Photos travel as JPEG bytes: one photo goes out
+    as a single sendPhoto with the text as caption, several as one
+    sendMediaGroup album. Failed sends are retried with exponential
+    backoff (Telegram's 429 retry_after is honoured).
+    api_base can point at a local stand-in server (tools/fake_telegram.py).
+    """
+    def __init__(self,
+                 token: str = BOT_TOKEN,
+                 chat_id=CHAT_ID,
+                 api_base: str = TELEGRAM_API,
+                 max_queue: int = 64,
+                 coalesce_s: float = 2.0,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 max_retries: int = 4,
+                 backoff_s: float = 1.0,
+                 max_photos: int = MEDIA_GROUP_MAX):
+        self.base_url = f"{api_base.rstrip('/')}/bot{token}"
+        self.chat_id = chat_id
+        self.coalesce_s = float(coalesce_s)
+        self.rate_limits = dict(rate_limits or {})   # kind -> min seconds between sends
+        self.max_retries = int(max_retries)
+        self.backoff_s = float(backoff_s)
+        self.max_photos = max(1, min(MEDIA_GROUP_MAX, int(max_photos)))
+
+        self._q: "queue.Queue[Alert]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._session = requests.Session()
+        self._pending: Dict[str, Alert] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._run = False
+        self._th: Optional[threading.Thread] = None
+
+        self.stats = {"enqueued": 0, "dropped": 0, "coalesced": 0, "sent": 0, "failed": 0, "retries": 0}
+
+    def start(self) -> None:
+        if self._th and self._th.is_alive():
+            return
+        self._run = True
+        self._th = threading.Thread(target=self._loop, daemon=True)
+        self._th.start()
+
+    def stop(self, flush_s: float = 5.0) -> None:
+        """Stop the sender; pending alerts are flushed for up to flush_s."""
+        self._run = False
+        if self._th:
+            self._th.join(timeout=flush_s)
+
+    def enqueue(self, kind: str, message: str, image_path: str | None = None,
+                image_bytes: bytes | None = None) -> bool:
+        """
+        Never blocks. Returns False if the queue is full (alert dropped).
+        Pass image_bytes when the JPEG is already in memory; image_path is
+        only read (once, here) when no bytes are given.
+        """
+        if image_bytes is None and image_path:
+            try:
+                with open(image_path, "rb") as f:
+                    image_bytes = f.read()
+            except OSError as e:
+                print("[ERROR] alert photo missing:", e)
+        alert = Alert(kind, [message], [image_bytes] if image_bytes else [], time.time())
+        try:
+            self._q.put_nowait(alert)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            print("[WARN] alert queue full, dropped:", kind)
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        return self._q.qsize()
+
+    # --- sender thread ---
+
+    def _due(self, alert: Alert) -> float:
+        rate = self.rate_limits.get(alert.kind, 0.0)
+        return max(alert.first_ts + self.coalesce_s, self._last_sent.get(alert.kind, 0.0) + rate)
+
+    def _merge(self, alert: Alert) -> None:
+        cur = self._pending.get(alert.kind)
+        if cur is None:
+            self._pending[alert.kind] = alert
+            return
+        cur.messages.extend(alert.messages)
+        cur.photos.extend(alert.photos)
+        cur.count += alert.count
+        self.stats["coalesced"] += 1
+
+    def _loop(self) -> None:
+        while self._run or self._pending or not self._q.empty():
+            now = time.time()
+            wait = min((self._due(a) for a in self._pending.values()), default=now + 0.5) - now
+            try:
+                self._merge(self._q.get(timeout=max(0.01, min(wait, 0.5))))
+                continue  # drain bursts before sending
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            for kind in [k for k, a in self._pending.items() if not self._run or self._due(a) <= now]:
+                alert = self._pending.pop(kind)
+                self._last_sent[kind] = time.time()
+                self._send(alert)
+
+    def _send(self, alert: Alert) -> None:
+        text = alert.messages[-1]
+        if alert.count > 1:
+            text = f"{text}\n(+{alert.count - 1} more {alert.kind} alert(s) in this burst)"
+
+        photos = alert.photos[-self.max_photos:]   # newest crops win
+        if not photos:
+            ok = self._post("sendMessage", data={"chat_id": self.chat_id, "text": text}, timeout=10)
+        elif len(photos) == 1:
+            ok = self._post("sendPhoto", data={"chat_id": self.chat_id, "caption": text[:CAPTION_MAX]},
+                            files={"photo": ("alert.jpg", photos[0], "image/jpeg")}, timeout=25)
+        else:
+            media = [{"type": "photo", "media": f"attach://photo{i}"} for i in range(len(photos))]
+            media[0]["caption"] = text[:CAPTION_MAX]
+            files = {f"photo{i}": (f"alert{i}.jpg", data, "image/jpeg") for i, data in enumerate(photos)}
+            ok = self._post("sendMediaGroup", data={"chat_id": self.chat_id, "media": json.dumps(media)},
+                            files=files, timeout=40)
+        self.stats["sent" if ok else "failed"] += 1
+
+    def _post(self, method: str, files=None, **kwargs) -> bool:
+        url = f"{self.base_url}/{method}"
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_s * (2 ** attempt)
+            try:
+                r = self._session.post(url, files=files, **kwargs)
+                if r.ok:
+                    return True
+                if r.status_code == 429:
+                    try:
+                        delay = float(r.json()["parameters"]["retry_after"])
+                    except Exception:
+                        pass
+                elif 400 <= r.status_code < 500:
+                    print(f"TG {method}: {r.status_code} (not retried)")
+                    return False
+                print(f"TG {method}: {r.status_code}")
+            except Exception as e:
+                print(f"[ERROR] Telegram {method} failed:", e)
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                time.sleep(delay)
+        return False
@@ -0,0 +1,173 @@
+"""
+tracker.py
+----------
+Cheap face tracking between full detections.
+
+Full HOG detection + 128-d encoding runs every `detect_every` frames, on a
+scene change, or when a track is lost. In between, boxes are moved with
+pyramidal Lucas-Kanade optical flow on the grayscale detection image and
+every track keeps the identity it got when it was first encoded.
+On detection frames, boxes that overlap an existing track (IoU) reuse its
+identity, so only new faces are encoded.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[float, float, float, float]  # (top, right, bottom, left) like face_recognition
+
+
+def iou(a: Box, b: Box) -> float:
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0.0, right - left) * max(0.0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: Box
+    match: object                      # FaceMatch from the frame it was encoded
+    points: Optional[np.ndarray] = field(default=None, repr=False)
+    alerted: bool = False
+    hits: int = 1
+    cluster_id: Optional[int] = None   # unknown visitor (see unknown_clusters.py)
+
+    @property
+    def name(self) -> str:
+        return self.match.name
+
+    def int_box(self) -> Tuple[int, int, int, int]:
+        return tuple(int(round(v)) for v in self.box)
+
+
+class FaceTracker:
+    def __init__(self,
+                 detect_every: int = 8,
+                 scene_change: float = 12.0,
+                 iou_match: float = 0.3,
+                 min_points: int = 4,
+                 max_corners: int = 24):
+        self.detect_every = max(1, int(detect_every))
+        self.scene_change = float(scene_change)   # mean abs diff (0-255) on a 64px thumbnail
+        self.iou_match = float(iou_match)
+        self.min_points = int(min_points)
+        self.max_corners = int(max_corners)
+
+        self.tracks: List[Track] = []
+        self._next_id = 1
+        self._prev_gray: Optional[np.ndarray] = None
+        self._ref_thumb: Optional[np.ndarray] = None
+        self._since_detect = 0
+        self._lost = False
+
+        self.stats = {"frames": 0, "detections": 0, "tracked": 0, "encoded": 0, "reused": 0}
+
+    @staticmethod
+    def _thumb(gray: np.ndarray) -> np.ndarray:
+        h, w = gray.shape[:2]
+        return cv2.resize(gray, (64, max(1, 64 * h // w)), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def needs_detection(self, gray: np.ndarray) -> bool:
+        self.stats["frames"] += 1
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            return True
+        if self._lost or self._since_detect + 1 >= self.detect_every:
+            return True
+        diff = float(np.mean(np.abs(self._thumb(gray) - self._ref_thumb)))
+        return diff > self.scene_change
+
+    def propagate(self, gray: np.ndarray) -> None:
+        """Move every track with optical flow; tracks without enough points are dropped."""
+        self._since_detect += 1
+        self.stats["tracked"] += 1
+        kept = []
+        for t in self.tracks:
+            if t.points is None or len(t.points) < self.min_points:
+                self._lost = True
+                continue
+            nxt, status, _err = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, t.points, None)
+            good = status.reshape(-1) == 1
+            if int(good.sum()) < self.min_points:
+                self._lost = True
+                continue
+            d = np.median(nxt[good] - t.points[good], axis=0).reshape(-1)
+            dx, dy = float(d[0]), float(d[1])
+            top, right, bottom, left = t.box
+            t.box = (top + dy, right + dx, bottom + dy, left + dx)
+            t.points = nxt[good].reshape(-1, 1, 2)
+            kept.append(t)
+        self.tracks = kept
+        self._prev_gray = gray
+
+    def associate(self, boxes: Sequence[Box]) -> List[Optional[Track]]:
+        """For each detected box, the existing track it continues (or None = new face)."""
+        out: List[Optional[Track]] = [None] * len(boxes)
+        used = set()
+        pairs = sorted(((iou(b, t.box), i, j) for i, b in enumerate(boxes)
+                        for j, t in enumerate(self.tracks)), reverse=True)
+        for score, i, j in pairs:
+            if score < self.iou_match:
+                break
+            if out[i] is None and j not in used:
+                out[i] = self.tracks[j]
+                used.add(j)
+        return out
+
+    def commit(self, gray: np.ndarray, boxes: Sequence[Box],
+               continued: Sequence[Optional[Track]], new_matches: Sequence[object]) -> List[Track]:
+        """
+        Replace the track list after a detection frame.
+        continued[i] is the associated track for boxes[i] or None;
+        new_matches holds one FaceMatch per None entry, in order.
+        """
+        new_iter = iter(new_matches)
+        tracks = []
+        for box, prev in zip(boxes, continued):
+            if prev is not None:
+                prev.box = tuple(float(v) for v in box)
+                prev.hits += 1
+                t = prev
+                self.stats["reused"] += 1
+            else:
+                t = Track(self._next_id, tuple(float(v) for v in box), next(new_iter))
+                self._next_id += 1
+                self.stats["encoded"] += 1
+            t.points = self._features(gray, t.box)
+            tracks.append(t)
+
+        self.tracks = tracks
+        self._prev_gray = gray
+        self._ref_thumb = self._thumb(gray)
+        self._since_detect = 0
+        self._lost = False
+        self.stats["detections"] += 1
+        return tracks
+
+    def _features(self, gray: np.ndarray, box: Box) -> Optional[np.ndarray]:
+        h, w = gray.shape[:2]
+        top, right, bottom, left = (int(round(v)) for v in box)
+        top, bottom = max(0, top), min(h, bottom)
+        left, right = max(0, left), min(w, right)
+        if bottom - top < 4 or right - left < 4:
+            return None
+        mask = np.zeros_like(gray, dtype=np.uint8)
+        mask[top:bottom, left:right] = 255
+        pts = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+        return None if pts is None else pts.astype(np.float32)
+
+    def reset(self) -> None:
+        self.tracks = []
+        self._prev_gray = None
+        self._ref_thumb = None
+        self._since_detect = 0
+        self._lost = False
@@ -0,0 +1,298 @@
+"""
+unknown_clusters.py
+-------------------
+Groups unknown-face encodings into visitors, so one person standing at the
+door is one alert and one crop, not one every cooldown.
+
+Online nearest-centroid clustering: an encoding within `threshold` of a
+visitor's centroid (running mean of its encodings) is another sighting of
+that visitor, otherwise it starts a new one. Visitors not seen for ttl_s are
+forgotten; when all max_clusters slots are used, the least recently seen one
+is dropped. Each visitor has its own alert cooldown (realert_s).
+
+Storage is preallocated numpy arrays, one slot per visitor, so a lookup is
+one (max_clusters x 128) distance pass. Per visitor a uniform sample
+(reservoir) of up to `samples` encodings is kept for promote_cluster.py.
+
+The visitors are saved to an .npz file (JSON metadata + float arrays, no
+pickle) and loaded again at startup. Saving runs on a background thread
+(start()): every save_s while something changed, and right away when an
+alert crop was added, so the detection thread never writes the file.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FILE_VERSION = 1
+
+
+@dataclass
+class Visitor:
+    cluster_id: int
+    first_seen: float
+    last_seen: float
+    hits: int = 1                  # encodings assigned (frames / new tracks)
+    alerts: int = 0
+    last_alert: float = -math.inf
+    files: List[str] = field(default_factory=list)   # saved crops, oldest first
+
+
+class UnknownClusters:
+    def __init__(self, threshold: float = 0.45, max_clusters: int = 64, ttl_s: float = 6 * 3600,
+                 realert_s: float = 600.0, samples: int = 8, dim: int = 128,
+                 path: Optional[str] = None, save_s: float = 30.0):
+        self.threshold = float(threshold)
+        self.max_clusters = int(max_clusters)
+        self.ttl_s = float(ttl_s)
+        self.realert_s = float(realert_s)
+        self.samples = int(samples)
+        self.path = path
+        self.save_s = float(save_s)
+
+        self._lock = threading.Lock()
+        self._centroids = np.zeros((self.max_clusters, dim), dtype=np.float64)
+        self._used = np.zeros(self.max_clusters, dtype=bool)
+        self._last_seen = np.zeros(self.max_clusters, dtype=np.float64)
+        self._samples = np.zeros((self.max_clusters, self.samples, dim), dtype=np.float32)
+        self._n_samples = np.zeros(self.max_clusters, dtype=np.int32)
+        self._visitors: Dict[int, Visitor] = {}    # slot -> visitor
+        self._slot_of: Dict[int, int] = {}          # cluster id -> slot
+        self._next_id = 1
+        self._rnd = random.Random()
+        self._dirty = False
+        self._wake = threading.Event()
+        self._th = None
+        self._run = False
+        self.stats = {"assigned": 0, "created": 0, "expired": 0, "evicted": 0, "alerts": 0}
+
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except Exception as e:
+                print("[WARN] ignoring unreadable unknown clusters:", path, e)
+
+    def __len__(self) -> int:
+        return len(self._visitors)
+
+    def assign(self, encoding, now: Optional[float] = None) -> Tuple[int, bool]:
+        """Attach one unknown encoding to a visitor. Returns (cluster id, is new)."""
+        now = time.time() if now is None else now
+        enc = np.asarray(encoding, dtype=np.float64)
+        with self._lock:
+            self._expire(now)
+            slot, new = self._nearest(enc), False
+            if slot is None:
+                slot, new = self._new_slot(enc, now), True
+            else:
+                v = self._visitors[slot]
+                v.hits += 1
+                v.last_seen = now
+                self._centroids[slot] += (enc - self._centroids[slot]) / min(v.hits, 50)
+                self._last_seen[slot] = now
+                self._keep_sample(slot, enc, v.hits)
+            self.stats["assigned"] += 1
+            self._dirty = True
+            return self._visitors[slot].cluster_id, new
+
+    def touch(self, cluster_id: int, now: Optional[float] = None) -> None:
+        """A tracked face is still in view: keep its visitor from expiring."""
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self._slot_of.get(cluster_id)
+            if slot is not None:
+                self._visitors[slot].last_seen = now
+                self._last_seen[slot] = now
+
+    def alert_due(self, cluster_id: int, now: Optional[float] = None) -> bool:
+        """New visitor, or the last alert for it is older than realert_s."""
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self._slot_of.get(cluster_id)
+            return slot is not None and now - self._visitors[slot].last_alert >= self.realert_s
+
+    def mark_alerted(self, cluster_id: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self._slot_of.get(cluster_id)
+            if slot is None:
+                return
+            v = self._visitors[slot]
+            v.alerts += 1
+            v.last_alert = now
+            self.stats["alerts"] += 1
+            self._dirty = True
+
+    def add_file(self, cluster_id: int, filename: str) -> None:
+        """Remember the crop saved for an alert; saved soon after (promote_cluster.py reads it)."""
+        with self._lock:
+            slot = self._slot_of.get(cluster_id)
+            if slot is None:
+                return
+            self._visitors[slot].files.append(filename)
+            self._dirty = True
+        self._wake.set()
+
+    def _nearest(self, enc: np.ndarray) -> Optional[int]:
+        slots = np.flatnonzero(self._used)
+        if len(slots) == 0:
+            return None
+        d = np.linalg.norm(self._centroids[slots] - enc, axis=1)
+        i = int(np.argmin(d))
+        return int(slots[i]) if d[i] <= self.threshold else None
+
+    def _new_slot(self, enc: np.ndarray, now: float) -> int:
+        free = np.flatnonzero(~self._used)
+        if len(free):
+            slot = int(free[0])
+        else:
+            # least recently seen visitor makes room
+            slot = int(np.argmin(self._last_seen))
+            self._drop(slot)
+            self.stats["evicted"] += 1
+        v = Visitor(self._next_id, now, now)
+        self._next_id += 1
+        self._visitors[slot] = v
+        self._slot_of[v.cluster_id] = slot
+        self._used[slot] = True
+        self._centroids[slot] = enc
+        self._last_seen[slot] = now
+        self._n_samples[slot] = 0
+        self._keep_sample(slot, enc, 1)
+        self.stats["created"] += 1
+        return slot
+
+    def _keep_sample(self, slot: int, enc: np.ndarray, seen: int) -> None:
+        # reservoir sampling: every encoding of the visit has the same chance to be kept
+        n = int(self._n_samples[slot])
+        if n < self.samples:
+            self._samples[slot, n] = enc
+            self._n_samples[slot] = n + 1
+            return
+        j = self._rnd.randrange(seen)
+        if j < self.samples:
+            self._samples[slot, j] = enc
+
+    def _expire(self, now: float) -> None:
+        if self.ttl_s <= 0:
+            return
+        for slot in np.flatnonzero(self._used & (self._last_seen < now - self.ttl_s)):
+            self._drop(int(slot))
+            self.stats["expired"] += 1
+
+    def _drop(self, slot: int) -> None:
+        v = self._visitors.pop(slot)
+        del self._slot_of[v.cluster_id]
+        self._used[slot] = False
+        self._dirty = True
+
+    # --- persistence ---
+
+    def start(self) -> None:
+        """Start the saver thread (no-op without a path)."""
+        if not self.path or (self._th and self._th.is_alive()):
+            return
+        self._run = True
+        self._th = threading.Thread(target=self._save_loop, daemon=True)
+        self._th.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the saver thread after a last save of pending changes."""
+        self._run = False
+        self._wake.set()
+        if self._th:
+            self._th.join(timeout=timeout)
+
+    def _save_loop(self) -> None:
+        while True:
+            self._wake.wait(self.save_s)
+            self._wake.clear()
+            if self._dirty:
+                try:
+                    self.save(self.path)
+                except OSError as e:
+                    print("[WARN] cannot save unknown clusters:", e)
+            if not self._run:
+                break
+
+    def save(self, path: str) -> None:
+        """Atomic (tmp file + os.replace); only visitors in use are written."""
+        with self._lock:
+            slots = sorted(self._visitors, key=lambda s: self._visitors[s].cluster_id)
+            clusters, rows = [], []
+            for s in slots:
+                n = int(self._n_samples[s])
+                item = asdict(self._visitors[s])
+                item["last_alert"] = item["last_alert"] if math.isfinite(item["last_alert"]) else None
+                item.update(start=len(rows), count=n)
+                clusters.append(item)
+                rows.extend(self._samples[s, :n])
+            centroids = self._centroids[slots].astype(np.float32)
+            meta = {"version": FILE_VERSION, "next_id": self._next_id, "threshold": self.threshold,
+                    "clusters": clusters}
+            self._dirty = False
+
+        dim = self._centroids.shape[1]
+        tmp = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                 centroids=centroids.reshape(-1, dim),
+                 encodings=np.asarray(rows, dtype=np.float32).reshape(-1, dim))
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        meta, centroids, encodings = read_clusters(path)
+        now = time.time()
+        with self._lock:
+            self._next_id = max(self._next_id, int(meta.get("next_id", 1)))
+            for item, centroid in zip(meta["clusters"], centroids):
+                if self.ttl_s > 0 and item["last_seen"] < now - self.ttl_s:
+                    continue
+                free = np.flatnonzero(~self._used)
+                if not len(free):
+                    break
+                slot = int(free[0])
+                v = Visitor(item["cluster_id"], item["first_seen"], item["last_seen"], item["hits"],
+                            item["alerts"], item["last_alert"] if item["last_alert"] is not None else -math.inf,
+                            list(item["files"]))
+                n = min(int(item["count"]), self.samples)
+                self._visitors[slot] = v
+                self._slot_of[v.cluster_id] = slot
+                self._used[slot] = True
+                self._centroids[slot] = centroid
+                self._last_seen[slot] = v.last_seen
+                self._samples[slot, :n] = encodings[item["start"]:item["start"] + n]
+                self._n_samples[slot] = n
+                self._next_id = max(self._next_id, v.cluster_id + 1)
+        print(f"[INFO] unknown clusters: {len(self._visitors)} visitors loaded")
+
+    def visitors(self) -> List[Dict[str, object]]:
+        """Newest first, for /status and the dashboard."""
+        with self._lock:
+            out = [asdict(v) for v in self._visitors.values()]
+        for v in out:
+            v["last_alert"] = v["last_alert"] if math.isfinite(v["last_alert"]) else None
+        return sorted(out, key=lambda v: v["last_seen"], reverse=True)
+
+    def status(self) -> Dict[str, object]:
+        return {"visitors": len(self._visitors), "max": self.max_clusters, **self.stats}
+
+
+def read_clusters(path: str) -> Tuple[dict, np.ndarray, np.ndarray]:
+    """(meta, centroids, encodings) of a saved clusters file; cluster i's samples are
+    encodings[start:start + count] of meta["clusters"][i]."""
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+        centroids = z["centroids"]
+        encodings = z["encodings"]
+    if meta.get("version") != FILE_VERSION:
+        raise RuntimeError(f"{path} has clusters file version {meta.get('version')}, this code reads {FILE_VERSION}")
+    return meta, centroids, encodings
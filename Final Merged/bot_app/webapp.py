@@ -1,16 +1,32 @@
-from flask import Flask, Response, jsonify, request
+import os
+
+from flask import Flask, Response, abort, jsonify, request, send_from_directory
+from werkzeug.http import http_date
 from .auth import requires_auth
-from .camera_stream import mjpeg_generator
+from .camera_stream import StreamTiers, mjpeg_generator
+from .events import sse_generator
 
 VALID_CMDS = {"STOP", "AUTO_LF", "MANUAL", "FWD", "BACK", "LEFT", "RIGHT"}
 
 
-def create_app(output, robot=None):
+def create_app(output, robot=None, reloader=None, detector=None, pipeline=None, alerts=None, events=None,
+               history=None, hazards=None, journal=None):
     """
-    output: StreamingOutput from camera_stream.create_camera()
-    robot:  RobotSerial (optional). If None, control buttons will show but return 'not connected'.
+    output:   StreamingOutput or StreamTiers from camera_stream.create_camera()
+    robot:    RobotSerial (optional). If None, control buttons will show but return 'not connected'.
+    reloader: EncodingReloader (optional) for POST /encodings/reload
+    detector: UnknownDetector (optional); its stats are added to /status
+    pipeline: DetectionPipeline (optional); fps / queue / dropped counters in /status
+    alerts:   AlertDispatcher (optional); Telegram queue depth / counters in /status
+    events:   EventHub (optional); enables the /events push channel used by the page
+    history:  SensorHistory (optional); /sensors/history and the MQ-2 trend chart
+    hazards:  HazardEngine (optional); rule states / counters in /status
+    journal:  EventJournal (optional); /events/history and the event log card
     """
     app = Flask(__name__)
+    tiers = output if isinstance(output, StreamTiers) else StreamTiers([output])
+    # frame ids restart with the process; the nonce keeps old ETags from matching
+    etag_nonce = os.urandom(3).hex()
 
     PAGE_HTML = r"""
 <!doctype html>
@@ -47,7 +63,7 @@ def create_app(output, robot=None):
     <div class="card">
       <div class="top">
         <div>
-          <b>Live Camera</b><br><small id="host"></small>
+          <b>Live Camera</b><br><small id="host"></small> <small id="faces"></small>
         </div>
         <div>
           <button class="btn" onclick="refreshStream()">Refresh</button>
@@ -98,10 +114,31 @@ def create_app(output, robot=None):
             <div class="row"><div>MQ-2 Value</div><div><b id="mq2Val">-</b></div></div>
             <div class="row"><div>Flame Value</div><div><b id="flameVal">-</b></div></div>
             <div class="row"><div>Warm-up</div><div><span class="pill" id="warmPill">-</span></div></div>
+            <div id="trendBox" hidden>
+              <small class="muted">MQ-2, last 10 min (min–max, mean)</small>
+              <canvas id="trend" width="300" height="70" style="width:100%;display:block"></canvas>
+            </div>
           </div>
         </div>
       </div>
     </div>
+
+    <div class="card wide" id="logCard" hidden>
+      <div class="top">
+        <div><b>Event log</b><br><small class="muted">faces, hazards, commands</small></div>
+        <select class="btn" id="logType" onchange="loadLog(true)">
+          <option value="face,hazard">Faces + hazards</option>
+          <option value="face">Faces</option>
+          <option value="hazard">Hazards</option>
+          <option value="command">Commands</option>
+          <option value="">All</option>
+        </select>
+      </div>
+      <div class="pad" style="padding-top:0">
+        <div id="logRows"></div>
+        <button class="btn wide" id="logMore" style="margin-top:10px" onclick="loadLog(false)" hidden>Older</button>
+      </div>
+    </div>
   </div>
 
 <script>
@@ -120,7 +157,26 @@ def create_app(output, robot=None):
   let holdTimer=null;
   function setStatus(msg){ document.getElementById("st").textContent = msg; }
 
+  // teleop: WebSocket /control when available (async server), else GET /cmd
+  let ws=null, wsSeq=0;
+  function openControl(){
+    if(!window.WebSocket) return;
+    const sock = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/control');
+    sock.onopen = () => { ws = sock; };
+    sock.onmessage = e => {
+      const j = JSON.parse(e.data);
+      const rtt = (j.t !== undefined) ? ' · ' + (performance.now() - j.t).toFixed(0) + ' ms' : '';
+      setStatus((j.ok ? '✅ ' : '⚠️ ') + j.msg + rtt);
+    };
+    sock.onclose = () => { if(ws === sock){ ws = null; setTimeout(openControl, 2000); } };
+  }
+  openControl();
+
   async function sendCmd(cmd){
+    if(ws && ws.readyState === 1){
+      ws.send(JSON.stringify({seq: ++wsSeq, cmd: cmd, t: performance.now()}));
+      return;
+    }
     try{
       setStatus("Sending: " + cmd + " …");
       const r = await fetch("/cmd?c=" + encodeURIComponent(cmd), {cache:"no-store"});
@@ -135,7 +191,8 @@ def create_app(output, robot=None):
   function hold(cmd){
     sendCmd(cmd);
     clearInterval(holdTimer);
-    holdTimer=setInterval(()=>sendCmd(cmd), 250); // keep moving
+    // over /control the repeats are the dead-man heartbeat (server stops after 0.5 s of silence)
+    holdTimer=setInterval(()=>sendCmd(cmd), (ws && ws.readyState === 1) ? 150 : 250); // keep moving
   }
   function release(){
     clearInterval(holdTimer);
@@ -148,29 +205,118 @@ def create_app(output, robot=None):
     sendCmd("SPEED " + v);
   }
 
+  const sensor = {};
+  function showSerial(ok){
+    document.getElementById('serPill').textContent = 'Serial: ' + (ok ? 'OK' : 'OFF');
+  }
+  function showSensor(delta){
+    Object.assign(sensor, delta);
+    document.getElementById('sensorCard').hidden = false;
+    document.getElementById('flamePill').textContent = sensor.flame ? '🔥 DETECTED' : 'OK';
+    document.getElementById('gasPill').textContent = sensor.gas ? '⚠️ BAD' : 'GOOD';
+    document.getElementById('mq2Val').textContent = sensor.mq2_val;
+    document.getElementById('flameVal').textContent = sensor.flame_val;
+    document.getElementById('warmPill').textContent = sensor.warm ? 'WARMING' : 'READY';
+  }
+  function showFaces(f){
+    const parts = (f.names || []).slice();
+    if(f.unknown) parts.push(f.unknown + ' unknown');
+    document.getElementById('faces').textContent = parts.length ? '· ' + parts.join(', ') : '';
+  }
+
   async function pollStatus(){
     try{
       const r = await fetch('/status', {cache:'no-store'});
       const j = await r.json();
-      const card = document.getElementById('sensorCard');
       if(j && j.sensor){
-        card.hidden = false;
-        document.getElementById('serPill').textContent = 'Serial: ' + (j.serial_connected ? 'OK' : 'OFF');
-
-        const flame = !!j.sensor.flame;
-        const gas = !!j.sensor.gas;
-        document.getElementById('flamePill').textContent = flame ? '🔥 DETECTED' : 'OK';
-        document.getElementById('gasPill').textContent = gas ? '⚠️ BAD' : 'GOOD';
-        document.getElementById('mq2Val').textContent = j.sensor.mq2_val;
-        document.getElementById('flameVal').textContent = j.sensor.flame_val;
-        document.getElementById('warmPill').textContent = j.sensor.warm ? 'WARMING' : 'READY';
+        showSerial(j.serial_connected);
+        showSensor(j.sensor);
       }
     }catch(e){
       // ignore
     }
   }
-  setInterval(pollStatus, 700);
+
+  // push channel: sensor deltas, serial link, faces, alerts (falls back to polling)
+  function listen(){
+    const es = new EventSource('/events');
+    es.addEventListener('sensor', e => showSensor(JSON.parse(e.data)));
+    es.addEventListener('serial', e => showSerial(JSON.parse(e.data).connected));
+    es.addEventListener('faces', e => showFaces(JSON.parse(e.data)));
+    es.addEventListener('alert', e => setStatus('🚨 ' + JSON.parse(e.data).kind + ' alert'));
+    es.addEventListener('hazard_clear', e => setStatus('✅ ' + JSON.parse(e.data).kind + ' clear'));
+    es.addEventListener('nopush', () => { es.close(); setInterval(pollStatus, 700); });
+  }
   pollStatus();
+  if(window.EventSource) listen(); else setInterval(pollStatus, 700);
+
+  // MQ-2 trend from the 1 s rollups
+  async function drawTrend(){
+    try{
+      const r = await fetch('/sensors/history?res=1s&from=-600', {cache:'no-store'});
+      if(!r.ok) return;
+      const h = await r.json();
+      if(!h.t || h.t.length < 2) return;
+      document.getElementById('trendBox').hidden = false;
+      const c = document.getElementById('trend'), g = c.getContext('2d');
+      const lo = Math.min(...h.mq2.min), hi = Math.max(...h.mq2.max, lo + 1);
+      const t0 = h.t[0], span = Math.max(1, h.t[h.t.length - 1] - t0);
+      const x = t => (t - t0) / span * c.width, y = v => c.height - 2 - (v - lo) / (hi - lo) * (c.height - 4);
+      g.clearRect(0, 0, c.width, c.height);
+      g.fillStyle = 'rgba(255,255,255,.15)';
+      h.t.forEach((t, i) => g.fillRect(x(t), y(h.mq2.max[i]), Math.max(1, c.width / h.t.length), y(h.mq2.min[i]) - y(h.mq2.max[i]) + 1));
+      g.strokeStyle = '#e9ecf1'; g.beginPath();
+      h.t.forEach((t, i) => i ? g.lineTo(x(t), y(h.mq2.mean[i])) : g.moveTo(x(t), y(h.mq2.mean[i])));
+      g.stroke();
+    }catch(e){
+      // ignore
+    }
+  }
+  drawTrend();
+  setInterval(drawTrend, 5000);
+
+  // event log: newest first, "Older" follows the id cursor
+  let logNext = null;
+  function logText(e){
+    if(e.type === 'face') return (e.name || '?') + (e.distance != null ? ' (' + e.distance + ')' : '');
+    if(e.type === 'hazard') return e.name + ' ' + e.state + (e.suppressed ? ' (cooldown)' : '') + ' · MQ2 ' + e.mq2_val + ' · flame ' + e.flame_val;
+    return e.name || '';
+  }
+  async function loadLog(reset){
+    const type = document.getElementById('logType').value;
+    let url = '/events/history?limit=20&type=' + encodeURIComponent(type);
+    if(!reset && logNext) url += '&before=' + logNext;
+    try{
+      const r = await fetch(url, {cache:'no-store'});
+      if(!r.ok) return;
+      const j = await r.json();
+      document.getElementById('logCard').hidden = false;
+      const box = document.getElementById('logRows');
+      if(reset) box.innerHTML = '';
+      for(const e of j.events){
+        const row = document.createElement('div');
+        row.className = 'row';
+        const left = document.createElement('div');
+        left.textContent = e.type + ': ' + logText(e);
+        if(e.file){
+          const a = document.createElement('a');
+          a.href = '/unknown_faces/' + encodeURIComponent(e.file);
+          a.target = '_blank';
+          a.textContent = ' 📷';
+          left.appendChild(a);
+        }
+        const right = document.createElement('small');
+        right.textContent = e.time;
+        row.append(left, right);
+        box.appendChild(row);
+      }
+      logNext = j.next;
+      document.getElementById('logMore').hidden = !logNext;
+    }catch(e){
+      // ignore
+    }
+  }
+  loadLog(true);
 </script>
 </body>
 </html>
@@ -184,9 +330,62 @@ def create_app(output, robot=None):
     @app.route("/video")
     @requires_auth
     def video():
-        return Response(mjpeg_generator(output),
+        # /video?fps=5&width=640&quality=low&adapt=0
+        try:
+            fps = max(0.0, float(request.args.get("fps", 0)))
+            width = max(0, int(request.args.get("width", 0)))
+        except ValueError:
+            return jsonify(ok=False, msg="fps and width must be numbers"), 400
+        quality = (request.args.get("quality") or "").lower()
+        adaptive = request.args.get("adapt", "1") != "0"
+        return Response(mjpeg_generator(tiers, fps=fps, width=width, quality=quality, adaptive=adaptive),
                         mimetype="multipart/x-mixed-replace; boundary=frame")
 
+    @app.route("/events")
+    @requires_auth
+    def events_stream():
+        if events is None:
+            # tells the page to fall back to polling /status
+            return Response("event: nopush\ndata: {}\n\n", mimetype="text/event-stream")
+        return Response(sse_generator(events), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route("/snapshot.jpg")
+    @requires_auth
+    def snapshot():
+        """
+        Latest JPEG straight from the encoder cache (no encoding, no stream thread).
+          ?width=640       pick a stream tier like /video
+          ?wait_newer=<id> long-poll until a frame newer than <id> exists (?timeout=, max 30 s)
+        If-None-Match with the current ETag -> 304.
+        """
+        try:
+            width = max(0, int(request.args.get("width", 0)))
+            wait_newer = request.args.get("wait_newer")
+            wait_newer = int(wait_newer) if wait_newer is not None else None
+            timeout = min(30.0, max(0.0, float(request.args.get("timeout", 10))))
+        except ValueError:
+            return jsonify(ok=False, msg="width, wait_newer and timeout must be numbers"), 400
+        tier = tiers.index_for(width)
+        out = tiers.outputs[tier]
+
+        if wait_newer is not None:
+            out.wait_newer(wait_newer, timeout=timeout)
+        frame_id, frame, frame_ts = out.latest()
+        if frame is None:
+            return jsonify(ok=False, msg="No frame yet"), 503
+
+        etag = f"{etag_nonce}-{tier}-{frame_id}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Last-Modified": http_date(frame_ts),
+            "Cache-Control": "no-cache",
+            "X-Frame-Id": str(frame_id),
+        }
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+        return Response(frame, mimetype="image/jpeg", headers=headers)
+
     @app.route("/cmd")
     @requires_auth
     def cmd():
@@ -214,16 +413,101 @@ def create_app(output, robot=None):
         ok = robot.send(cmd_u)
         return jsonify(ok=ok, msg=(cmd_u if ok else "Serial not connected"))
 
+    @app.route("/sensors/history")
+    @requires_auth
+    def sensors_history():
+        """
+        Rolled-up MQ-2 / flame readings, columns ready for a chart:
+          ?res=1s|1m|1h|raw   (default 1m)
+          ?from=<unix time>   or negative = seconds before now (default: all kept)
+          ?to=<unix time>
+        """
+        if history is None:
+            return jsonify(ok=False, msg="Sensor history not configured"), 404
+        res = request.args.get("res", "1m")
+        try:
+            t_from = request.args.get("from")
+            t_to = request.args.get("to")
+            data = history.query(res, float(t_from) if t_from else None, float(t_to) if t_to else None)
+        except ValueError:
+            return jsonify(ok=False, msg="from and to must be numbers"), 400
+        except KeyError:
+            return jsonify(ok=False, msg="res must be raw, " + ", ".join(history.rollups)), 400
+        return jsonify(data)
+
+    @app.route("/events/history")
+    @requires_auth
+    def events_history():
+        """
+        Journal, newest first, 50 per page:
+          ?type=face,hazard   ?name=Unknown   ?since=<unix or -seconds>   ?until=<unix>
+          ?before=<id>        next page: pass the "next" of the previous reply
+          ?limit=<1-500>
+        """
+        if journal is None:
+            return jsonify(ok=False, msg="Event journal not configured"), 404
+        try:
+            since = request.args.get("since")
+            until = request.args.get("until")
+            before = request.args.get("before")
+            page = journal.query(
+                types=(request.args.get("type") or "").split(","),
+                name=request.args.get("name") or None,
+                since=float(since) if since else None,
+                until=float(until) if until else None,
+                before=int(before) if before else None,
+                limit=int(request.args.get("limit", 50)),
+            )
+        except ValueError:
+            return jsonify(ok=False, msg="since, until, before and limit must be numbers"), 400
+        return jsonify(page)
+
+    @app.route("/unknown_faces/<path:filename>")
+    @requires_auth
+    def unknown_face(filename):
+        if detector is None:
+            abort(404)
+        return send_from_directory(detector.UNKNOWN_SAVE_DIR, filename, mimetype="image/jpeg")
+
+    @app.route("/unknown_visitors")
+    @requires_auth
+    def unknown_visitors():
+        """Unknown-face clusters, most recently seen first (ids for tools/promote_cluster.py)."""
+        if detector is None or detector.clusters is None:
+            return jsonify(ok=False, msg="Unknown clustering not configured"), 404
+        return jsonify(visitors=detector.clusters.visitors())
+
     @app.route("/status")
     @requires_auth
     def status():
+        det = detector.stats() if detector is not None else None
+        if det is not None and pipeline is not None:
+            det["pipeline"] = pipeline.stats()
+        stream = tiers.stats()
+        push = {"subscribers": events.subscribers, **events.stats} if events is not None else None
+        tg = None
+        if alerts is not None:
+            tg = {"queue_depth": alerts.queue_depth, **alerts.stats}
         if robot is None:
-            return jsonify(serial_connected=False, sensor=None)
+            return jsonify(serial_connected=False, sensor=None, detector=det, alerts=tg, stream=stream, events=push)
         sensor = None
         try:
             sensor = robot.get_sensor_state().as_dict()
         except Exception:
             sensor = None
-        return jsonify(serial_connected=robot.is_connected, sensor=sensor)
+        writer = {"queue_depth": robot.queue_depth(), **robot.write_stats}
+        return jsonify(serial_connected=robot.is_connected, sensor=sensor, detector=det, alerts=tg, stream=stream,
+                       events=push, serial_writer=writer, serial_link=robot.link_stats,
+                       sensor_history=history.stats() if history is not None else None,
+                       hazards=hazards.stats() if hazards is not None else None,
+                       journal={"queue_depth": journal.queue_depth, **journal.stats} if journal is not None else None)
+
+    @app.route("/encodings/reload", methods=["POST"])
+    @requires_auth
+    def encodings_reload():
+        if reloader is None:
+            return jsonify(ok=False, msg="Reload not configured")
+        reloader.request_reload()
+        return jsonify(ok=True, msg="Reload requested", encodings=reloader.status())
 
     return app
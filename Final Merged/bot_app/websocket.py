@@ -0,0 +1,73 @@
+"""
+websocket.py
+------------
+Just enough RFC 6455 for the asyncio server's /control channel: handshake,
+reading masked client frames, writing unmasked server frames. Small text
+messages only (no fragmentation, no extensions).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import struct
+from typing import Optional, Tuple
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+MAX_PAYLOAD = 4096
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + GUID).encode("ascii")).digest()).decode("ascii")
+
+
+def handshake_response(key: str) -> bytes:
+    return ("HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode("ascii")
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT, mask: Optional[bytes] = None) -> bytes:
+    """One final frame; mask is only set by clients (4 bytes)."""
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, mask_bit | n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, n)
+    if mask:
+        payload = unmask(payload, mask)
+        head += mask
+    return head + payload
+
+
+def unmask(payload: bytes, mask: bytes) -> bytes:
+    n = len(payload)
+    key = int.from_bytes((mask * (n // 4 + 1))[:n], "big")
+    return (int.from_bytes(payload, "big") ^ key).to_bytes(n, "big")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Returns (opcode, payload) of one client frame."""
+    b1, b2 = await reader.readexactly(2)
+    if not b1 & 0x80 or b1 & 0x0F == 0:
+        raise WebSocketError("fragmented frames are not supported")
+    n = b2 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_PAYLOAD:
+        raise WebSocketError("frame too large")
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(n) if n else b""
+    return b1 & 0x0F, unmask(payload, mask) if mask and payload else payload
@@ -2,10 +2,29 @@
 # Serial settings for Arduino connection
 SERIAL_PORT = "/dev/ttyACM0"   # or /dev/ttyUSB0
 SERIAL_BAUD = 9600
+# "auto": switch to the compact framed protocol if the sketch supports it
+# (CRC-checked frames, batched sensor samples); "text": plain command lines.
+SERIAL_PROTOCOL = "auto"
+SERIAL_FRAME_BAUD = 115200     # after the switch (19200/38400/57600/115200)
+SENSOR_SAMPLE_HZ = 50          # sensor samples per second in frame mode
+SENSOR_BATCH = 5               # samples per frame (5 at 50 Hz = 10 frames/s)
+# Raw samples kept for /sensors/history?res=raw (1 min at 50 Hz); the 1 s / 1 min / 1 h
+# rollups are fixed size as well, so memory does not grow with uptime.
+SENSOR_HISTORY_RAW = 3000
 
 # If True, when an unknown face is detected, the robot will send STOP
 STOP_ON_UNKNOWN = True
 
+# Unknown faces are grouped into visitors (unknown_faces/clusters.npz): one alert
+# and one saved crop per new visitor, later sightings attach to it. Promote a
+# visitor to a known person with tools/promote_cluster.py.
+UNKNOWN_CLUSTERS_ENABLED = True
+UNKNOWN_CLUSTER_THRESHOLD = 0.45   # max distance to a visitor's mean encoding
+UNKNOWN_CLUSTER_MAX = 64           # visitors remembered; the least recently seen is dropped
+UNKNOWN_CLUSTER_TTL_S = 6 * 3600   # forget a visitor not seen for this long
+UNKNOWN_REALERT_S = 600            # per-visitor cooldown: alert again for the same person after this
+UNKNOWN_CLUSTER_SAMPLES = 8        # encodings kept per visitor for promotion
+
 # =========================
 # Environmental Sensors (Flame + MQ-2)
 # =========================
@@ -19,3 +38,93 @@ SENSOR_ALERT_COOLDOWN_S = 20
 # Optional safety: stop motors on hazard detection
 STOP_ON_FLAME = False
 STOP_ON_GAS = False
+
+# The sketch's own thresholds (FLAME_DETECT_THRESHOLD / GAS_BAD_THRESHOLD in
+# arduino/mega_motor_shield_linefollower_serial.ino); change both together.
+# Flame reads lower the closer the fire, MQ-2 higher the more gas.
+SKETCH_FLAME_THRESHOLD = 450
+SKETCH_GAS_THRESHOLD = 400
+
+# Hazard rules (bot_app/hazards.py), evaluated on every sensor sample.
+# A rule turns on when min_fraction of the samples in the last window_s are
+# beyond `on`, and off when the same share is back on the safe side of `off`.
+# signal: flame_val, mq2_val, or mq2_rate (MQ-2 change per second, smoothed
+# over HAZARD_RATE_WINDOW_S). require_warm: ignore the MQ-2 warm-up.
+# Tune with: python3 tools/replay_hazards.py <log> --set gas.on=380
+HAZARD_RATE_WINDOW_S = 5.0
+HAZARD_RULES = [
+    {"name": "flame", "kind": "flame", "signal": "flame_val", "op": "below", "on": SKETCH_FLAME_THRESHOLD, "off": 520,
+     "window_s": 0.5, "min_fraction": 0.6, "min_samples": 1,
+     "cooldown_s": SENSOR_ALERT_COOLDOWN_S, "stop": STOP_ON_FLAME},
+    {"name": "gas", "kind": "gas", "signal": "mq2_val", "op": "above", "on": SKETCH_GAS_THRESHOLD, "off": 350,
+     "window_s": 2.0, "min_fraction": 0.8, "min_samples": 3, "require_warm": True,
+     "cooldown_s": SENSOR_ALERT_COOLDOWN_S, "stop": STOP_ON_GAS},
+    {"name": "gas_rising", "kind": "gas", "signal": "mq2_rate", "op": "above", "on": 3, "off": 1,
+     "window_s": 2.0, "min_fraction": 0.8, "min_samples": 3, "require_warm": True,
+     "cooldown_s": SENSOR_ALERT_COOLDOWN_S, "stop": False},
+]
+
+# =========================
+# Motion gate (face detection)
+# =========================
+# Static frames skip face recognition; when something moves, HOG only scans
+# the moving regions. Values apply to a 160px-wide grayscale copy of the frame.
+MOTION_GATE_ENABLED = True
+MOTION_PIXEL_THRESHOLD = 25    # per-pixel change (0-255) that counts as motion
+MOTION_MIN_AREA = 0.002        # changed share of the frame needed to wake up
+MOTION_BG_ALPHA = 0.05         # background learning rate
+MOTION_KEEPALIVE_S = 2.0       # keep detecting this long after motion stops
+
+# Face detection worker processes. 1 = single loop with face tracking;
+# >1 = capture / detect / alert pipeline with this many dlib processes.
+DETECTION_WORKERS = 2
+
+# Known-face lookup. 0 = exhaustive (every gallery encoding, every face);
+# k = coarse pass over per-person prototypes, exact distances for the k
+# nearest people only. k must be at least 2: the margin needs a runner-up.
+# Only used when the gallery has more than k people; check the accuracy with
+# python3 tools/eval_index.py --top-k k
+ENCODING_TOP_K = 3
+
+# =========================
+# Telegram alert queue
+# =========================
+# Alerts are sent by a background thread so a slow network never blocks
+# face detection or the serial reader.
+ALERT_QUEUE_SIZE = 64          # alerts waiting to be sent; extra ones are dropped
+ALERT_COALESCE_S = 2.0         # same-type alerts within this window become one message
+ALERT_MAX_RETRIES = 4          # retries with exponential backoff (1, 2, 4, 8 s)
+# Minimum seconds between two Telegram messages of the same type
+ALERT_RATE_LIMITS = {
+    "unknown": 10.0,
+    "flame": 20.0,
+    "gas": 20.0,
+}
+
+# =========================
+# Web stream
+# =========================
+# Second MJPEG encoder on the 640x360 lores stream. /video clients that ask
+# for width<=640 (or that cannot keep up with 1080p) share it.
+STREAM_LORES_TIER = True
+
+# "async": asyncio server, /video viewers are coroutines (no thread each)
+# "threaded": Flask/Werkzeug development server, one thread per request
+WEB_SERVER = "async"
+
+# /events push channel: max updates per second sent to one dashboard tab
+# (sensor deltas arriving faster are merged)
+EVENTS_MAX_RATE_HZ = 5.0
+
+# /control WebSocket (async server only; the page falls back to /cmd)
+CONTROL_RATE_HZ = 20.0      # how often the latest drive intent is forwarded to serial
+CONTROL_DEADMAN_S = 0.5     # STOP if a held direction is not refreshed within this time
+
+# =========================
+# Event journal (SQLite, next to main.py)
+# =========================
+# Face sightings, unknown alerts, hazards and robot commands; browse with
+# /events/history. Written in batches by a background thread.
+JOURNAL_ENABLED = True
+JOURNAL_PATH = "events.db"
+JOURNAL_KEEP_DAYS = 90
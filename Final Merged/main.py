@@ -15,88 +15,210 @@ Then open:
 """
 
 import os
+import signal
 import threading
-import time
 
 from bot_app.camera_stream import create_camera
-from bot_app.detector import load_encodings, UnknownDetector, run_detection_loop
+from bot_app.detector import load_encodings, UnknownDetector, EncodingReloader, run_detection_loop
+from bot_app.motion import MotionGate
+from bot_app.pipeline import DetectionPipeline
+from bot_app.tracker import FaceTracker
 from bot_app.webapp import create_app
+from bot_app.async_server import run_async_server
+from bot_app.events import EventHub
+from bot_app.control import ControlChannel
+from bot_app.sensor_history import SensorHistory
+from bot_app.hazards import HazardEngine
+from bot_app.journal import EventJournal
+from bot_app.unknown_clusters import UnknownClusters
 
 from bot_app.robot_serial import RobotSerial, SerialConfig
-from bot_app.telegram_utils import send_telegram_alert
+from bot_app.telegram_utils import AlertDispatcher
 from config.bot_config import (
     SERIAL_PORT,
     SERIAL_BAUD,
+    SERIAL_PROTOCOL,
+    SERIAL_FRAME_BAUD,
+    SENSOR_SAMPLE_HZ,
+    SENSOR_BATCH,
+    SENSOR_HISTORY_RAW,
     STOP_ON_UNKNOWN,
+    UNKNOWN_CLUSTERS_ENABLED,
+    UNKNOWN_CLUSTER_THRESHOLD,
+    UNKNOWN_CLUSTER_MAX,
+    UNKNOWN_CLUSTER_TTL_S,
+    UNKNOWN_REALERT_S,
+    UNKNOWN_CLUSTER_SAMPLES,
     SENSOR_ALERTS_ENABLED,
-    SENSOR_ALERT_COOLDOWN_S,
-    STOP_ON_FLAME,
-    STOP_ON_GAS,
+    HAZARD_RULES,
+    HAZARD_RATE_WINDOW_S,
+    MOTION_GATE_ENABLED,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_AREA,
+    MOTION_BG_ALPHA,
+    MOTION_KEEPALIVE_S,
+    DETECTION_WORKERS,
+    ENCODING_TOP_K,
+    ALERT_QUEUE_SIZE,
+    ALERT_COALESCE_S,
+    ALERT_MAX_RETRIES,
+    ALERT_RATE_LIMITS,
+    STREAM_LORES_TIER,
+    WEB_SERVER,
+    EVENTS_MAX_RATE_HZ,
+    CONTROL_RATE_HZ,
+    CONTROL_DEADMAN_S,
+    JOURNAL_ENABLED,
+    JOURNAL_PATH,
+    JOURNAL_KEEP_DAYS,
 )
 
 
 def main():
+    # --- Telegram alerts (background sender, callers never block) ---
+    alerts = AlertDispatcher(
+        max_queue=ALERT_QUEUE_SIZE,
+        coalesce_s=ALERT_COALESCE_S,
+        rate_limits=ALERT_RATE_LIMITS,
+        max_retries=ALERT_MAX_RETRIES,
+    )
+    alerts.start()
+
+    # --- Dashboard push channel (/events) ---
+    events = EventHub(max_rate_hz=EVENTS_MAX_RATE_HZ)
+
+    # --- Event journal (SQLite, batched background writes) ---
+    journal = None
+    if JOURNAL_ENABLED:
+        journal = EventJournal(os.path.join(os.path.dirname(__file__), JOURNAL_PATH),
+                               keep_days=JOURNAL_KEEP_DAYS)
+        journal.start()
+
+    # --- Sensor history (fixed-size ring + 1 s / 1 min / 1 h rollups) ---
+    history = SensorHistory(raw_capacity=SENSOR_HISTORY_RAW)
+
     # --- Robot Serial ---
-    robot = RobotSerial(SerialConfig(port=SERIAL_PORT, baud=SERIAL_BAUD))
+    robot = RobotSerial(SerialConfig(port=SERIAL_PORT, baud=SERIAL_BAUD, protocol=SERIAL_PROTOCOL,
+                                     frame_baud=SERIAL_FRAME_BAUD, sample_hz=SENSOR_SAMPLE_HZ,
+                                     batch=SENSOR_BATCH), events=events, history=history, journal=journal)
 
     # --- Sensor alert handlers (Flame + MQ-2) ---
-    last_flame_alert = 0.0
-    last_gas_alert = 0.0
+    # debounced, hysteretic rules from HAZARD_RULES; one noisy sample no longer alerts
+    hazards = HazardEngine.from_config(HAZARD_RULES, rate_window_s=HAZARD_RATE_WINDOW_S)
 
     def on_sensor(state):
-        nonlocal last_flame_alert, last_gas_alert
         if not SENSOR_ALERTS_ENABLED:
             return
 
-        now = time.time()
-
-        # Flame
-        if state.flame and (now - last_flame_alert) > float(SENSOR_ALERT_COOLDOWN_S):
-            last_flame_alert = now
-            msg = f"🔥 FIRE ALERT! Flame detected\nFlame value: {state.flame_val}\nMQ2: {state.mq2_val}"
-            send_telegram_alert(msg)
-            if STOP_ON_FLAME:
-                robot.stop()
-
-        # Gas / Smoke (ignore during warm-up)
-        if (not state.warm) and state.gas and (now - last_gas_alert) > float(SENSOR_ALERT_COOLDOWN_S):
-            last_gas_alert = now
-            msg = f"⚠️ GAS/SMOKE ALERT! (MQ-2)\nMQ2 value: {state.mq2_val}\nFlame: {state.flame_val}"
-            send_telegram_alert(msg)
-            if STOP_ON_GAS:
+        for ev in hazards.process(state):
+            if journal is not None:
+                journal.record("hazard", ev.rule, kind=ev.kind, state=ev.state, value=round(ev.value, 1),
+                               mq2_val=state.mq2_val, flame_val=state.flame_val, suppressed=ev.suppressed)
+            if ev.state != "on" or ev.suppressed:
+                if ev.state == "off":
+                    events.publish_event("hazard_clear", {"kind": ev.kind, "rule": ev.rule})
+                continue
+            if ev.kind == "flame":
+                msg = f"🔥 FIRE ALERT! Flame detected ({ev.rule})\nFlame value: {state.flame_val}\nMQ2: {state.mq2_val}"
+            else:
+                msg = (f"⚠️ GAS/SMOKE ALERT! (MQ-2, {ev.rule})\nMQ2 value: {state.mq2_val}"
+                       f" ({hazards.mq2_rate.value:+.0f}/s)\nFlame: {state.flame_val}")
+            alerts.enqueue(ev.kind, msg)
+            events.publish_event("alert", {"kind": ev.kind, "rule": ev.rule, "mq2_val": state.mq2_val,
+                                           "flame_val": state.flame_val})
+            if ev.stop:
                 robot.stop()
 
     # Start background serial reader (for SENSOR lines)
     robot.start_reader(on_sensor=on_sensor)
 
     # --- Face encodings ---
-    enc_path = os.path.join(os.path.dirname(__file__), "encodings.pickle")
-    known_enc, known_names = load_encodings(enc_path)
+    # memory-mapped store; falls back to the old pickle if not converted yet
+    enc_path = os.path.join(os.path.dirname(__file__), "encodings.fenc")
+    if not os.path.exists(enc_path):
+        enc_path = os.path.join(os.path.dirname(__file__), "encodings.pickle")
+    # ENCODING_TOP_K: coarse search over per-person prototypes, exact check on the nearest people
+    known_faces = load_encodings(enc_path, top_k=ENCODING_TOP_K)
 
     # --- Camera ---
-    picam2, output = create_camera(main_size=(1920, 1080), lores_size=(640, 360), fps=15)
+    # lores_mjpeg: second encoder on lores = cheap 640x360 tier for /video?width=640
+    # the pipeline holds the capture request of every frame in flight (for the crop):
+    # one per worker, plus the newest undispatched frame and one being applied
+    extra_buffers = DETECTION_WORKERS + 2 if DETECTION_WORKERS > 1 else 0
+    picam2, output = create_camera(main_size=(1920, 1080), lores_size=(640, 360), fps=15,
+                                   lores_mjpeg=STREAM_LORES_TIER, buffer_count=6 + extra_buffers)
 
     # --- Unknown callback ---
     def on_unknown(_img_path: str):
         if STOP_ON_UNKNOWN:
             robot.stop()
 
+    # --- Unknown visitors: one alert per person, per-person cooldown ---
+    unknown_dir = os.path.join(os.path.dirname(__file__), "unknown_faces")
+    clusters = None
+    if UNKNOWN_CLUSTERS_ENABLED:
+        os.makedirs(unknown_dir, exist_ok=True)
+        clusters = UnknownClusters(
+            threshold=UNKNOWN_CLUSTER_THRESHOLD,
+            max_clusters=UNKNOWN_CLUSTER_MAX,
+            ttl_s=UNKNOWN_CLUSTER_TTL_S,
+            realert_s=UNKNOWN_REALERT_S,
+            samples=UNKNOWN_CLUSTER_SAMPLES,
+            path=os.path.join(unknown_dir, "clusters.npz"),
+        )
+        clusters.start()   # saves in the background, never on the detection thread
+
     detector = UnknownDetector(
-        known_enc, known_names,
-        unknown_dir=os.path.join(os.path.dirname(__file__), "unknown_faces"),
+        known_faces,
+        unknown_dir=unknown_dir,
         unknown_cooldown=10,
         compare_tolerance=0.45,
         distance_max_for_known=0.55,
         cv_scaler=4,
+        detect_source="lores",  # detect on the 640x360 YUV stream, crop faces from main
+        # single worker: full HOG + encoding every 8th frame or on scene change,
+        # optical flow in between. Several workers examine frames in parallel instead.
+        tracker=FaceTracker(detect_every=8, scene_change=12.0) if DETECTION_WORKERS <= 1 else None,
+        motion_gate=MotionGate(
+            pixel_threshold=MOTION_PIXEL_THRESHOLD,
+            min_area=MOTION_MIN_AREA,
+            alpha=MOTION_BG_ALPHA,
+            keep_alive_s=MOTION_KEEPALIVE_S,
+        ) if MOTION_GATE_ENABLED else None,
+        # scan only around known faces (+ motion), full frame every 10th detection
+        roi_mode=True,
+        roi_full_scan_every=10,
+        alerts=alerts,
+        events=events,
+        journal=journal,
+        clusters=clusters,
         on_unknown=on_unknown
     )
 
-    # Run face detection loop in background
-    threading.Thread(target=run_detection_loop, args=(picam2, detector), daemon=True).start()
+    # Hot-reload encodings when the file changes, on SIGHUP, or from the dashboard
+    reloader = EncodingReloader(detector, enc_path, top_k=ENCODING_TOP_K)
+    reloader.start()
+    signal.signal(signal.SIGHUP, lambda *_: reloader.request_reload())
+
+    # Run face detection in background
+    pipeline = None
+    if DETECTION_WORKERS > 1:
+        # capture thread -> latest-frame ring -> worker processes -> ordered results
+        pipeline = DetectionPipeline(picam2, detector, workers=DETECTION_WORKERS)
+        pipeline.start()
+    else:
+        threading.Thread(target=run_detection_loop, args=(picam2, detector), daemon=True).start()
 
     # Web app (stream + robot control)
-    app = create_app(output, robot=robot)
-    app.run(host="0.0.0.0", port=8000, threaded=True, use_reloader=False)
+    app = create_app(output, robot=robot, reloader=reloader, detector=detector, pipeline=pipeline,
+                     alerts=alerts, events=events, history=history, hazards=hazards, journal=journal)
+    if WEB_SERVER == "async":
+        # teleop WebSocket: latest intent forwarded at a fixed rate, STOP on silence
+        control = ControlChannel(robot, rate_hz=CONTROL_RATE_HZ, deadman_s=CONTROL_DEADMAN_S)
+        control.start()
+        run_async_server(app, output, host="0.0.0.0", port=8000, events=events, control=control)
+    else:
+        app.run(host="0.0.0.0", port=8000, threaded=True, use_reloader=False)
 
 
 if __name__ == "__main__":
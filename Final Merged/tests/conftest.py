@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+try:
+    import config.telegram_config  # noqa: F401
+except ImportError:
+    # the real file holds the bot token and is created on the Pi, not committed
+    _tg = types.ModuleType("config.telegram_config")
+    _tg.BOT_TOKEN = "test-token"
+    _tg.CHAT_ID = "0"
+    sys.modules["config.telegram_config"] = _tg
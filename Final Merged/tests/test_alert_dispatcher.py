@@ -0,0 +1,143 @@
+"""AlertDispatcher against the local Telegram stand-in (tools/fake_telegram.py)."""
+
+import time
+from urllib.parse import parse_qs
+
+import pytest
+
+from bot_app.telegram_utils import AlertDispatcher
+from fake_telegram import serve
+
+
+@pytest.fixture
+def fake():
+    srv, handler = serve()
+    yield handler, f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def make(api_base, **kw):
+    kw.setdefault("coalesce_s", 0.0)
+    kw.setdefault("backoff_s", 0.05)
+    return AlertDispatcher(token="t", chat_id="1", api_base=api_base, **kw)
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_retries_5xx_with_backoff(fake):
+    handler, url = fake
+    handler.script = [500, 502]
+    d = make(url, backoff_s=0.1)
+    d.start()
+    d.enqueue("gas", "gas!")
+    assert wait_for(lambda: d.stats["sent"] == 1)
+    d.stop()
+
+    codes = [r.status for r in handler.received]
+    assert codes == [500, 502, 200]
+    gaps = [b.t - a.t for a, b in zip(handler.received, handler.received[1:])]
+    assert gaps[0] >= 0.1 and gaps[1] >= 0.2          # 1x, then 2x backoff_s
+    assert d.stats["retries"] == 2 and d.stats["failed"] == 0
+
+
+def test_gives_up_after_max_retries(fake):
+    handler, url = fake
+    handler.script = [500] * 10
+    d = make(url, max_retries=2)
+    d.start()
+    d.enqueue("gas", "gas!")
+    assert wait_for(lambda: d.stats["failed"] == 1)
+    d.stop()
+    assert len(handler.received) == 3
+
+
+def test_4xx_is_not_retried(fake):
+    handler, url = fake
+    handler.script = [400]
+    d = make(url)
+    d.start()
+    d.enqueue("gas", "gas!")
+    assert wait_for(lambda: d.stats["failed"] == 1)
+    d.stop()
+    assert len(handler.received) == 1 and d.stats["retries"] == 0
+
+
+def test_429_waits_retry_after_not_backoff(fake):
+    handler, url = fake
+    handler.script = [429]
+    handler.retry_after = 0.3
+    d = make(url, backoff_s=5.0)
+    d.start()
+    d.enqueue("flame", "fire!")
+    assert wait_for(lambda: d.stats["sent"] == 1)
+    d.stop()
+
+    first, second = handler.received
+    assert 0.3 <= second.t - first.t < 2.0
+
+
+def test_burst_is_coalesced_into_one_message(fake):
+    handler, url = fake
+    d = make(url, coalesce_s=0.3)
+    d.start()
+    for i in range(3):
+        assert d.enqueue("gas", f"gas {i}")
+    assert wait_for(lambda: d.stats["sent"] == 1)
+    time.sleep(0.4)
+    d.stop()
+
+    assert len(handler.received) == 1
+    assert d.stats["coalesced"] == 2
+    req = handler.received[0]
+    assert req.method == "sendMessage"
+    text = parse_qs(req.body.decode())["text"][0]
+    assert text == "gas 2\n(+2 more gas alert(s) in this burst)"
+
+
+def test_single_photo_is_one_send_photo(fake):
+    handler, url = fake
+    d = make(url)
+    d.start()
+    d.enqueue("unknown", "who?", image_bytes=b"\xff\xd8jpeg")
+    assert wait_for(lambda: d.stats["sent"] == 1)
+    d.stop()
+
+    (req,) = handler.received
+    assert req.method == "sendPhoto"
+    assert req.content_type.startswith("multipart/form-data")
+    assert b"\xff\xd8jpeg" in req.body and b"who?" in req.body
+
+
+def test_coalesced_photos_go_as_one_album(fake):
+    handler, url = fake
+    d = make(url, coalesce_s=0.3)
+    d.start()
+    for i in range(3):
+        d.enqueue("unknown", f"who {i}?", image_bytes=b"jpeg%d" % i)
+    assert wait_for(lambda: d.stats["sent"] == 1)
+    d.stop()
+
+    (req,) = handler.received
+    assert req.method == "sendMediaGroup"
+    for i in range(3):
+        assert b"attach://photo%d" % i in req.body
+        assert b"jpeg%d" % i in req.body
+
+
+def test_full_queue_drops_without_blocking():
+    d = AlertDispatcher(token="t", chat_id="1", api_base="http://127.0.0.1:9", max_queue=2)
+    # not started: nothing drains the queue
+    assert d.enqueue("gas", "1") and d.enqueue("gas", "2")
+    t0 = time.perf_counter()
+    assert d.enqueue("gas", "3") is False
+    assert time.perf_counter() - t0 < 0.05
+    assert d.stats == {**d.stats, "enqueued": 2, "dropped": 1}
+    assert d.queue_depth == 2
@@ -0,0 +1,114 @@
+"""Hazard rules: debounce, hysteresis, cooldown and the MQ-2 warm-up."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from bot_app.hazards import HazardEngine, HazardRule, _RuleState
+from config.bot_config import HAZARD_RULES, SKETCH_FLAME_THRESHOLD, SKETCH_GAS_THRESHOLD
+
+
+def gas_rule(**kw):
+    kw = {"name": "gas", "kind": "gas", "signal": "mq2_val", "op": "above", "on": 400, "off": 350,
+          "window_s": 1.0, "min_fraction": 0.8, "min_samples": 3, "cooldown_s": 20.0, **kw}
+    return HazardRule(**kw)
+
+
+def run(st, values, t0=0.0, dt=0.1):
+    """Feed values dt apart; returns [(sample index, event)]."""
+    out = []
+    for i, v in enumerate(values):
+        ev = st.update(t0 + i * dt, v)
+        if ev is not None:
+            out.append((i, ev))
+    return out
+
+
+def test_rules_use_the_sketch_thresholds():
+    rules = {r["name"]: r for r in HAZARD_RULES}
+    assert rules["flame"]["on"] == SKETCH_FLAME_THRESHOLD
+    assert rules["gas"]["on"] == SKETCH_GAS_THRESHOLD
+
+
+def test_off_must_be_on_the_safe_side():
+    with pytest.raises(ValueError):
+        _RuleState(gas_rule(off=450))
+    with pytest.raises(ValueError):
+        _RuleState(gas_rule(op="below"))
+
+
+def test_min_samples():
+    st = _RuleState(gas_rule())
+    assert run(st, [500, 500]) == []
+    assert st.update(0.2, 500).state == "on"
+
+
+def test_single_spike_is_debounced():
+    st = _RuleState(gas_rule())
+    assert run(st, [300] * 10 + [900] + [300] * 10) == []
+    # 8 of the last 10 samples high: on at the 8th
+    (i, ev), = run(_RuleState(gas_rule()), [300] * 10 + [500] * 10)
+    assert (i, ev.state, ev.value) == (17, "on", 500)
+
+
+def test_hysteresis():
+    st = _RuleState(gas_rule())
+    assert [e.state for _, e in run(st, [500] * 10)] == ["on"]
+    # between off and on: stays on
+    assert run(st, [380] * 30, t0=1.0) == []
+    assert st.active
+    # the 1 s window holds 11 samples: off once 9 of them are below `off`
+    (i, ev), = run(st, [340] * 10, t0=4.0)
+    assert ev.state == "off" and i == 8 and not st.active
+
+
+def test_below_rule():
+    st = _RuleState(HazardRule("flame", "flame", "flame_val", "below", on=450, off=520,
+                               window_s=0.5, min_fraction=0.6, min_samples=1))
+    assert [e.state for _, e in run(st, [1000, 300, 300] + [480] * 10 + [600] * 6)] == ["on", "off"]
+
+
+def test_cooldown_defers_the_alert():
+    st = _RuleState(gas_rule(cooldown_s=5.0))
+    (_, first), = run(st, [500] * 5)
+    assert first.state == "on" and not first.suppressed
+    run(st, [300] * 10, t0=1.5)
+    assert not st.active
+
+    # back on within the cooldown: reported, but suppressed and pending
+    events = run(st, [500] * 60, t0=3.0)
+    assert [(e.state, e.suppressed) for _, e in events] == [("on", True), ("on", False)]
+    assert events[1][1].t == pytest.approx(first.t + 5.0)
+    assert (st.fired, st.suppressed, st.pending) == (2, 1, False)
+
+
+def test_cooldown_pending_dropped_when_off():
+    st = _RuleState(gas_rule(cooldown_s=5.0))
+    run(st, [500] * 5)
+    run(st, [300] * 10, t0=1.5)
+    run(st, [500] * 5, t0=3.0)
+    assert st.pending
+    events = run(st, [300] * 60, t0=4.5)
+    assert [e.state for _, e in events] == ["off"]
+    assert st.fired == 1
+
+
+def sample(t, mq2, warm):
+    return SimpleNamespace(updated_at=t, mq2_val=mq2, flame_val=1023, warm=warm)
+
+
+def test_require_warm_resets_the_rule():
+    eng = HazardEngine([gas_rule(require_warm=True, cooldown_s=0.0)])
+    assert [eng.process(sample(i * 0.1, 900, True)) for i in range(20)] == [[]] * 20
+    events = [ev for i in range(20, 30) for ev in eng.process(sample(i * 0.1, 900, False))]
+    assert [e.state for e in events] == ["on"]
+    st = eng._rules[0]
+
+    # warming up again (sensor restarted): forget the window and the state, no "off"
+    assert eng.process(sample(3.0, 900, True)) == []
+    assert not st.active and not st.window
+    assert eng.active() == {"gas": False}
+    # and it takes a fresh window of warm samples to turn on again
+    assert eng.process(sample(3.1, 900, False)) == []
+    assert eng.process(sample(3.2, 900, False)) == []
+    assert [e.state for e in eng.process(sample(3.3, 900, False))] == ["on"]
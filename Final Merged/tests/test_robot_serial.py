@@ -0,0 +1,76 @@
+"""RobotSerial against tools/sim_arduino.py on a pty (Linux/macOS only)."""
+
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+pytest.importorskip("tty")
+
+from bot_app.robot_serial import RobotSerial, SerialConfig  # noqa: E402
+from sim_arduino import SimArduino  # noqa: E402
+
+
+def connect(sim, **cfg):
+    robot = RobotSerial(SerialConfig(port=sim.path, baud=9600, **cfg))
+    robot.start_reader()
+    deadline = time.time() + 8
+    while not robot.is_connected and time.time() < deadline:
+        time.sleep(0.05)
+    assert robot.is_connected
+    return robot
+
+
+@pytest.fixture
+def session():
+    opened = []
+
+    def open_(proto="bin", **cfg):
+        sim = SimArduino(9600, sensor_ms=0, proto=proto).start()
+        robot = connect(sim, **cfg)
+        opened.append((sim, robot))
+        return sim, robot
+
+    yield open_
+    for sim, robot in opened:
+        robot.close()
+        sim.stop()
+
+
+def test_auto_switches_to_frames(session):
+    sim, robot = session("bin", protocol="auto", frame_baud=115200)
+    assert robot.protocol == "frames"
+    assert robot.link_stats["baud"] == 115200
+    assert sim.framed
+    assert robot.send_with_ack("SPEED 120").result(timeout=2) is True
+
+
+@pytest.mark.parametrize("proto", ["ack", "silent"])
+def test_auto_falls_back_to_text(session, proto):
+    sim, robot = session(proto, protocol="auto")
+    assert robot.protocol == "text"
+    assert not sim.framed
+    assert robot.send_with_ack("FWD").result(timeout=2) is True
+    assert sim.received[-1][1] == "FWD"
+
+
+def test_stop_preempts_queued_motion(session):
+    sim, robot = session("bin", protocol="text")
+    motion = ["FWD", "LEFT", "FWD", "RIGHT", "BACK", "LEFT"] * 2   # no coalescing of neighbours
+    futures = [robot.send_with_ack(cmd) for cmd in motion]
+    assert all(f is not None for f in futures)
+
+    t0 = time.perf_counter()
+    stop = robot.send_with_ack("STOP")
+    assert stop.result(timeout=2) is True
+
+    done = [f.result(timeout=3) for f in futures]
+    stop_at = next(t for t, cmd in sim.received if cmd == "STOP")
+    assert stop_at - t0 < 0.1                  # behind one line on the wire, not the queue
+    assert [cmd for t, cmd in sim.received if t > stop_at] == []   # dropped, not delayed
+
+    preempted = done.count(False)
+    assert preempted == robot.write_stats["preempted"] > 0
+    written = [cmd for _, cmd in sim.received if cmd != "STOP"]
+    assert len(written) == len(motion) - preempted
+    assert written == motion[:len(written)]
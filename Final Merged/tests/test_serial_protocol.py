@@ -0,0 +1,112 @@
+"""Framed serial protocol: encode/decode round trips and decoder resync."""
+
+import random
+
+import pytest
+
+from bot_app.serial_protocol import (FRAME_ACK, FRAME_CMD, FRAME_SENSOR, FRAME_TEXT, MAX_BATCH,
+                                     MAX_PAYLOAD, SYNC, FrameDecoder, Sample, decode_sensor_batch,
+                                     encode_frame, encode_sensor_batch, parse_proto_reply,
+                                     proto_request)
+
+
+def feed_in_pieces(decoder, data, rnd):
+    """Feed data in random-sized pieces (1..7 bytes), like reads from a UART."""
+    frames, i = [], 0
+    while i < len(data):
+        n = rnd.randint(1, 7)
+        frames += decoder.feed(data[i:i + n])
+        i += n
+    return frames
+
+
+@pytest.mark.parametrize("ftype,payload", [
+    (FRAME_CMD, b"STOP"),
+    (FRAME_ACK, b"SPEED 120"),
+    (FRAME_TEXT, b""),
+    (FRAME_TEXT, bytes([SYNC]) * 10),          # sync bytes inside the payload
+    (FRAME_TEXT, bytes(range(256))[:MAX_PAYLOAD]),
+])
+def test_frame_round_trip(ftype, payload):
+    frame = encode_frame(ftype, payload)
+    assert len(frame) == len(payload) + 5
+    assert FrameDecoder().feed(frame) == [(ftype, payload)]
+
+
+def test_payload_too_long():
+    with pytest.raises(ValueError):
+        encode_frame(FRAME_TEXT, b"x" * (MAX_PAYLOAD + 1))
+
+
+def test_sensor_batch_round_trip():
+    rnd = random.Random(3)
+    samples = [Sample(rnd.random() < 0.5, rnd.random() < 0.5, rnd.random() < 0.5,
+                      rnd.randint(0, 1023), rnd.randint(0, 1023)) for _ in range(MAX_BATCH)]
+    frame = encode_sensor_batch(0x1_0005, 20, samples)      # seq wraps at 16 bits
+    ((ftype, payload),) = FrameDecoder().feed(frame)
+    assert ftype == FRAME_SENSOR
+    assert decode_sensor_batch(payload) == (5, 20, samples)
+
+
+def test_sensor_batch_limits():
+    s = Sample(False, False, False, 1, 2)
+    with pytest.raises(ValueError):
+        encode_sensor_batch(0, 20, [])
+    with pytest.raises(ValueError):
+        encode_sensor_batch(0, 20, [s] * (MAX_BATCH + 1))
+    payload = FrameDecoder().feed(encode_sensor_batch(0, 20, [s, s]))[0][1]
+    with pytest.raises(ValueError):
+        decode_sensor_batch(payload[:-1])
+
+
+def test_partial_feeds_give_the_same_frames():
+    rnd = random.Random(1)
+    frames = [(FRAME_CMD, b"FWD"), (FRAME_ACK, b"FWD"), (FRAME_TEXT, b"hello \xa5 world")]
+    data = b"".join(encode_frame(t, p) for t, p in frames)
+    for _ in range(20):
+        assert feed_in_pieces(FrameDecoder(), data, rnd) == frames
+    d = FrameDecoder()
+    assert [f for b in data for f in d.feed(bytes((b,)))] == frames
+
+
+def test_resync_after_bad_crc():
+    bad = bytearray(encode_frame(FRAME_CMD, b"LEFT"))
+    bad[-1] ^= 0xFF
+    good = [(FRAME_CMD, b"STOP"), (FRAME_ACK, b"STOP")]
+    data = b"\x00\x13" + bytes(bad) + b"".join(encode_frame(t, p) for t, p in good)
+
+    d = FrameDecoder()
+    assert feed_in_pieces(d, data, random.Random(2)) == good
+    assert d.stats["crc_errors"] == 1
+    assert d.stats["frames"] == 2
+
+
+def test_resync_after_corrupted_length():
+    # a length byte that grew makes the decoder wait for bytes of the next frames;
+    # once the CRC fails it must find those frames again
+    bad = bytearray(encode_frame(FRAME_CMD, b"RIGHT"))
+    bad[2] = 200
+    good = [(FRAME_TEXT, b"t%03d" % i) for i in range(40)]      # > 200 bytes after the bad frame
+    data = bytes(bad) + b"".join(encode_frame(t, p) for t, p in good)
+
+    d = FrameDecoder()
+    assert feed_in_pieces(d, data, random.Random(4)) == good
+    assert d.stats["crc_errors"] >= 1
+
+
+def test_garbage_with_stray_sync_bytes():
+    # boot noise and stray sync bytes can read as a long frame header; the frames behind
+    # them come out once enough bytes followed to reject it
+    rnd = random.Random(5)
+    want = [(FRAME_CMD, b"BACK"), (FRAME_CMD, b"STOP")] + [(FRAME_ACK, b"a%03d" % i) for i in range(40)]
+    data = (b"boot\r\n\xa5\xa5\x01" + encode_frame(*want[0]) + b"\xa5\x10\xff\x00"
+            + b"".join(encode_frame(t, p) for t, p in want[1:]))
+    assert feed_in_pieces(FrameDecoder(), data, rnd) == want
+
+
+def test_proto_negotiation_lines():
+    line = proto_request(115200, 50, 5)
+    assert line == "PROTO BIN 115200 50 5"
+    assert parse_proto_reply(line + "\r\n") == (115200, 50, 5)
+    assert parse_proto_reply("ACK " + line) is None
+    assert parse_proto_reply("PROTO BIN fast 50 5") is None
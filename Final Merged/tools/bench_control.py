@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Command latency: GET /cmd on the threaded server vs the /control WebSocket.
+
+Runs both servers in this process with a fake robot whose send() takes
+--serial-ms (a write + flush at 9600 baud is a few ms) and reports:
+  - round trip until the browser would get its reply
+  - STOP latency: client send -> STOP handed to the serial port
+No camera or Arduino needed, but bot_app.camera_stream still imports
+picamera2, so run it on the Pi (with main.py stopped, or other ports).
+
+Example:
+  python3 tools/bench_control.py --count 200 --serial-ms 5
+"""
+
+import argparse
+import asyncio
+import base64
+import http.client
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config.dashboard_config import DASHBOARD_USERNAME, DASHBOARD_PASSWORD  # noqa: E402
+from bot_app.async_server import AsyncDashboardServer  # noqa: E402
+from bot_app.camera_stream import StreamingOutput  # noqa: E402
+from bot_app.control import ControlChannel  # noqa: E402
+from bot_app.webapp import create_app  # noqa: E402
+from bot_app.websocket import OP_TEXT, encode_frame  # noqa: E402
+
+AUTH = "Basic " + base64.b64encode(f"{DASHBOARD_USERNAME}:{DASHBOARD_PASSWORD}".encode()).decode()
+
+
+class FakeRobot:
+    """Stands in for RobotSerial: send() blocks like a serial write + flush."""
+    def __init__(self, serial_ms: float):
+        self.serial_s = serial_ms / 1000.0
+        self.is_connected = True
+        self.last_stop = 0.0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def send(self, line: str) -> bool:
+        with self._lock:
+            time.sleep(self.serial_s)
+            if line == "STOP":
+                self.last_stop = time.perf_counter()
+            self.writes += 1
+        return True
+
+    def speed(self, spd: int) -> bool:
+        return self.send(f"SPEED {spd}")
+
+    def get_sensor_state(self):
+        raise RuntimeError("no sensors")
+
+
+class WsClient:
+    def __init__(self, port: int):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((f"GET /control HTTP/1.1\r\nHost: bench\r\nUpgrade: websocket\r\n"
+                           f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                           f"Sec-WebSocket-Version: 13\r\nAuthorization: {AUTH}\r\n\r\n").encode())
+        head = b""
+        while b"\r\n\r\n" not in head:
+            head += self.sock.recv(1024)
+        if b" 101 " not in head.split(b"\r\n", 1)[0]:
+            raise RuntimeError("WebSocket upgrade failed: " + head.split(b"\r\n", 1)[0].decode())
+        self.buf = head.split(b"\r\n\r\n", 1)[1]
+
+    def send(self, obj) -> None:
+        self.sock.sendall(encode_frame(json.dumps(obj).encode(), OP_TEXT, mask=os.urandom(4)))
+
+    def _read(self, n: int) -> bytes:
+        while len(self.buf) < n:
+            self.buf += self.sock.recv(4096)
+        out, self.buf = self.buf[:n], self.buf[n:]
+        return out
+
+    def recv(self):
+        b1, b2 = self._read(2)
+        n = b2 & 0x7F
+        if n == 126:
+            n = int.from_bytes(self._read(2), "big")
+        return json.loads(self._read(n))
+
+
+def summary(name: str, ms) -> None:
+    ms = sorted(ms)
+    p95 = ms[max(0, int(len(ms) * 0.95) - 1)]
+    print(f"{name:<34} p50 {statistics.median(ms):7.2f} ms   p95 {p95:7.2f} ms   max {ms[-1]:7.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--count", type=int, default=200, help="Commands per measurement")
+    ap.add_argument("--serial-ms", type=float, default=5.0, help="Fake serial write + flush time")
+    ap.add_argument("--rate-hz", type=float, default=20.0, help="ControlChannel forward rate")
+    ap.add_argument("--port", type=int, default=8095, help="Threaded server; async uses port + 1")
+    args = ap.parse_args()
+
+    robot = FakeRobot(args.serial_ms)
+    output = StreamingOutput()
+    app = create_app(output, robot=robot)
+    threading.Thread(target=lambda: app.run("127.0.0.1", args.port, threaded=True, use_reloader=False),
+                     daemon=True).start()
+
+    control = ControlChannel(robot, rate_hz=args.rate_hz)
+    control.start()
+    server = AsyncDashboardServer(app, output, "127.0.0.1", args.port + 1, control=control)
+    threading.Thread(target=lambda: asyncio.run(server.serve_forever()), daemon=True).start()
+    time.sleep(1.0)
+
+    # before: GET /cmd per command (keep-alive, like the browser)
+    conn = http.client.HTTPConnection("127.0.0.1", args.port)
+    rtt, stop = [], []
+    for i in range(args.count):
+        cmd = "STOP" if i % 2 else "FWD"
+        t0 = time.perf_counter()
+        conn.request("GET", f"/cmd?c={cmd}", headers={"Authorization": AUTH})
+        conn.getresponse().read()
+        t1 = time.perf_counter()
+        rtt.append((t1 - t0) * 1000.0)
+        if cmd == "STOP":
+            stop.append((robot.last_stop - t0) * 1000.0)
+    summary("GET /cmd round trip", rtt)
+    summary("GET /cmd STOP -> serial", stop)
+
+    # after: /control WebSocket
+    ws = WsClient(args.port + 1)
+    rtt, stop = [], []
+    for i in range(args.count):
+        cmd = "STOP" if i % 2 else "FWD"
+        before, writes = robot.last_stop, robot.writes
+        t0 = time.perf_counter()
+        ws.send({"seq": i, "cmd": cmd, "t": t0})
+        reply = ws.recv()
+        rtt.append((time.perf_counter() - t0) * 1000.0)
+        if cmd == "STOP":
+            while robot.last_stop == before:
+                time.sleep(0.0002)
+            stop.append((robot.last_stop - t0) * 1000.0)
+        else:
+            while robot.writes == writes:  # let the FWD reach the port before the next STOP
+                time.sleep(0.0002)
+        if not reply.get("ok"):
+            print("[WARN] reply:", reply)
+    summary("WebSocket /control ack", rtt)
+    summary("WebSocket /control STOP -> serial", stop)
+    print("control stats:", control.stats)
+
+
+if __name__ == "__main__":
+    main()
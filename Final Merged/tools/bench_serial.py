@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Serial link benchmarks: STOP latency under a command flood, and sensor
+telemetry throughput/latency (text lines vs the framed protocol).
+
+By default talks to tools/sim_arduino.py on a pty (paced at --baud), so no
+hardware is needed. While motion commands are sent as fast as the queue
+takes them, STOP is sent at random moments and the time until the simulated
+Arduino has read the whole STOP line is recorded. With --port the real
+Arduino is used and latency is measured up to its "ACK STOP".
+
+--telemetry asks for --hz sensor samples per second for --seconds and
+reports the rate that arrives, sample age on arrival and how busy the
+Arduino -> Pi direction is. Text at 9600 baud tops out well below 50 Hz.
+
+Example:
+  python3 tools/bench_serial.py --stops 50
+  python3 tools/bench_serial.py --port /dev/ttyACM0 --stops 20
+  python3 tools/bench_serial.py --telemetry --hz 50
+  python3 tools/bench_serial.py --telemetry --hz 50 --protocol auto --batch 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bot_app.robot_serial import RobotSerial, SerialConfig  # noqa: E402
+from sim_arduino import SimArduino  # noqa: E402
+
+
+def summary(name: str, ms) -> None:
+    ms = sorted(ms)
+    p95 = ms[max(0, int(len(ms) * 0.95) - 1)]
+    print(f"{name:<28} n={len(ms):<4} p50 {statistics.median(ms):7.2f} ms   "
+          f"p95 {p95:7.2f} ms   max {ms[-1]:7.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", default=None, help="Real serial port (default: simulated Arduino on a pty)")
+    ap.add_argument("--baud", type=int, default=9600)
+    ap.add_argument("--stops", type=int, default=50, help="Number of STOPs to measure")
+    ap.add_argument("--protocol", choices=["text", "auto"], default="text")
+    ap.add_argument("--frame-baud", type=int, default=115200)
+    ap.add_argument("--telemetry", action="store_true", help="Measure sensor telemetry instead of STOP")
+    ap.add_argument("--hz", type=int, default=50, help="Requested sensor samples per second")
+    ap.add_argument("--batch", type=int, default=5, help="Samples per frame")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    args = ap.parse_args()
+    if args.telemetry and args.port is not None:
+        sys.exit("--telemetry needs the simulated Arduino")
+
+    sim = None
+    arrived = threading.Event()
+    if args.port is None:
+        sensor_ms = round(1000 / args.hz) if args.telemetry and args.protocol == "text" else 500
+        sim = SimArduino(args.baud, sensor_ms=sensor_ms, counter=args.telemetry).start()
+        sim.on_command = lambda cmd, t: arrived.set() if cmd == "STOP" else None
+        port = sim.path
+    else:
+        port = args.port
+
+    got = []   # (perf_counter on arrival, sample number)
+    robot = RobotSerial(SerialConfig(port=port, baud=args.baud, protocol=args.protocol,
+                                     frame_baud=args.frame_baud, sample_hz=args.hz, batch=args.batch))
+    robot.start_reader(on_sensor=lambda st: got.append((time.perf_counter(), st.flame_val)))
+    deadline = time.time() + 10
+    while not robot.is_connected and time.time() < deadline:
+        time.sleep(0.1)
+    if not robot.is_connected:
+        sys.exit(f"could not open {port}")
+    print("link:", robot.link_stats)
+
+    if args.telemetry:
+        telemetry(robot, sim, got, args)
+        return
+
+    flooding = True
+
+    def flood():
+        cmds = ["FWD", "LEFT", "FWD", "RIGHT", "SPEED 150", "BACK"]
+        i = 0
+        while flooding:
+            if not robot.send(cmds[i % len(cmds)]):
+                time.sleep(0.002)   # queue full
+            i += 1
+
+    threading.Thread(target=flood, daemon=True).start()
+    time.sleep(0.5)
+
+    lat = []
+    for _ in range(args.stops):
+        time.sleep(random.uniform(0.05, 0.3))
+        arrived.clear()
+        t0 = time.perf_counter()
+        fut = robot.send_with_ack("STOP")
+        if fut is None:
+            print("[WARN] STOP not queued")
+            continue
+        if sim is not None:
+            if arrived.wait(2.0):
+                lat.append((sim.received[-1][0] - t0) * 1000.0)
+        elif fut.result(timeout=5):
+            lat.append((time.perf_counter() - t0) * 1000.0)
+    flooding = False
+
+    what = "STOP -> read by Arduino" if sim is not None else "STOP -> ACK"
+    if lat:
+        summary(what, lat)
+    line_ms = 10.0 * len("FWD\n") / args.baud * 1000.0
+    print(f"one motion line at {args.baud} baud: {line_ms:.1f} ms on the wire")
+    print("writer stats:", robot.write_stats)
+
+
+def telemetry(robot, sim, got, args) -> None:
+    time.sleep(1.0)
+    got.clear()
+    tx0, samples0 = sim.tx_bytes, robot.link_stats["samples"]
+    t0 = time.perf_counter()
+    time.sleep(args.seconds)
+    dt = time.perf_counter() - t0
+    arrived = list(got)
+
+    baud = robot.link_stats["baud"]
+    rate = (robot.link_stats["samples"] - samples0) / dt
+    busy = (sim.tx_bytes - tx0) * 10.0 / baud / dt * 100.0
+    print(f"{robot.protocol} @ {baud} baud: requested {args.hz} Hz, received {rate:.1f} Hz, "
+          f"Arduino -> Pi link {busy:.0f}% busy")
+    age = [(t - sim.sampled[n]) * 1000.0 for t, n in arrived if n in sim.sampled]
+    if age:
+        summary("sample age on arrival", age)
+    print("link stats:", robot.link_stats)
+
+
+if __name__ == "__main__":
+    main()
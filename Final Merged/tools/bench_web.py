@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: threaded Flask server vs the asyncio server.
+
+Starts the dashboard (create_app) in a child process with a synthetic camera
+(a fixed fake JPEG pushed at --fps), opens N /video viewers, and while they
+stream measures /status latency and the server process CPU. No camera,
+serial port or Telegram needed, but bot_app.camera_stream still imports
+picamera2, so run it on the Pi (with main.py stopped, or another --port).
+
+Example:
+  python3 tools/bench_web.py --viewers 1,5,10,20 --duration 10
+"""
+
+import argparse
+import base64
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from config.dashboard_config import DASHBOARD_USERNAME, DASHBOARD_PASSWORD  # noqa: E402
+
+AUTH = "Basic " + base64.b64encode(f"{DASHBOARD_USERNAME}:{DASHBOARD_PASSWORD}".encode()).decode()
+
+
+def serve(kind: str, port: int, frame_kb: int, fps: float) -> None:
+    """Child process: synthetic camera + dashboard on `port`."""
+    from bot_app.camera_stream import StreamingOutput
+    from bot_app.webapp import create_app
+
+    output = StreamingOutput((1920, 1080))
+    frame = b"\xff\xd8" + os.urandom(frame_kb * 1024) + b"\xff\xd9"
+
+    def camera():
+        while True:
+            output.outputframe(frame)
+            time.sleep(1.0 / fps)
+
+    threading.Thread(target=camera, daemon=True).start()
+    app = create_app(output)
+    if kind == "async":
+        from bot_app.async_server import run_async_server
+        run_async_server(app, output, host="127.0.0.1", port=port)
+    else:
+        app.run(host="127.0.0.1", port=port, threaded=True, use_reloader=False)
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def thread_count(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def viewer(port: int, stop: threading.Event, counter: list) -> None:
+    try:
+        s = socket.create_connection(("127.0.0.1", port), timeout=5)
+        s.sendall(f"GET /video HTTP/1.1\r\nHost: bench\r\nAuthorization: {AUTH}\r\n\r\n".encode())
+        while not stop.is_set():
+            data = s.recv(1 << 20)
+            if not data:
+                break
+            counter[0] += len(data)
+        s.close()
+    except OSError:
+        pass
+
+
+def wait_up(port: int, timeout: float = 20.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def run_level(pid: int, port: int, n: int, duration: float, frame_bytes: int):
+    stop = threading.Event()
+    counters = [[0] for _ in range(n)]
+    threads = [threading.Thread(target=viewer, args=(port, stop, c), daemon=True) for c in counters]
+    for th in threads:
+        th.start()
+    time.sleep(1.0)  # let streams settle
+
+    for c in counters:
+        c[0] = 0
+    cpu0, t0 = cpu_seconds(pid), time.time()
+    lat = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    while time.time() - t0 < duration:
+        t = time.perf_counter()
+        try:
+            conn.request("GET", "/status", headers={"Authorization": AUTH})
+            conn.getresponse().read()
+            lat.append((time.perf_counter() - t) * 1000.0)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        time.sleep(0.1)
+    elapsed = time.time() - t0
+    cpu = (cpu_seconds(pid) - cpu0) / elapsed * 100.0
+    threads_now = thread_count(pid)
+    viewer_fps = sum(c[0] for c in counters) / frame_bytes / elapsed / max(1, n)
+
+    stop.set()
+    for th in threads:
+        th.join(timeout=2)
+    lat.sort()
+    p95 = lat[int(len(lat) * 0.95) - 1] if lat else float("nan")
+    return cpu, statistics.median(lat) if lat else float("nan"), p95, viewer_fps, threads_now
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--servers", default="threaded,async", help="Comma list of threaded / async")
+    ap.add_argument("--viewers", default="1,5,10,20", help="Comma list of concurrent /video viewers")
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds measured per level")
+    ap.add_argument("--frame-kb", type=int, default=300, help="Fake JPEG size")
+    ap.add_argument("--fps", type=float, default=15.0, help="Fake encoder frame rate")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--serve", choices=["threaded", "async"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.frame_kb, args.fps)
+        return
+
+    frame_bytes = args.frame_kb * 1024 + 100
+    print(f"{'server':>9} {'viewers':>7} {'cpu %':>7} {'status p50 ms':>13} {'p95 ms':>7} "
+          f"{'fps/viewer':>10} {'threads':>7}")
+    for kind in args.servers.split(","):
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", kind,
+                                  "--port", str(args.port), "--frame-kb", str(args.frame_kb),
+                                  "--fps", str(args.fps)],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_up(args.port)
+            for n in (int(v) for v in args.viewers.split(",")):
+                cpu, p50, p95, vfps, threads = run_level(child.pid, args.port, n, args.duration, frame_bytes)
+                print(f"{kind:>9} {n:>7} {cpu:>7.1f} {p50:>13.1f} {p95:>7.1f} {vfps:>10.1f} {threads:>7}")
+        finally:
+            child.terminate()
+            child.wait(timeout=10)
+        time.sleep(1.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Convert a legacy encodings.pickle into the memory-mapped encoding store.
+
+Example:
+  python3 tools/convert_encodings.py --in encodings.pickle --out encodings.fenc
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot_app.encoding_store import load_pickle, load_store, save_store  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="src", default="encodings.pickle", help="Legacy pickle")
+    ap.add_argument("--out", default="encodings.fenc", help="Output encoding store")
+    ap.add_argument("--dtype", default="float32", choices=["float32", "float64"], help="Stored float type")
+    args = ap.parse_args()
+
+    old = load_pickle(args.src)
+    if len(old.encodings) == 0:
+        raise SystemExit(f"No encodings in {args.src}")
+
+    save_store(args.out, old.encodings, old.names,
+               prototypes=old.prototypes,
+               prototype_names=old.prototype_names,
+               prototype_method=old.header.get("prototype_method"),
+               dtype=args.dtype)
+
+    # read back and check every row survived (rows are regrouped by name)
+    new = load_store(args.out)
+    order = np.argsort(np.asarray(old.names), kind="stable")
+    if new.names != [old.names[i] for i in order] or \
+            not np.allclose(new.encodings, old.encodings[order], atol=1e-6):
+        raise SystemExit("Verification failed: store does not match the pickle")
+
+    print("[DONE] wrote:", args.out, "encodings:", len(new.encodings),
+          "identities:", len(new.header["labels"]), "dtype:", args.dtype)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Compare the two-stage (prototype -> top_k) lookup against the exhaustive search.
+
+Every stored encoding is used as a query with a little noise added, so this
+needs no camera. Exits non-zero if the identity disagreement is above --max-disagree.
+
+Example:
+  python3 tools/eval_index.py --encodings encodings.fenc --top-k 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot_app.encoding_store import read_gallery  # noqa: E402
+from bot_app.face_index import KnownFaceIndex  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--encodings", default="encodings.fenc", help="Encoding store (or legacy pickle)")
+    ap.add_argument("--top-k", type=int, default=3, help="Identities refined in stage 2")
+    ap.add_argument("--noise", type=float, default=0.02, help="Gaussian noise added to each query")
+    ap.add_argument("--queries", type=int, default=2000, help="Max number of queries")
+    ap.add_argument("--max-disagree", type=float, default=0.01, help="Allowed identity disagreement rate")
+    args = ap.parse_args()
+
+    gallery = read_gallery(args.encodings)
+    fast = KnownFaceIndex(gallery.encodings, gallery.names, prototypes=gallery.prototypes,
+                          prototype_names=gallery.prototype_names, top_k=args.top_k)
+    exact = KnownFaceIndex(gallery.encodings, gallery.names)
+    if not fast.two_stage:
+        print("[INFO] gallery has", len(fast.labels), "identities; two-stage lookup not used at top_k =", args.top_k)
+        return
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(exact), size=min(args.queries, len(exact)), replace=False)
+    queries = exact.encodings[picks] + rng.normal(scale=args.noise, size=(len(picks), exact.dim))
+
+    t0 = time.perf_counter()
+    a = [exact.match([q]) for q in queries]
+    t1 = time.perf_counter()
+    b = [fast.match([q]) for q in queries]
+    t2 = time.perf_counter()
+
+    disagree = sum(x[0].best_name != y[0].best_name for x, y in zip(a, b)) / len(queries)
+    max_dd = max(abs(x[0].distance - y[0].distance) for x, y in zip(a, b))
+    print(f"[INFO] identities={len(exact.labels)} encodings={len(exact)} prototypes={len(fast.prototypes)}")
+    print(f"[INFO] exhaustive: {1e3 * (t1 - t0) / len(queries):.3f} ms/face")
+    print(f"[INFO] two-stage:  {1e3 * (t2 - t1) / len(queries):.3f} ms/face")
+    print(f"[INFO] disagreement: {100 * disagree:.2f}%  max distance diff: {max_dd:.4f}")
+
+    if disagree > args.max_disagree:
+        raise SystemExit(f"Disagreement above {100 * args.max_disagree:.2f}%: raise --top-k or use --prototypes medoids")
+
+
+if __name__ == "__main__":
+    main()
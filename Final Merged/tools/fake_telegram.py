@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API, for trying alerts without a network.
+
+Accepts sendMessage / sendPhoto / sendMediaGroup for any token, prints what
+arrived and answers like Telegram. --fail-rate and --rate-limit-every inject
+500s and 429s to exercise AlertDispatcher's retries.
+
+Tests start it in-process with serve(): every request is recorded in
+`received`, and `script` lists status codes to answer the next requests with.
+
+Example:
+  python3 tools/fake_telegram.py --port 8081
+  # then: AlertDispatcher(api_base="http://127.0.0.1:8081")
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+
+class Received(NamedTuple):
+    t: float                 # time.time() when the request arrived
+    method: str              # sendMessage / sendPhoto / sendMediaGroup
+    status: int              # what it was answered with
+    content_type: str
+    body: bytes
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    fail_rate = 0.0
+    rate_limit_every = 0
+    retry_after = 1          # seconds, in the 429 reply
+    script: list = []        # status codes for the next requests (consumed first)
+    received: list = []
+    quiet = False
+    _count = 0
+    _lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, code, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        m = re.match(r"^/bot[^/]+/(\w+)$", self.path)
+        if not m:
+            return self._reply(404, {"ok": False, "description": "Not Found"})
+
+        cls = type(self)
+        method = m.group(1)
+        ctype = self.headers.get("Content-Type", "")
+        with self._lock:
+            cls._count += 1
+            n = cls._count
+            if cls.script:
+                code = cls.script.pop(0)
+            elif self.rate_limit_every and n % self.rate_limit_every == 0:
+                code = 429
+            elif random.random() < self.fail_rate:
+                code = 500
+            else:
+                code = 200
+            cls.received.append(Received(time.time(), method, code, ctype, body))
+
+        if not self.quiet:
+            print(f"[{n}] {method}: {code}, {len(body)} bytes ({ctype.split(';')[0]})")
+        if code == 429:
+            return self._reply(429, {"ok": False, "parameters": {"retry_after": self.retry_after}})
+        if code != 200:
+            return self._reply(code, {"ok": False})
+        return self._reply(200, {"ok": True, "result": {"message_id": n}})
+
+
+def serve(port: int = 0, **settings):
+    """
+    Start a stand-in on a background thread (port 0 = any free port).
+    Returns (server, handler class); the class holds `received` / `script`
+    for this server only. Stop with server.shutdown().
+    """
+    handler = type("FakeTelegramServer", (FakeTelegram,),
+                   {"script": [], "received": [], "_count": 0, "quiet": True, **settings})
+    srv = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    ap.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    args = ap.parse_args()
+
+    FakeTelegram.fail_rate = args.fail_rate
+    FakeTelegram.rate_limit_every = args.rate_limit_every
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), FakeTelegram)
+    print(f"[INFO] fake Telegram API on http://127.0.0.1:{args.port}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Promote an unknown visitor (an unknown-face cluster) to a known person.
+
+The bot keeps its visitors in unknown_faces/clusters.npz, with a sample of
+each visitor's encodings. Promoting appends those encodings to the gallery
+under --name (a new person, or more encodings for an existing one) and
+rewrites it atomically; a running main.py picks the change up on its own.
+An old encodings.pickle is not rewritten: the result goes to encodings.fenc
+next to it, which a bot started on the pickle switches to. main.py only
+watches encodings.fenc next to it: a store written elsewhere with --out is
+not used until it is copied there.
+Prototypes stored in the gallery are recomputed.
+
+The crops saved for the visitor can be copied to dataset/<name>/ with
+--dataset, so they are there for the next train_encodings.py run (tight
+crops: HOG may not find a face in all of them).
+
+Example:
+  python3 tools/promote_cluster.py --list
+  python3 tools/promote_cluster.py --cluster 7 --name Courier
+  python3 tools/promote_cluster.py --cluster 7 --name Courier --dataset tools/dataset
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bot_app.encoding_store import read_gallery, save_store  # noqa: E402
+from bot_app.face_index import compute_prototypes  # noqa: E402
+from bot_app.unknown_clusters import read_clusters  # noqa: E402
+
+
+def fmt_time(t):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) if t else "-"
+
+
+def default_gallery():
+    # same choice as main.py: the store, or the old pickle if not converted yet
+    path = os.path.join(ROOT, "encodings.fenc")
+    return path if os.path.exists(path) else os.path.join(ROOT, "encodings.pickle")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clusters", default=os.path.join(ROOT, "unknown_faces", "clusters.npz"),
+                    help="Clusters file written by the bot")
+    ap.add_argument("--list", action="store_true", help="List the visitors and exit")
+    ap.add_argument("--cluster", type=int, help="Visitor id (from --list, /unknown_visitors or the alert)")
+    ap.add_argument("--name", help="Known name to file the visitor under")
+    ap.add_argument("--gallery", default=None, help="Gallery to extend (default: encodings.fenc next to main.py)")
+    ap.add_argument("--out", default=None, help="Output store (default: the gallery, or encodings.fenc for a pickle)")
+    ap.add_argument("--medoids", type=int, default=3, help="Prototypes per person if the gallery uses medoids")
+    ap.add_argument("--dataset", default=None, help="Also copy the visitor's crops to <dataset>/<name>/")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.clusters):
+        raise SystemExit(f"No clusters file at {args.clusters} (is UNKNOWN_CLUSTERS_ENABLED on?)")
+    meta, centroids, encodings = read_clusters(args.clusters)
+    clusters = {c["cluster_id"]: c for c in meta["clusters"]}
+    row_of = {c["cluster_id"]: i for i, c in enumerate(meta["clusters"])}   # centroid row
+
+    if args.list or args.cluster is None:
+        print(f"{'id':>5}  {'first seen':<19}  {'last seen':<19}  {'hits':>6}  {'alerts':>6}  {'samples':>7}  crops")
+        for c in sorted(clusters.values(), key=lambda c: c["last_seen"], reverse=True):
+            print(f"{c['cluster_id']:>5}  {fmt_time(c['first_seen']):<19}  {fmt_time(c['last_seen']):<19}  "
+                  f"{c['hits']:>6}  {c['alerts']:>6}  {c['count']:>7}  {', '.join(c['files']) or '-'}")
+        return
+
+    if not args.name:
+        ap.error("--cluster needs --name")
+    c = clusters.get(args.cluster)
+    if c is None:
+        raise SystemExit(f"No visitor #{args.cluster} in {args.clusters} (expired or not saved yet)")
+    new = encodings[c["start"]:c["start"] + c["count"]]
+    if len(new) == 0:
+        raise SystemExit(f"Visitor #{args.cluster} has no stored encodings")
+
+    src = args.gallery or default_gallery()
+    out = args.out or (os.path.splitext(src)[0] + ".fenc")
+    gallery = read_gallery(src)
+    names = list(gallery.names)
+    enc = np.concatenate([np.asarray(gallery.encodings, dtype=np.float64), new.astype(np.float64)])
+
+    # a visitor very close to someone else is more likely a bad photo of them than a new person
+    centroid = centroids[row_of[args.cluster]]
+    d = np.linalg.norm(np.asarray(gallery.encodings, dtype=np.float64) - centroid, axis=1)
+    nearest = int(np.argmin(d))
+    if names[nearest] != args.name and d[nearest] < 0.45:
+        print(f"[WARN] visitor #{args.cluster} is {d[nearest]:.3f} from {names[nearest]!r}")
+    names += [args.name] * len(new)
+
+    prototypes = prototype_names = None
+    method = gallery.header.get("prototype_method")
+    if gallery.prototypes is not None and method:
+        prototypes, prototype_names = compute_prototypes(enc, names, method, args.medoids)
+
+    dtype = str(gallery.encodings.dtype) if gallery.header.get("version") else "float32"
+    save_store(out, enc, names, prototypes=prototypes, prototype_names=prototype_names,
+               prototype_method=method if prototypes is not None else None, dtype=dtype)
+    print("[DONE] wrote:", out, f"+{len(new)} encodings for {args.name!r}", "total:", len(enc))
+    if os.path.abspath(out) != os.path.join(ROOT, "encodings.fenc"):
+        print("[INFO] the bot only watches", os.path.join(ROOT, "encodings.fenc"), "- copy", out, "there to use it")
+
+    if args.dataset:
+        unknown_dir = os.path.dirname(os.path.abspath(args.clusters))
+        person_dir = os.path.join(args.dataset, args.name)
+        os.makedirs(person_dir, exist_ok=True)
+        copied = 0
+        for fn in c["files"]:
+            path = os.path.join(unknown_dir, fn)
+            if os.path.exists(path):
+                shutil.copy2(path, os.path.join(person_dir, fn))
+                copied += 1
+        print("[INFO] copied", copied, "crops to", person_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Simulated Arduino on a pseudo-terminal, for trying RobotSerial without hardware.
+
+Speaks the same protocols as arduino/mega_motor_shield_linefollower_serial.ino:
+reads command lines and answers "ACK <command>", sends a SENSOR line every
+--sensor-ms, and switches to the framed protocol (bot_app/serial_protocol.py)
+when asked with "PROTO BIN <baud> <hz> <batch>". Both directions are paced
+at the current baud, like a real UART.
+
+The pty does not reset on reopen like a real Arduino does, so restart the
+simulator after a framed session.
+
+--proto ack / silent play an older sketch without frame support, which
+answers "ACK PROTO ..." or nothing at all (the Pi must stay on text).
+
+Example:
+  python3 tools/sim_arduino.py --baud 9600
+  # prints the pty path; set SERIAL_PORT to it (or use tools/bench_serial.py)
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import tty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bot_app.serial_protocol import (FRAME_ACK, FRAME_CMD, MAX_BATCH, FrameDecoder, Sample,  # noqa: E402
+                                     encode_frame, encode_sensor_batch, parse_proto_reply)
+
+FRAME_BAUDS = (19200, 38400, 57600, 115200)   # same as the sketch
+
+
+class SimArduino:
+    def __init__(self, baud: int = 9600, sensor_ms: int = 500, counter: bool = False, proto: str = "bin"):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.path = os.ttyname(slave)
+        self._slave = slave            # kept open so the pty survives reconnects
+        self.byte_s = 10.0 / baud      # 8N1: 10 bits per byte
+        self.sensor_s = sensor_ms / 1000.0
+        self.counter = counter         # FLAMEVAL = sample number (for latency benchmarks)
+        if proto not in ("bin", "ack", "silent"):
+            raise ValueError("proto must be 'bin', 'ack' or 'silent'")
+        self.proto = proto             # answer to PROTO BIN: switch / plain ACK / nothing
+        self.received = []             # (time.perf_counter(), command)
+        self.sampled = {}              # sample number & 0xFFFF -> time.perf_counter() when taken
+        self.tx_bytes = 0
+        self.on_command = None         # optional callback(command, t)
+        self.mode = "AUTO_LF"
+        self.framed = False
+        self.sample_s = 0.0
+        self.batch = 1
+        self._run = True
+        self._tx = bytearray()         # like the sketch's 64 byte Serial TX buffer
+        self._tx_cond = threading.Condition()
+        self._decoder = FrameDecoder()
+        self._switch = threading.Event()
+
+    def start(self) -> "SimArduino":
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._tx_loop, daemon=True).start()
+        if self.sensor_s > 0:
+            threading.Thread(target=self._sensor_loop, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._run = False
+
+    def write(self, data: bytes) -> None:
+        """Like Serial.print: returns at once unless the 64 byte TX buffer is full."""
+        with self._tx_cond:
+            for i in range(0, len(data), 16):
+                while len(self._tx) >= 64:
+                    self._tx_cond.wait()
+                self._tx += data[i:i + 16]
+                self._tx_cond.notify_all()
+
+    def _tx_loop(self) -> None:
+        """Drains the TX buffer at the baud rate; bytes show up on the pty when they would have arrived."""
+        while self._run:
+            with self._tx_cond:
+                while not self._tx:
+                    self._tx_cond.wait()
+                chunk = bytes(self._tx[:16])
+                del self._tx[:16]
+                self._tx_cond.notify_all()
+                byte_s = self.byte_s
+            time.sleep(len(chunk) * byte_s)
+            os.write(self.master, chunk)
+            self.tx_bytes += len(chunk)
+
+    def _read_loop(self) -> None:
+        buf = b""
+        clock = 0.0   # when the last byte read has fully arrived over the (simulated) UART
+        while self._run:
+            data = os.read(self.master, 256)
+            clock = max(clock, time.perf_counter())
+            for ch in data:
+                clock += self.byte_s
+                if self.framed:
+                    for ftype, payload in self._decoder.feed(bytes((ch,))):
+                        if ftype == FRAME_CMD:
+                            self._sleep_until(clock)
+                            self._handle(payload.decode("ascii", errors="ignore").strip())
+                    continue
+                if ch != 10:        # \n
+                    if ch != 13:
+                        buf += bytes((ch,))
+                    continue
+                cmd, buf = buf.decode("ascii", errors="ignore").strip(), b""
+                if not cmd:
+                    continue
+                self._sleep_until(clock)
+                self._handle(cmd)
+
+    @staticmethod
+    def _sleep_until(t: float) -> None:
+        wait = t - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _handle(self, cmd: str) -> None:
+        t = time.perf_counter()
+        if not self.framed and cmd.upper().startswith("PROTO BIN") and self.proto != "ack":
+            if self.proto == "bin":
+                self._switch_protocol(cmd)
+            return
+        self.received.append((t, cmd))
+        if cmd.upper() in ("AUTO_LF", "MANUAL"):
+            self.mode = cmd.upper()
+        if self.on_command:
+            self.on_command(cmd, t)
+        if self.framed:
+            self.write(encode_frame(FRAME_ACK, cmd.encode("ascii")))
+        else:
+            self.write(f"ACK {cmd}\r\n".encode("ascii"))
+
+    def _switch_protocol(self, cmd: str) -> None:
+        req = parse_proto_reply(cmd)
+        if req is None or req[0] not in FRAME_BAUDS or not 1 <= req[1] <= 100 or not 1 <= req[2] <= MAX_BATCH:
+            self.write(f"ACK {cmd}\r\n".encode("ascii"))   # refused: stay on text
+            return
+        baud, hz, batch = req
+        self.write(f"PROTO BIN {baud} {hz} {batch}\r\n".encode("ascii"))
+        with self._tx_cond:            # Serial.flush() before Serial.begin(baud)
+            while self._tx:
+                self._tx_cond.wait()
+        time.sleep(16 * self.byte_s)
+        self.byte_s = 10.0 / baud
+        self.sample_s = 1.0 / hz
+        self.batch = batch
+        self.framed = True
+        self._switch.set()
+
+    def _sample(self, n: int, start: float) -> Sample:
+        warm = time.time() - start < 20.0
+        mq2 = random.randint(150, 260)
+        flame = n & 0xFFFF if self.counter else random.randint(700, 1000)
+        self.sampled[n & 0xFFFF] = time.perf_counter()
+        return Sample(flame=False, gas=not warm and mq2 >= 400, warm=warm, mq2_val=mq2, flame_val=flame)
+
+    def _sensor_loop(self) -> None:
+        start = time.time()
+        n = 0
+        # text: one SENSOR line per sensor_s
+        while self._run and not self.framed:
+            if self._switch.wait(self.sensor_s):
+                break
+            s = self._sample(n, start)
+            n += 1
+            self.write(f"SENSOR FLAME={int(s.flame)} GAS={int(s.gas)} "
+                       f"MQ2VAL={s.mq2_val} FLAMEVAL={s.flame_val} WARM={int(s.warm)}\r\n".encode("ascii"))
+
+        # frames: sample on a fixed grid, one SENSOR frame per batch
+        seq, batch = 0, []
+        next_t = time.perf_counter()
+        while self._run:
+            next_t += self.sample_s
+            self._sleep_until(next_t)
+            batch.append(self._sample(n, start))
+            n += 1
+            if len(batch) >= self.batch:
+                self.write(encode_sensor_batch(seq, round(self.sample_s * 1000), batch))
+                seq, batch = seq + 1, []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--baud", type=int, default=9600)
+    ap.add_argument("--sensor-ms", type=int, default=500, help="SENSOR line interval (0 = off)")
+    ap.add_argument("--proto", choices=["bin", "ack", "silent"], default="bin",
+                    help="Answer to PROTO BIN (ack / silent = sketch without frame support)")
+    args = ap.parse_args()
+
+    sim = SimArduino(args.baud, args.sensor_ms, proto=args.proto).start()
+    sim.on_command = lambda cmd, t: print(f"[{t:.3f}] {cmd}")
+    print("[INFO] simulated Arduino on", sim.path)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,26 @@
 Train face encodings from dataset images.
 
 Example:
-  python3 tools/train_encodings.py --dataset tools/dataset --out encodings.pickle
+  python3 tools/train_encodings.py --dataset tools/dataset --out encodings.fenc
+  python3 tools/train_encodings.py --prototypes medoids --medoids 3
+  python3 tools/train_encodings.py --incremental   # only new/changed images
+  python3 tools/train_encodings.py --workers 4      # use all Pi cores
 """
 
 import argparse
+import json
+import multiprocessing as mp
 import os
 import pickle
+import sys
 
 import cv2
 import face_recognition
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot_app.encoding_store import save_store  # noqa: E402
+from bot_app.face_index import PROTOTYPE_METHODS, compute_prototypes  # noqa: E402
 
 
 def list_images(root: str):
@@ -22,45 +33,184 @@ def list_images(root: str):
                 yield os.path.join(dirpath, fn)
 
 
+CACHE_VERSION = 1
+
+
+def encode_image(image_path: str, model: str):
+    """Returns (boxes, encodings) for one image, or None if it cannot be read."""
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    boxes = face_recognition.face_locations(rgb, model=model)
+    encs = face_recognition.face_encodings(rgb, boxes)
+    return [list(b) for b in boxes], encs
+
+
+def _encode_job(job):
+    # top-level so it can be pickled to pool workers
+    image_path, model = job
+    return image_path, encode_image(image_path, model)
+
+
+def encode_all(image_paths, model: str, workers: int = 1, chunksize: int = 8):
+    """
+    Yields (image_path, result) in input order. With workers > 1 images are
+    fanned out over a process pool (dlib's HOG is single-threaded); imap keeps
+    the order, so the output is the same as a serial run.
+    """
+    jobs = [(p, model) for p in image_paths]
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _encode_job(job)
+        return
+
+    with mp.Pool(processes=workers) as pool:
+        yield from pool.imap(_encode_job, jobs, chunksize=max(1, chunksize))
+
+
+def file_key(image_path: str):
+    st = os.stat(image_path)
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+def load_cache(path: str, model: str):
+    """
+    Sidecar cache: {relpath: (size, mtime_ns, boxes, encodings)}.
+    Stored as .npz (JSON metadata + one float matrix), no pickle involved.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+            encs = z["encodings"]
+    except Exception as e:
+        print("[WARN] ignoring unreadable cache:", path, e)
+        return {}
+    if meta.get("version") != CACHE_VERSION or meta.get("model") != model:
+        print("[INFO] cache was built with another version/model, rebuilding")
+        return {}
+
+    cache = {}
+    for item in meta["images"]:
+        start, count = item["start"], item["count"]
+        cache[item["path"]] = (item["size"], item["mtime_ns"], item["boxes"],
+                               list(encs[start:start + count]))
+    return cache
+
+
+def save_cache(path: str, model: str, cache) -> None:
+    images, rows = [], []
+    for rel in sorted(cache):
+        size, mtime_ns, boxes, encs = cache[rel]
+        images.append({"path": rel, "size": size, "mtime_ns": mtime_ns,
+                       "boxes": boxes, "start": len(rows), "count": len(encs)})
+        rows.extend(encs)
+
+    meta = json.dumps({"version": CACHE_VERSION, "model": model, "images": images}).encode("utf-8")
+    encodings = np.asarray(rows, dtype=np.float64).reshape(-1, 128)
+    tmp = f"{path}.tmp{os.getpid()}.npz"
+    np.savez(tmp, meta=np.frombuffer(meta, dtype=np.uint8), encodings=encodings)
+    os.replace(tmp, path)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--dataset", default="tools/dataset", help="Dataset root: dataset/<name>/*.jpg")
-    ap.add_argument("--out", default="encodings.pickle", help="Output pickle path")
+    ap.add_argument("--out", default="encodings.fenc",
+                    help="Output encoding store (*.pickle writes the legacy format)")
     ap.add_argument("--model", default="hog", choices=["hog", "cnn"], help="Face detector model")
+    ap.add_argument("--prototypes", default="none", choices=["none", *PROTOTYPE_METHODS],
+                    help="Also store per-person prototypes for the two-stage lookup")
+    ap.add_argument("--medoids", type=int, default=3, help="Prototypes per person for --prototypes medoids")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Reuse cached boxes/encodings; only process new or changed images")
+    ap.add_argument("--cache", default=None, help="Cache path (default: <out>.cache.npz)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Encoding processes (0 = one per CPU core)")
+    ap.add_argument("--chunksize", type=int, default=8, help="Images per work unit sent to a worker")
     args = ap.parse_args()
+    cache_path = args.cache or args.out + ".cache.npz"
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
 
-    image_paths = list(list_images(args.dataset))
+    # sorted, so the output order does not depend on the filesystem
+    image_paths = sorted(list_images(args.dataset))
     if not image_paths:
         raise SystemExit(f"No images found in {args.dataset}")
 
-    known_encodings = []
-    known_names = []
-
-    print("[INFO] processing", len(image_paths), "images…")
-    for i, image_path in enumerate(image_paths, 1):
-        name = os.path.basename(os.path.dirname(image_path))
-        image = cv2.imread(image_path)
-        if image is None:
+    old_cache = load_cache(cache_path, args.model) if args.incremental else {}
+    cache = {}
+    todo = []
+    keys = {}   # (size, mtime_ns) as seen before encoding
+    for image_path in image_paths:
+        rel = os.path.relpath(image_path, args.dataset)
+        size, mtime_ns = keys[image_path] = file_key(image_path)
+        hit = old_cache.get(rel)
+        if hit and hit[0] == size and hit[1] == mtime_ns:
+            cache[rel] = hit
+        else:
+            todo.append(image_path)
+
+    if args.incremental:
+        dropped = len(set(old_cache) - {os.path.relpath(p, args.dataset) for p in image_paths})
+        print(f"[INFO] cache: {len(cache)} unchanged, {len(todo)} new/changed, {dropped} removed")
+
+    print("[INFO] processing", len(todo), "images…" + (f" ({workers} workers)" if workers > 1 else ""))
+    results = encode_all(todo, args.model, workers=workers, chunksize=args.chunksize)
+    for i, (image_path, result) in enumerate(results, 1):
+        if result is None:
             print("[WARN] cannot read:", image_path)
             continue
 
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        boxes = face_recognition.face_locations(rgb, model=args.model)
-        encs = face_recognition.face_encodings(rgb, boxes)
+        boxes, encs = result
+        # the key read before encoding: an image replaced meanwhile no longer matches
+        # it, so the next --incremental run encodes the new file
+        size, mtime_ns = keys[image_path]
+        cache[os.path.relpath(image_path, args.dataset)] = (size, mtime_ns, boxes, encs)
+
+        if i % 25 == 0:
+            print(f"[INFO] {i}/{len(todo)}")
+
+    if args.incremental:
+        save_cache(cache_path, args.model, cache)
 
-        for e in encs:
+    known_encodings = []
+    known_names = []
+    for image_path in image_paths:
+        entry = cache.get(os.path.relpath(image_path, args.dataset))
+        if entry is None:
+            continue
+        name = os.path.basename(os.path.dirname(image_path))
+        for e in entry[3]:
             known_encodings.append(e)
             known_names.append(name)
 
-        if i % 25 == 0:
-            print(f"[INFO] {i}/{len(image_paths)}")
-
     if not known_encodings:
         raise SystemExit("No face encodings found. Try better images or change --model.")
 
     data = {"encodings": known_encodings, "names": known_names}
-    with open(args.out, "wb") as f:
-        f.write(pickle.dumps(data))
+    if args.prototypes != "none":
+        protos, proto_names = compute_prototypes(known_encodings, known_names, args.prototypes, args.medoids)
+        data["prototypes"] = protos
+        data["prototype_names"] = proto_names
+        data["prototype_method"] = args.prototypes
+        print("[INFO] prototypes:", len(protos), f"({args.prototypes})")
+
+    if args.out.endswith(".pickle"):
+        # tmp file + os.replace, like save_store: the bot's reloader never sees a half-written file
+        tmp = f"{args.out}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(pickle.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, args.out)
+    else:
+        save_store(args.out, data["encodings"], data["names"],
+                   prototypes=data.get("prototypes"),
+                   prototype_names=data.get("prototype_names"),
+                   prototype_method=data.get("prototype_method"))
     print("[DONE] wrote:", args.out, "encodings:", len(known_encodings))
 
 